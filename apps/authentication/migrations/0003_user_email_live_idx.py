@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:19
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the new indexes without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0002_user_role'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['email'], name='auth_user_email_live_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The unique index on email already serves lookups of live users.
+    atomic = False
+
+    dependencies = [
+        ('authentication', '0003_user_email_live_idx'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='user',
+            name='auth_user_email_live_idx',
+        ),
+    ]
@@ -28,4 +28,13 @@ class IsUserSelf(permissions.BasePermission):
     message = "You can only perform this action on your own account."
     
     def has_object_permission(self, request, view, obj):
-        return obj.id == request.user.id
\ No newline at end of file
+        return obj.id == request.user.id
+
+class IsLibrarianOrProfileOwner(permissions.BasePermission):
+    """
+    Permission check for librarians or the patron whose profile is accessed.
+    """
+    message = "You can only perform this action on your own patron profile."
+    
+    def has_object_permission(self, request, view, obj):
+        return request.user.is_librarian or (obj.user_id is not None and obj.user_id == request.user.id)
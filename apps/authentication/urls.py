@@ -7,7 +7,9 @@ from .views import (
     CustomTokenRefreshView
 )
 
+# Borrowings also mount their router at /api/; leave the root URL to their list.
 router = DefaultRouter()
+router.include_root_view = False
 router.register('management/users', UserManagementViewSet, basename='user-management')
 
 app_name = 'authentication'
@@ -0,0 +1,54 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class BookFilterBackend(BaseFilterBackend):
+    """
+    Filter books by exact author or publisher, publication year range and
+    availability.
+
+    Query parameters: ``author``, ``publisher``, ``year_min``, ``year_max``
+    and ``is_available`` (``true``/``false``). Availability is evaluated on
+    ``available_copies`` in the database so that "available only" is served
+    by the partial index instead of a Python pass over every row.
+    """
+    TRUE_VALUES = ('true', '1', 'yes')
+    FALSE_VALUES = ('false', '0', 'no')
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if params.get('author'):
+            queryset = queryset.filter(author=params['author'])
+
+        if params.get('publisher'):
+            queryset = queryset.filter(publisher=params['publisher'])
+
+        year_min = self.parse_year(params, 'year_min')
+        if year_min is not None:
+            queryset = queryset.filter(publication_year__gte=year_min)
+
+        year_max = self.parse_year(params, 'year_max')
+        if year_max is not None:
+            queryset = queryset.filter(publication_year__lte=year_max)
+
+        is_available = params.get('is_available', '').lower()
+        if is_available in self.TRUE_VALUES:
+            queryset = queryset.filter(available_copies__gt=0)
+        elif is_available in self.FALSE_VALUES:
+            queryset = queryset.filter(available_copies=0)
+        elif is_available:
+            raise ValidationError({'is_available': [_("Must be true or false.")]})
+
+        return queryset
+
+    @staticmethod
+    def parse_year(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: [_("Must be a year, e.g. 1999.")]})
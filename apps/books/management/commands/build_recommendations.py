@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.books.services import BookRecommendationService
+
+class Command(BaseCommand):
+    help = 'Rebuild "patrons who borrowed this also borrowed" recommendations from the borrowing history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=BookRecommendationService.DEFAULT_TOP_K, help='Recommendations kept per book')
+        parser.add_argument('--min-count', type=int, default=BookRecommendationService.DEFAULT_MIN_COUNT, help='Minimum number of shared borrowers')
+        parser.add_argument('--fetch-size', type=int, default=BookRecommendationService.FETCH_SIZE, help='Borrowing pairs read per round trip')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        count = BookRecommendationService.rebuild(
+            top_k=options['top_k'], min_count=options['min_count'], fetch_size=options['fetch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {count} recommendations in {time.monotonic() - start:.2f} seconds.'
+        ))
@@ -0,0 +1,49 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from apps.books.services import BookImportService
+
+class Command(BaseCommand):
+    help = 'Bulk import books from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV/JSONL file, or - to read from stdin')
+        parser.add_argument('--format', choices=BookImportService.FORMATS, help='Input format (default: from file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=BookImportService.DEFAULT_BATCH_SIZE, help='Rows per batch')
+        parser.add_argument('--errors-file', default='failed_books.json', help='Where to write the per-row error report')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or BookImportService.detect_format(path)
+        
+        self.stdout.write(self.style.SUCCESS(f'Importing books from {path} ({file_format})'))
+        
+        def report_progress(report):
+            self.stdout.write(
+                f"Processed {report['total_rows']} rows: {report['created']} created, "
+                f"{report['duplicates']} duplicates, {report['failed']} failed, "
+                f"{report['elapsed_seconds']:.2f}s elapsed"
+            )
+        
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        
+        with stream:
+            rows = BookImportService.read_rows(stream, file_format)
+            report = BookImportService.import_books(
+                rows, batch_size=options['batch_size'], on_batch=report_progress
+            )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} of {report['total_rows']} books in "
+            f"{report['elapsed_seconds']:.2f} seconds ({report['rows_per_second']} rows/s)."
+        ))
+        
+        if report['errors']:
+            with open(options['errors_file'], 'w') as f:
+                json.dump(report['errors'], f, indent=2)
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {len(report['errors'])} rows. See {options['errors_file']} for details."
+            ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.books.services import BookLookupService
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis ISBN lookup index from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BookLookupService.REBUILD_BATCH_SIZE, help='Books read per batch')
+
+    def handle(self, *args, **options):
+        count = BookLookupService.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} ISBNs.'))
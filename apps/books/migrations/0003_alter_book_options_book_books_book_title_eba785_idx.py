@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_alter_book_options_remove_book_available_quantity_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'ordering': ['title', 'id'], 'verbose_name': 'Book', 'verbose_name_plural': 'Books'},
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'id'], name='books_book_title_eba785_idx'),
+        ),
+    ]
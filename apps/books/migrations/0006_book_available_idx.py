@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('available_copies__gt', 0), ('is_deleted', False)), fields=['title', 'id'], name='books_book_available_idx'),
+        ),
+    ]
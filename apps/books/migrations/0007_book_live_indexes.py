@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:19
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the new indexes without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('books', '0006_book_available_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['isbn'], name='books_book_isbn_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['author'], name='books_book_author_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['title', 'id'], name='books_book_title_live_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='book',
+            name='books_book_isbn_54becd_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='book',
+            name='books_book_author_b941fe_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='book',
+            name='books_book_title_eba785_idx',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCopy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('barcode', models.CharField(max_length=32, unique=True, verbose_name='Barcode')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('on_loan', 'On Loan'), ('withdrawn', 'Withdrawn')], default='available', max_length=10, verbose_name='Status')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copies', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Copy',
+                'verbose_name_plural': 'Book Copies',
+                'ordering': ['book', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'available')), fields=['book', 'id'], name='books_copy_available_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookcopy',
+            name='status',
+            field=models.CharField(choices=[('available', 'Available'), ('on_loan', 'On Loan'), ('reserved', 'Reserved'), ('withdrawn', 'Withdrawn')], default='available', max_length=10, verbose_name='Status'),
+        ),
+    ]
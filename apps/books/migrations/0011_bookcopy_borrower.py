@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Record who holds each copy that is on loan.
+SET_BORROWERS = """
+UPDATE books_bookcopy AS copy
+SET borrower_id = loan.patron_id
+FROM borrowings_borrowingrecord AS loan
+WHERE loan.copy_id = copy.id AND loan.status IN ('pending', 'borrowed', 'overdue') AND copy.status = 'on_loan'
+"""
+
+
+class Migration(migrations.Migration):
+    # The constraint is a partial unique index; build it without blocking
+    # writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('books', '0010_bookcopy_reserved'),
+        ('borrowings', '0010_hold'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookcopy',
+            name='borrower',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies_on_loan', to='patrons.patron'),
+        ),
+        migrations.RunSQL(SET_BORROWERS, migrations.RunSQL.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # Clear an invalid index left by an interrupted earlier run.
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "books_copy_one_per_borrower"',
+                    migrations.RunSQL.noop,
+                ),
+                migrations.RunSQL(
+                    """
+                    CREATE UNIQUE INDEX CONCURRENTLY "books_copy_one_per_borrower"
+                    ON "books_bookcopy" ("book_id", "borrower_id")
+                    WHERE "borrower_id" IS NOT NULL
+                    """,
+                    'DROP INDEX CONCURRENTLY IF EXISTS "books_copy_one_per_borrower"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='bookcopy',
+                    constraint=models.UniqueConstraint(condition=models.Q(('borrower__isnull', False)), fields=('book', 'borrower'), name='books_copy_one_per_borrower'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The unique index on isbn already serves lookups of live books.
+    atomic = False
+
+    dependencies = [
+        ('books', '0011_bookcopy_borrower'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='book',
+            name='books_book_isbn_live_idx',
+        ),
+    ]
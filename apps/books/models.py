@@ -1,7 +1,18 @@
+import logging
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.dispatch import Signal
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
-from apps.core.mixins.models_mixins import TimeStampMixin, SoftDeleteMixin, SoftDeleteManager
+from apps.core.mixins.models_mixins import TimeStampMixin, SoftDeleteMixin, SoftDeleteManager, AllObjectsManager
+
+logger = logging.getLogger(__name__)
+
+
+# Sent with ``book_ids`` when copies are added to books already in
+# circulation, so that holds waiting on them can claim the new copies.
+copies_issued = Signal()
 
 
 class BookManager(SoftDeleteManager):
@@ -19,16 +30,45 @@ class Book(TimeStampMixin, SoftDeleteMixin, models.Model):
     description = models.TextField(_("Description"), blank=True)
     available_copies = models.PositiveIntegerField(_("Available Copies"), default=1)
     total_copies = models.PositiveIntegerField(_("Total Copies"), default=1)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="english")
+            + SearchVector("author", weight="A", config="english")
+            + SearchVector("publisher", weight="B", config="english")
+            + SearchVector("description", weight="C", config="english")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
     objects = BookManager()
+    all_objects = AllObjectsManager()
     
     class Meta:
         verbose_name = _("Book")
         verbose_name_plural = _("Books")
-        ordering = ["title"]
+        ordering = ["title", "id"]
         indexes = [
-            models.Index(fields=["isbn"]),
-            models.Index(fields=["author"]),
+            # Lookups always go through SoftDeleteManager, so index live rows
+            # only. ISBN lookups use the unique index on isbn.
+            models.Index(
+                fields=["author"],
+                name="books_book_author_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["title", "id"],
+                name="books_book_title_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+            models.Index(
+                fields=["title", "id"],
+                name="books_book_available_idx",
+                condition=models.Q(available_copies__gt=0, is_deleted=False),
+            ),
+            GinIndex(fields=["search_vector"]),
+            GinIndex(fields=["title"], name="books_book_title_trgm", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["author"], name="books_book_author_trgm", opclasses=["gin_trgm_ops"]),
         ]
 
     def __str__(self):
@@ -43,3 +83,172 @@ class Book(TimeStampMixin, SoftDeleteMixin, models.Model):
         if not self.pk:
             self.available_copies = self.total_copies
         super().save(*args, **kwargs)
+
+
+class BookCopyManager(models.Manager):
+    """Custom manager for BookCopy model"""
+    
+    def sync_with_books(self, books):
+        """
+        Add or withdraw copies so that each book has ``total_copies``
+        copies in circulation. Copies on loan are never withdrawn.
+        
+        ``available_copies`` is moved by the copies issued and withdrawn, in
+        the caller's transaction. A book's first copies are already counted,
+        since new books start with every copy available. Copies added to a
+        book already in circulation are announced with ``copies_issued``.
+        A counter that the move would take below zero or past the book's
+        total copies has drifted; it is left alone and logged.
+        """
+        books = [book for book in books if book.pk is not None]
+        if not books:
+            return
+        
+        in_circulation = dict(
+            self.filter(book__in=books)
+            .exclude(status=BookCopy.WITHDRAWN)
+            .order_by()
+            .values_list('book')
+            .annotate(count=models.Count('id'))
+        )
+        issued = dict(
+            self.filter(book__in=books)
+            .order_by()
+            .values_list('book')
+            .annotate(count=models.Count('id'))
+        )
+        
+        new_copies = []
+        available_delta = {}
+        for book in books:
+            missing = book.total_copies - in_circulation.get(book.pk, 0)
+            if missing > 0:
+                start = issued.get(book.pk, 0) + 1
+                new_copies.extend(
+                    BookCopy(book=book, barcode=BookCopy.make_barcode(book.pk, number))
+                    for number in range(start, start + missing)
+                )
+                if start > 1:
+                    available_delta[book.pk] = missing
+            elif missing < 0:
+                excess = -missing
+                surplus = self.filter(book=book, status=BookCopy.AVAILABLE).order_by('-id')[:excess]
+                # Re-check the status so that a copy lent meanwhile is kept.
+                withdrawn = self.filter(
+                    pk__in=list(surplus.values_list('pk', flat=True)), status=BookCopy.AVAILABLE
+                ).update(status=BookCopy.WITHDRAWN)
+                if withdrawn:
+                    available_delta[book.pk] = -withdrawn
+        
+        if new_copies:
+            self.bulk_create(new_copies)
+        
+        if available_delta:
+            moved = models.F('available_copies') + models.Case(
+                *(models.When(pk=pk, then=delta) for pk, delta in available_delta.items()),
+                output_field=models.IntegerField(),
+            )
+            updated = (
+                Book.all_objects.filter(pk__in=available_delta)
+                .alias(moved=moved)
+                .filter(moved__gte=0, moved__lte=models.F('total_copies'))
+                .update(available_copies=moved)
+            )
+            if updated < len(available_delta):
+                logger.error(
+                    "Available copies of %d of books %s were out of step with their copies; counters left unchanged",
+                    len(available_delta) - updated, sorted(available_delta)
+                )
+            issued_to = [pk for pk, delta in available_delta.items() if delta > 0]
+            if issued_to:
+                copies_issued.send(sender=BookCopy, book_ids=issued_to)
+            available = dict(
+                Book.all_objects.filter(pk__in=available_delta).values_list('pk', 'available_copies')
+            )
+            for book in books:
+                if book.pk in available:
+                    book.available_copies = available[book.pk]
+
+
+class BookCopy(TimeStampMixin, models.Model):
+    """
+    A physical copy of a book. Borrowing allocates a specific available
+    copy, so concurrent checkouts of one title lock different rows.
+    """
+    AVAILABLE = 'available'
+    ON_LOAN = 'on_loan'
+    RESERVED = 'reserved'
+    WITHDRAWN = 'withdrawn'
+    
+    STATUS_CHOICES = [
+        (AVAILABLE, _('Available')),
+        (ON_LOAN, _('On Loan')),
+        (RESERVED, _('Reserved')),
+        (WITHDRAWN, _('Withdrawn')),
+    ]
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='copies')
+    barcode = models.CharField(_("Barcode"), max_length=32, unique=True)
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default=AVAILABLE)
+    # The patron a copy is on loan to, set and cleared with the status.
+    borrower = models.ForeignKey(
+        'patrons.Patron',
+        on_delete=models.SET_NULL,
+        related_name='copies_on_loan',
+        null=True,
+        blank=True
+    )
+    
+    objects = BookCopyManager()
+    
+    class Meta:
+        verbose_name = _("Book Copy")
+        verbose_name_plural = _("Book Copies")
+        ordering = ["book", "id"]
+        # Every loan takes a copy, so one copy per patron and book is one
+        # active loan per patron and book. The loan table cannot hold this
+        # constraint: it is partitioned by borrow date, which a unique
+        # index there would have to include.
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "borrower"],
+                name="books_copy_one_per_borrower",
+                condition=models.Q(borrower__isnull=False),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["book", "id"],
+                name="books_copy_available_idx",
+                condition=models.Q(status="available"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.barcode} ({self.get_status_display()})"
+    
+    @staticmethod
+    def make_barcode(book_id, number):
+        return f"{book_id:08d}-{number:04d}"
+
+
+class BookRecommendation(models.Model):
+    """
+    Precomputed "patrons who borrowed this also borrowed" neighbour of a
+    book, written by the ``build_recommendations`` command.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField(_("Rank"))
+    score = models.FloatField(_("Score"))
+    
+    class Meta:
+        verbose_name = _("Book Recommendation")
+        verbose_name_plural = _("Book Recommendations")
+        ordering = ["book", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["book", "rank"], name="books_recommendation_book_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_book_id} ({self.score:.3f})"
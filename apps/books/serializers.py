@@ -1,10 +1,14 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from apps.core.mixins.serializer_mixins import SparseFieldsetMixin
 from .models import Book
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for detailed Book representation."""
     
     is_available = serializers.BooleanField(read_only=True)
+    field_sources = {'is_available': ('available_copies',)}
     
     class Meta:
         model = Book
@@ -13,13 +17,113 @@ class BookSerializer(serializers.ModelSerializer):
             'publisher', 'description', 'available_copies', 
             'total_copies', 'is_available', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # Availability follows the copies; it is never set by clients.
+        read_only_fields = ['id', 'available_copies', 'created_at', 'updated_at']
 
-class BookListSerializer(serializers.ModelSerializer):
+class BookListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Book list representation with fewer fields."""
     
     is_available = serializers.BooleanField(read_only=True)
+    field_sources = {'is_available': ('available_copies',)}
     
     class Meta:
         model = Book
         fields = ['id', 'title', 'author', 'isbn', 'publication_year', 'is_available']
+
+class BookBatchListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of new books. ISBN uniqueness is checked for the
+    whole batch with one query instead of one query per item.
+    """
+    
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        isbns = [item['isbn'] for item in attrs]
+        existing = set(Book.all_objects.filter(isbn__in=isbns).values_list('isbn', flat=True))
+        
+        errors = []
+        seen = set()
+        for isbn in isbns:
+            if isbn in existing:
+                errors.append({'isbn': [_("Book with this ISBN already exists")]})
+            elif isbn in seen:
+                errors.append({'isbn': [_("Duplicate ISBN within the batch")]})
+            else:
+                errors.append({})
+            seen.add(isbn)
+        
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+class BookBatchItemSerializer(BookSerializer):
+    """Serializer for one book of a batch request."""
+    
+    isbn = serializers.CharField(max_length=13)
+    
+    class Meta(BookSerializer.Meta):
+        list_serializer_class = BookBatchListSerializer
+    
+    def validate_isbn(self, value):
+        if len(value) != 13 or not value.isdigit():
+            raise serializers.ValidationError(_("ISBN must be a 13-digit number"))
+        return value
+
+class BookBatchUpdateListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of ``{id, fields}`` updates. All books are loaded with
+    one query and changed ISBNs are checked for conflicts with one more.
+    
+    ``validated_data`` is a list of ``(book, fields)`` pairs.
+    """
+    
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        if len({item['id'] for item in attrs}) != len(attrs):
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [_("Each book may only appear once per batch")]}
+            )
+        
+        books = Book.objects.in_bulk([item['id'] for item in attrs])
+        
+        errors = []
+        updates = []
+        for item in attrs:
+            book = books.get(item['id'])
+            if book is None:
+                errors.append({'id': [_("Book not found")]})
+                continue
+            item_serializer = BookBatchItemSerializer(book, data=item['fields'], partial=True)
+            if not item_serializer.is_valid():
+                errors.append({'fields': item_serializer.errors})
+                continue
+            errors.append({})
+            updates.append((book, item_serializer.validated_data))
+        
+        changed_isbns = {
+            fields['isbn']: book.pk for book, fields in updates
+            if 'isbn' in fields and fields['isbn'] != book.isbn
+        }
+        if changed_isbns:
+            taken = set(Book.all_objects.filter(isbn__in=changed_isbns).values_list('isbn', flat=True))
+            seen = set()
+            for index, item in enumerate(attrs):
+                isbn = item['fields'].get('isbn')
+                if errors[index] or isbn not in changed_isbns:
+                    continue
+                if isbn in taken or isbn in seen:
+                    errors[index] = {'fields': {'isbn': [_("Book with this ISBN already exists")]}}
+                seen.add(isbn)
+        
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return updates
+
+class BookBatchUpdateSerializer(serializers.Serializer):
+    """Serializer for one ``{id, fields}`` item of a batch update."""
+    
+    id = serializers.IntegerField()
+    fields = serializers.DictField()
+    
+    class Meta:
+        list_serializer_class = BookBatchUpdateListSerializer
@@ -1,13 +1,35 @@
+import csv
+import json
+import logging
+import time
+from datetime import timedelta
+from itertools import islice
+from urllib.parse import quote
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import Cast
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
 from apps.core.aspects.decorators import log_method_call
-from .models import Book
+from apps.core.utils.cache import bump_cache_version
+from apps.borrowings.models import BorrowingRecord
+from .models import Book, BookCopy, BookRecommendation
+
+logger = logging.getLogger(__name__)
 
 class BookService:
     """
     Service class for Book-related business logic.
     Follows Single Responsibility and Dependency Inversion principles.
     """
+    AUTOCOMPLETE_FIELDS = ('title', 'author')
+    AUTOCOMPLETE_CACHE_TIMEOUT = 60
+    AUTHOR_FACET_LIMIT = 20
     
     @staticmethod
     @log_method_call()
@@ -33,7 +55,9 @@ class BookService:
         if available_copies > total_copies:
             data['available_copies'] = total_copies
         
-        book = Book.objects.create(**data)
+        with transaction.atomic():
+            book = Book.objects.create(**data)
+            BookCopy.objects.sync_with_books([book])
         return book
     
     @staticmethod
@@ -42,12 +66,817 @@ class BookService:
         """Update an existing book."""
         if 'isbn' in data and data['isbn'] != book.isbn:
             BookService.validate_isbn(data['isbn'])
+        copies_changed = data.get('total_copies', book.total_copies) != book.total_copies
         
         for key, value in data.items():
             setattr(book, key, value)
         
-        if book.available_copies > book.total_copies:
+        # Only write the changed fields: available_copies may have moved
+        # since the book was read and is adjusted by the copy sync instead.
+        with transaction.atomic():
+            book.save(update_fields=[*data, 'updated_at'])
+            if copies_changed:
+                BookCopy.objects.sync_with_books([book])
+        return book
+    
+    @staticmethod
+    @log_method_call()
+    def bulk_create_books(items):
+        """Create a validated batch of books in one transaction."""
+        books = []
+        for data in items:
+            book = Book(**data)
             book.available_copies = book.total_copies
+            books.append(book)
+        
+        with transaction.atomic():
+            books = Book.objects.bulk_create(books)
+            BookCopy.objects.sync_with_books(books)
+            # bulk_create() sends no post_save signals.
+            bump_cache_version(Book)
+        return books
+    
+    @staticmethod
+    @log_method_call()
+    def bulk_update_books(updates):
+        """
+        Apply a validated batch of ``(book, data)`` updates in one
+        transaction.
+        """
+        now = timezone.now()
+        changed_fields = {'updated_at'}
+        books = []
+        previous_isbns = []
+        for book, data in updates:
+            if data.get('isbn', book.isbn) != book.isbn:
+                previous_isbns.append(book.isbn)
+            for key, value in data.items():
+                setattr(book, key, value)
+            changed_fields.update(data)
             
-        book.save()
-        return book
+            # bulk_update() skips auto_now, so stamp the rows ourselves.
+            book.updated_at = now
+            books.append(book)
+        
+        with transaction.atomic():
+            Book.objects.bulk_update(books, sorted(changed_fields))
+            if 'total_copies' in changed_fields:
+                BookCopy.objects.sync_with_books(books)
+            bump_cache_version(Book)
+            transaction.on_commit(lambda: BookLookupService.remove(previous_isbns))
+            transaction.on_commit(lambda: BookLookupService.store(books))
+        return books
+    
+    @staticmethod
+    @log_method_call()
+    def search_books(query):
+        """
+        Full-text search over title, author, publisher and description.
+        
+        Matches are found through the GIN index on ``search_vector`` and
+        ranked best first. The rank is cast to double precision so it
+        round-trips exactly through a pagination cursor.
+        """
+        search_query = SearchQuery(query, search_type='websearch', config='english')
+        return (
+            Book.objects.filter(search_vector=search_query)
+            .annotate(rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()))
+            .order_by('-rank', 'id')
+        )
+    
+    @staticmethod
+    @log_method_call()
+    def autocomplete(query, field='title', limit=10):
+        """
+        Return the top ``limit`` fuzzy matches of ``query`` against titles
+        or authors, with their word similarity score.
+        
+        Candidates come from the ``gin_trgm_ops`` index through the ``<%``
+        operator; results are cached briefly because typeahead traffic is
+        dominated by a few hot prefixes.
+        """
+        if field not in BookService.AUTOCOMPLETE_FIELDS:
+            raise ValidationError(_("Autocomplete field must be one of: title, author"))
+        
+        query = ' '.join(query.lower().split())
+        cache_key = f"books:autocomplete:{field}:{limit}:{quote(query)}"
+        suggestions = cache.get(cache_key)
+        if suggestions is not None:
+            return suggestions
+        
+        queryset = (
+            Book.objects.filter(**{f"{field}__trigram_word_similar": query})
+            .annotate(similarity=TrigramWordSimilarity(query, field))
+        )
+        if field == 'title':
+            queryset = queryset.values('id', 'title', 'author', 'similarity').order_by('-similarity', 'title', 'id')
+        else:
+            queryset = queryset.values('author', 'similarity').order_by('-similarity', 'author').distinct()
+        
+        suggestions = list(queryset[:limit])
+        cache.set(cache_key, suggestions, BookService.AUTOCOMPLETE_CACHE_TIMEOUT)
+        return suggestions
+    
+    @staticmethod
+    @log_method_call()
+    def get_facets(queryset):
+        """
+        Count ``queryset`` per author, per publication decade and by
+        availability in a single ``GROUPING SETS`` query.
+        
+        Only the most common authors are returned.
+        """
+        filtered = (
+            queryset.order_by()
+            .annotate(
+                decade=F('publication_year') / 10 * 10,
+                available=ExpressionWrapper(Q(available_copies__gt=0), output_field=BooleanField()),
+            )
+            .values('author', 'decade', 'available')
+        )
+        inner_sql, params = filtered.query.sql_with_params()
+        
+        # GROUPING(author, decade, available) is 3 for the author set.
+        sql = f"""
+            SELECT grouping_set, author, decade, available, total FROM (
+                SELECT author, decade, available, COUNT(*) AS total,
+                       GROUPING(author, decade, available) AS grouping_set,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY GROUPING(author, decade, available)
+                           ORDER BY COUNT(*) DESC, author, decade
+                       ) AS position
+                FROM ({inner_sql}) AS filtered
+                GROUP BY GROUPING SETS ((author), (decade), (available))
+            ) AS facets
+            WHERE grouping_set <> 3 OR position <= %s
+            ORDER BY grouping_set, position
+        """
+        
+        facets = {'author': [], 'decade': [], 'availability': {'available': 0, 'unavailable': 0}}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (*params, BookService.AUTHOR_FACET_LIMIT))
+            for grouping_set, author, decade, available, total in cursor.fetchall():
+                if grouping_set == 3:
+                    facets['author'].append({'value': author, 'count': total})
+                elif grouping_set == 5:
+                    facets['decade'].append({'value': decade, 'count': total})
+                else:
+                    facets['availability']['available' if available else 'unavailable'] = total
+        return facets
+
+
+class BookAvailabilityService:
+    """
+    Service class for the availability shown in cached book responses.
+    
+    Availability moves with every borrow, return and hold, far more often
+    than the rest of a book. Circulation bumps its own cache namespace
+    instead of Book's, and cached book responses have their availability
+    read afresh on every hit, so lending does not empty the catalog cache.
+    Only responses that filter or count by availability depend on it.
+    """
+    CACHE_NAMESPACE = 'books.availability'
+    FIELDS = ('available_copies', 'is_available')
+    
+    @staticmethod
+    def changed():
+        """Make cached responses that filter or count by availability stale."""
+        bump_cache_version(BookAvailabilityService.CACHE_NAMESPACE)
+    
+    @staticmethod
+    def refresh(request, payload):
+        """
+        Bring the availability in a cached book response up to date, with
+        one query. Returns None when the books cannot be matched by id.
+        """
+        items = payload['data'] if isinstance(payload['data'], list) else [payload['data']]
+        items = [item for item in items if set(item) & set(BookAvailabilityService.FIELDS)]
+        if not items:
+            return payload
+        if any('id' not in item for item in items):
+            return None
+        
+        current = dict(
+            Book.objects.filter(pk__in=[item['id'] for item in items]).values_list('pk', 'available_copies')
+        )
+        for item in items:
+            if item['id'] not in current:
+                return None
+            if 'available_copies' in item:
+                item['available_copies'] = current[item['id']]
+            if 'is_available' in item:
+                item['is_available'] = current[item['id']] > 0
+        return payload
+
+
+class BookLookupService:
+    """
+    Service class for ISBN lookups from barcode scanners.
+    
+    A Redis hash maps each live ISBN to a compact JSON summary of its book,
+    so a scan is a single ``HGET`` with no database work. The hash is filled
+    on a miss, kept current by the Book signals and rebuilt in bulk by the
+    ``rebuild_isbn_index`` command. Copy counts change on every loan and are
+    left out of the summary so that borrowing never has to touch the hash.
+    
+    Every removal bumps a generation counter. A fill only lands if the
+    generation is the one read before the database, so a summary read
+    before a book was deleted or re-numbered cannot be written back after
+    its entry was dropped.
+    
+    While a rebuild runs, the signals also note the ISBNs they write. The
+    rebuild reads those again before it swaps its hash in, so writes made
+    during the rebuild are not lost.
+    """
+    HASH_KEY = 'books:isbn'
+    GENERATION_KEY = 'books:isbn:generation'
+    REBUILD_KEY = 'books:isbn:rebuild'
+    REBUILDING_KEY = 'books:isbn:rebuilding'
+    CHANGED_KEY = 'books:isbn:rebuild:changed'
+    # Add the entry unless it exists or a removal happened since ARGV[1]
+    # was read.
+    FILL_SCRIPT = """
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+        return 0
+    end
+    return redis.call('HSETNX', KEYS[1], ARGV[2], ARGV[3])
+    """
+    # Note the ISBNs in ARGV as changed if a rebuild is running.
+    TRACK_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    return redis.call('SADD', KEYS[2], unpack(ARGV))
+    """
+    # Swap the rebuilt hash in and bump the generation, unless ISBNs were
+    # changed since the rebuild last read them.
+    SWAP_SCRIPT = """
+    if redis.call('SCARD', KEYS[3]) > 0 then
+        return 0
+    end
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('RENAME', KEYS[1], KEYS[2])
+    else
+        redis.call('DEL', KEYS[2])
+    end
+    redis.call('DEL', KEYS[4])
+    redis.call('INCR', KEYS[5])
+    return 1
+    """
+    SUMMARY_FIELDS = ('id', 'isbn', 'title', 'author', 'publication_year', 'publisher')
+    REBUILD_BATCH_SIZE = 5000
+    # A rebuild that dies stops the tracking after this long.
+    REBUILD_TIMEOUT = 60 * 60
+    
+    @staticmethod
+    def normalize_isbn(isbn):
+        """
+        Strip hyphens and spaces from ``isbn`` and turn a valid ISBN-10 into
+        the ISBN-13 the catalog stores. Anything else is returned stripped.
+        """
+        isbn = isbn.replace('-', '').replace(' ', '').upper()
+        if len(isbn) != 10 or not isbn[:9].isdigit() or not (isbn[9].isdigit() or isbn[9] == 'X'):
+            return isbn
+        digits = [int(char) for char in isbn[:9]] + [10 if isbn[9] == 'X' else int(isbn[9])]
+        if sum(weight * digit for weight, digit in zip(range(10, 0, -1), digits)) % 11:
+            return isbn
+        body = '978' + isbn[:9]
+        check = -sum(int(char) * (3 if position % 2 else 1) for position, char in enumerate(body)) % 10
+        return f"{body}{check}"
+    
+    @staticmethod
+    def summarize(book):
+        return {field: getattr(book, field) for field in BookLookupService.SUMMARY_FIELDS}
+    
+    @staticmethod
+    @log_method_call()
+    def get_by_isbn(isbn):
+        """Return the summary of the live book with ``isbn``, or ``None``."""
+        isbn = BookLookupService.normalize_isbn(isbn)
+        try:
+            pipeline = get_redis_connection('default').pipeline(transaction=False)
+            pipeline.hget(BookLookupService.HASH_KEY, isbn)
+            pipeline.get(BookLookupService.GENERATION_KEY)
+            cached, generation = pipeline.execute()
+        except RedisError:
+            logger.warning("ISBN index unavailable, falling back to the database", exc_info=True)
+            cached = generation = None
+        if cached is not None:
+            return json.loads(cached)
+        
+        summary = Book.objects.filter(isbn=isbn).values(*BookLookupService.SUMMARY_FIELDS).first()
+        if summary is not None:
+            try:
+                # HSETNX leaves a summary stored by a signal in place, and
+                # the generation check drops the fill if the entry was
+                # removed after the database read.
+                get_redis_connection('default').eval(
+                    BookLookupService.FILL_SCRIPT, 2,
+                    BookLookupService.HASH_KEY, BookLookupService.GENERATION_KEY,
+                    generation or b'0', isbn, json.dumps(summary)
+                )
+            except RedisError:
+                pass
+        return summary
+    
+    @staticmethod
+    def store(books):
+        """Write the summaries of ``books`` to the hash."""
+        mapping = {
+            book.isbn: json.dumps(BookLookupService.summarize(book)) for book in books
+        }
+        if not mapping:
+            return
+        try:
+            pipeline = get_redis_connection('default').pipeline()
+            pipeline.hset(BookLookupService.HASH_KEY, mapping=mapping)
+            BookLookupService._track(pipeline, mapping)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Could not update the ISBN index", exc_info=True)
+    
+    @staticmethod
+    def remove(isbns):
+        """Drop ``isbns`` from the hash."""
+        isbns = [isbn for isbn in isbns if isbn]
+        if not isbns:
+            return
+        try:
+            pipeline = get_redis_connection('default').pipeline()
+            pipeline.hdel(BookLookupService.HASH_KEY, *isbns)
+            pipeline.incr(BookLookupService.GENERATION_KEY)
+            BookLookupService._track(pipeline, isbns)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Could not update the ISBN index", exc_info=True)
+    
+    @staticmethod
+    def _track(pipeline, isbns):
+        pipeline.eval(
+            BookLookupService.TRACK_SCRIPT, 2,
+            BookLookupService.REBUILDING_KEY, BookLookupService.CHANGED_KEY, *isbns
+        )
+    
+    @staticmethod
+    @log_method_call()
+    def rebuild(batch_size=REBUILD_BATCH_SIZE):
+        """
+        Rebuild the whole hash from the database into a scratch key and swap
+        it in with ``RENAME``, so readers never see a partial index.
+        
+        ISBNs written by the signals meanwhile are read again before the
+        swap. The generation is bumped before the snapshot and by the swap,
+        so fills that read the database before either are dropped.
+        
+        Returns the number of ISBNs indexed.
+        """
+        redis = get_redis_connection('default')
+        redis.delete(BookLookupService.REBUILD_KEY, BookLookupService.CHANGED_KEY)
+        redis.set(BookLookupService.REBUILDING_KEY, 1, ex=BookLookupService.REBUILD_TIMEOUT)
+        redis.incr(BookLookupService.GENERATION_KEY)
+        
+        rows = Book.objects.order_by().values(*BookLookupService.SUMMARY_FIELDS).iterator(chunk_size=batch_size)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            redis.hset(BookLookupService.REBUILD_KEY, mapping={row['isbn']: json.dumps(row) for row in batch})
+        
+        while True:
+            pipeline = redis.pipeline()
+            pipeline.smembers(BookLookupService.CHANGED_KEY)
+            pipeline.delete(BookLookupService.CHANGED_KEY)
+            changed, _deleted = pipeline.execute()
+            if changed:
+                BookLookupService._reread(redis, {isbn.decode() for isbn in changed})
+            swapped = redis.eval(
+                BookLookupService.SWAP_SCRIPT, 5,
+                BookLookupService.REBUILD_KEY, BookLookupService.HASH_KEY, BookLookupService.CHANGED_KEY,
+                BookLookupService.REBUILDING_KEY, BookLookupService.GENERATION_KEY
+            )
+            if swapped:
+                return redis.hlen(BookLookupService.HASH_KEY)
+    
+    @staticmethod
+    def _reread(redis, isbns):
+        """Bring the entries of ``isbns`` in the rebuilt hash up to date."""
+        summaries = {
+            row['isbn']: json.dumps(row)
+            for row in Book.objects.filter(isbn__in=isbns).values(*BookLookupService.SUMMARY_FIELDS)
+        }
+        pipeline = redis.pipeline()
+        if summaries:
+            pipeline.hset(BookLookupService.REBUILD_KEY, mapping=summaries)
+        if isbns - set(summaries):
+            pipeline.hdel(BookLookupService.REBUILD_KEY, *(isbns - set(summaries)))
+        pipeline.execute()
+
+
+class BookTrendingService:
+    """
+    Service class for the most-borrowed books leaderboard.
+    
+    Every borrow increments the book's score in a Redis sorted set for the
+    current day. A window is the ``ZUNIONSTORE`` of its daily sets, cached
+    briefly, so reading the top books is a ``ZREVRANGE`` instead of a
+    ``GROUP BY`` over the whole borrowing history.
+    """
+    KEY_PREFIX = 'books:trending'
+    WINDOWS = (7, 30)
+    DAY_TTL = 60 * 60 * 24 * 32
+    WINDOW_CACHE_TIMEOUT = 60
+    
+    @staticmethod
+    def day_key(day):
+        return f"{BookTrendingService.KEY_PREFIX}:day:{day:%Y%m%d}"
+    
+    @staticmethod
+    def record_borrow(book_id):
+        """Count one borrow of ``book_id`` for today."""
+        key = BookTrendingService.day_key(timezone.localdate())
+        try:
+            pipeline = get_redis_connection('default').pipeline()
+            pipeline.zincrby(key, 1, book_id)
+            pipeline.expire(key, BookTrendingService.DAY_TTL)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Could not record borrow in the trending leaderboard", exc_info=True)
+    
+    @staticmethod
+    @log_method_call()
+    def get_trending(window=7, limit=10):
+        """
+        Return the ``limit`` most borrowed live books of the last ``window``
+        days with their borrow counts, most borrowed first. The list is
+        empty while Redis is unavailable.
+        """
+        today = timezone.localdate()
+        window_key = f"{BookTrendingService.KEY_PREFIX}:{window}d:{today:%Y%m%d}"
+        
+        try:
+            redis = get_redis_connection('default')
+            if not redis.exists(window_key):
+                day_keys = [
+                    BookTrendingService.day_key(today - timedelta(days=offset)) for offset in range(window)
+                ]
+                pipeline = redis.pipeline()
+                pipeline.zunionstore(window_key, day_keys)
+                pipeline.expire(window_key, BookTrendingService.WINDOW_CACHE_TIMEOUT)
+                pipeline.execute()
+            
+            # Over-fetch a little so that books deleted since can be skipped.
+            scores = redis.zrevrange(window_key, 0, limit * 2 - 1, withscores=True)
+        except RedisError:
+            logger.warning("Trending leaderboard unavailable", exc_info=True)
+            return []
+        book_ids = [int(member) for member, _score in scores]
+        books = Book.objects.only('id', 'title', 'author', 'isbn').in_bulk(book_ids)
+        
+        trending = []
+        for member, score in scores:
+            book = books.get(int(member))
+            if book is None:
+                continue
+            trending.append({
+                'id': book.id,
+                'title': book.title,
+                'author': book.author,
+                'isbn': book.isbn,
+                'borrow_count': int(score),
+            })
+            if len(trending) == limit:
+                break
+        return trending
+
+
+class BookRecommendationService:
+    """
+    Service class for "patrons who borrowed this also borrowed".
+    
+    Recommendations are computed offline from the borrowing history as an
+    item-item cosine similarity over a sparse patron x book matrix and
+    stored in ``BookRecommendation``, so serving them is one indexed read.
+    numpy and scipy are imported by the offline builder only, so web
+    workers never load them.
+    """
+    DEFAULT_TOP_K = 20
+    DEFAULT_MIN_COUNT = 2
+    FETCH_SIZE = 100000
+    WRITE_BATCH_SIZE = 5000
+    
+    @staticmethod
+    @log_method_call()
+    def get_recommendations(book_id, limit=10):
+        """Return the stored neighbours of ``book_id``, best first."""
+        rows = BookRecommendation.objects.filter(
+            book_id=book_id,
+            recommended_book__is_deleted=False
+        ).order_by('rank').values_list(
+            'recommended_book_id',
+            'recommended_book__title',
+            'recommended_book__author',
+            'recommended_book__isbn',
+            'score',
+        )[:limit]
+        return [
+            {'id': pk, 'title': title, 'author': author, 'isbn': isbn, 'score': score}
+            for pk, title, author, isbn, score in rows
+        ]
+    
+    @staticmethod
+    def read_pairs(fetch_size=FETCH_SIZE):
+        """
+        Stream the distinct ``(patron_id, book_id)`` borrowing pairs through a
+        server-side cursor into two int64 arrays.
+        """
+        import numpy as np
+        
+        table = BorrowingRecord._meta.db_table
+        patrons, books = [], []
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f'SELECT DISTINCT patron_id, book_id FROM {table}')
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                pairs = np.array(rows, dtype=np.int64)
+                patrons.append(pairs[:, 0])
+                books.append(pairs[:, 1])
+        if not patrons:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(patrons), np.concatenate(books)
+    
+    @staticmethod
+    def top_neighbours(patron_ids, book_ids, top_k=DEFAULT_TOP_K, min_count=DEFAULT_MIN_COUNT):
+        """
+        Return ``(book, neighbour, score, rank)`` arrays with the ``top_k``
+        most similar books of every book.
+        
+        The co-occurrence counts are ``X.T @ X`` for the binary patron x book
+        matrix ``X``; each count is divided by ``sqrt(n_a * n_b)``, the
+        borrower counts of both books, so popular books do not dominate every
+        list. Pairs seen fewer than ``min_count`` times are dropped as noise.
+        """
+        import numpy as np
+        from scipy import sparse
+        
+        empty = np.empty(0, dtype=np.int64)
+        if not len(book_ids):
+            return empty, empty, np.empty(0), empty
+        
+        patron_index = np.unique(patron_ids, return_inverse=True)[1]
+        books, book_index = np.unique(book_ids, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(book_index), dtype=np.float32), (patron_index, book_index)),
+            shape=(patron_index.max() + 1, len(books))
+        )
+        matrix.data[:] = 1  # Several loans of the same book count once.
+        
+        cooccurrence = (matrix.T @ matrix).tocoo()
+        borrowers = np.asarray(matrix.sum(axis=0)).ravel()
+        
+        keep = (cooccurrence.row != cooccurrence.col) & (cooccurrence.data >= min_count)
+        rows, cols, counts = cooccurrence.row[keep], cooccurrence.col[keep], cooccurrence.data[keep]
+        scores = counts / np.sqrt(borrowers[rows] * borrowers[cols])
+        
+        # Sort by book, then best score first, and keep the first top_k of each book.
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        starts = np.searchsorted(rows, rows, side='left')
+        ranks = np.arange(len(rows)) - starts
+        keep = ranks < top_k
+        
+        return books[rows[keep]], books[cols[keep]], scores[keep].astype(np.float64), ranks[keep] + 1
+    
+    @staticmethod
+    @log_method_call()
+    def rebuild(top_k=DEFAULT_TOP_K, min_count=DEFAULT_MIN_COUNT, fetch_size=FETCH_SIZE):
+        """
+        Recompute every book's recommendations and replace the stored ones
+        in a single transaction. Returns the number of rows written.
+        """
+        patron_ids, book_ids = BookRecommendationService.read_pairs(fetch_size)
+        books, neighbours, scores, ranks = BookRecommendationService.top_neighbours(
+            patron_ids, book_ids, top_k=top_k, min_count=min_count
+        )
+        
+        recommendations = (
+            BookRecommendation(book_id=book, recommended_book_id=neighbour, score=score, rank=rank)
+            for book, neighbour, score, rank in zip(
+                books.tolist(), neighbours.tolist(), scores.tolist(), ranks.tolist()
+            )
+        )
+        with transaction.atomic():
+            BookRecommendation.objects.all().delete()
+            while True:
+                batch = list(islice(recommendations, BookRecommendationService.WRITE_BATCH_SIZE))
+                if not batch:
+                    break
+                BookRecommendation.objects.bulk_create(batch)
+        return len(books)
+
+
+# Insert a batch of books given as column arrays and return the ones that
+# went in. A row whose ISBN is already taken, also by a book inserted
+# concurrently or soft-deleted, is skipped by the unique index instead of
+# failing the batch.
+INSERT_BOOKS_SQL = """
+INSERT INTO books_book
+    (title, author, isbn, publication_year, publisher, description, available_copies, total_copies,
+     is_deleted, created_at, updated_at)
+SELECT title, author, isbn, publication_year, publisher, description, total_copies, total_copies,
+       false, %(now)s, %(now)s
+FROM unnest(
+    %(titles)s::varchar[], %(authors)s::varchar[], %(isbns)s::varchar[], %(years)s::integer[],
+    %(publishers)s::varchar[], %(descriptions)s::text[], %(copies)s::integer[]
+) AS book(title, author, isbn, publication_year, publisher, description, total_copies)
+ON CONFLICT (isbn) DO NOTHING
+RETURNING id, isbn, total_copies
+"""
+
+
+class BookImportService:
+    """
+    Service class for loading large supplier catalogs.
+    
+    Rows are streamed from CSV or JSONL input and processed in batches:
+    each batch is validated in one pass and written with one
+    ``INSERT ... ON CONFLICT (isbn) DO NOTHING``, whose returned rows tell
+    the new books from the existing ISBNs.
+    """
+    FORMATS = ('csv', 'jsonl')
+    DEFAULT_BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+    
+    @staticmethod
+    def detect_format(filename, default='csv'):
+        """Guess the input format from a file name."""
+        if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        if filename and filename.lower().endswith('.csv'):
+            return 'csv'
+        return default
+    
+    @staticmethod
+    def read_rows(stream, file_format):
+        """
+        Yield ``(row_number, row)`` pairs from a text stream. Undecodable
+        JSONL lines are yielded as strings so they can be reported.
+        """
+        if file_format == 'csv':
+            # Row 1 is the header line.
+            for row_number, row in enumerate(csv.DictReader(stream), start=2):
+                yield row_number, row
+        elif file_format == 'jsonl':
+            for row_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = line
+                yield row_number, row
+        else:
+            raise ValidationError(_("Import format must be csv or jsonl"))
+    
+    @staticmethod
+    def is_valid_isbn13(isbn):
+        """Check the ISBN-13 format and check digit."""
+        if len(isbn) != 13 or not isbn.isdigit():
+            return False
+        total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(isbn))
+        return total % 10 == 0
+    
+    @staticmethod
+    def clean_row(row):
+        """
+        Validate a raw row and return ``(book_fields, errors)``.
+        Performs no database access.
+        """
+        if not isinstance(row, dict):
+            return None, [str(_("Row is not a valid JSON object"))]
+        
+        errors = []
+        data = {}
+        
+        for field in ('title', 'author'):
+            value = str(row.get(field) or '').strip()
+            if not value:
+                errors.append(str(_("{} is required").format(field)))
+            elif len(value) > 255:
+                errors.append(str(_("{} must be at most 255 characters").format(field)))
+            data[field] = value
+        
+        isbn = str(row.get('isbn') or '').replace('-', '').replace(' ', '')
+        if not BookImportService.is_valid_isbn13(isbn):
+            errors.append(str(_("ISBN must be a valid ISBN-13")))
+        data['isbn'] = isbn
+        
+        publisher = str(row.get('publisher') or '').strip()
+        if len(publisher) > 255:
+            errors.append(str(_("publisher must be at most 255 characters")))
+        data['publisher'] = publisher
+        data['description'] = str(row.get('description') or '').strip()
+        
+        for field, default in (('publication_year', None), ('total_copies', 1)):
+            value = row.get(field)
+            if value in (None, ''):
+                data[field] = default
+                continue
+            try:
+                data[field] = int(value)
+            except (TypeError, ValueError):
+                errors.append(str(_("{} must be a whole number").format(field)))
+                continue
+            if data[field] < 0:
+                errors.append(str(_("{} must not be negative").format(field)))
+        
+        data['available_copies'] = data.get('total_copies') or 0
+        return data, errors
+    
+    @staticmethod
+    @log_method_call()
+    def import_books(rows, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+        """
+        Import ``(row_number, row)`` pairs and return a summary report with
+        a per-row error list.
+        
+        ``on_batch`` is called with the running report after each batch.
+        """
+        report = {
+            'total_rows': 0,
+            'created': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'errors': [],
+        }
+        start_time = time.monotonic()
+        rows = iter(rows)
+        
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            BookImportService._import_batch(batch, report)
+            report['elapsed_seconds'] = round(time.monotonic() - start_time, 3)
+            if on_batch:
+                on_batch(report)
+        
+        elapsed = time.monotonic() - start_time
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['rows_per_second'] = round(report['total_rows'] / elapsed, 1) if elapsed else None
+        return report
+    
+    @staticmethod
+    def _import_batch(batch, report):
+        candidates = []
+        seen_isbns = set()
+        
+        for row_number, row in batch:
+            report['total_rows'] += 1
+            data, errors = BookImportService.clean_row(row)
+            if not errors and data['isbn'] in seen_isbns:
+                errors = [str(_("Duplicate ISBN within the import"))]
+            if errors:
+                report['failed'] += 1
+                report['errors'].append({
+                    'row': row_number,
+                    'isbn': data['isbn'] if data else None,
+                    'errors': errors,
+                })
+                continue
+            seen_isbns.add(data['isbn'])
+            candidates.append((row_number, data))
+        
+        conflicts = []
+        if candidates:
+            rows = [data for _row, data in candidates]
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(INSERT_BOOKS_SQL, {
+                        'titles': [data['title'] for data in rows],
+                        'authors': [data['author'] for data in rows],
+                        'isbns': [data['isbn'] for data in rows],
+                        'years': [data['publication_year'] for data in rows],
+                        'publishers': [data['publisher'] for data in rows],
+                        'descriptions': [data['description'] for data in rows],
+                        'copies': [data['total_copies'] for data in rows],
+                        'now': timezone.now(),
+                    })
+                    inserted = [
+                        Book(pk=pk, isbn=isbn, total_copies=total_copies, available_copies=total_copies)
+                        for pk, isbn, total_copies in cursor.fetchall()
+                    ]
+                BookCopy.objects.sync_with_books(inserted)
+                bump_cache_version(Book)
+            report['created'] += len(inserted)
+            inserted_isbns = {book.isbn for book in inserted}
+            conflicts = [(row, data['isbn']) for row, data in candidates if data['isbn'] not in inserted_isbns]
+        
+        for row_number, isbn in conflicts:
+            report['duplicates'] += 1
+            report['errors'].append({
+                'row': row_number,
+                'isbn': isbn,
+                'errors': [str(_("Book with this ISBN already exists"))],
+            })
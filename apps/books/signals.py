@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.utils.cache import bump_cache_version
+from .models import Book
+from .services import BookLookupService
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_cache(sender, **kwargs):
+    """Make cached book responses stale after any Book write."""
+    bump_cache_version(Book)
+
+
+@receiver(post_init, sender=Book)
+def remember_loaded_isbn(sender, instance, **kwargs):
+    """Note the ISBN a book was loaded with, unless the field was deferred."""
+    instance._loaded_isbn = instance.__dict__.get('isbn')
+
+
+@receiver(pre_save, sender=Book)
+def remember_previous_isbn(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored ISBN so the lookup index can drop it if it changes."""
+    if instance.pk is None or (update_fields is not None and 'isbn' not in update_fields):
+        instance._previous_isbn = None
+    elif instance._loaded_isbn is not None:
+        instance._previous_isbn = instance._loaded_isbn
+    else:
+        # The book was loaded without its ISBN.
+        instance._previous_isbn = Book.all_objects.filter(pk=instance.pk).values_list('isbn', flat=True).first()
+
+
+@receiver(post_save, sender=Book)
+def sync_isbn_index(sender, instance, update_fields=None, **kwargs):
+    """Refresh the ISBN lookup entry once the write is committed."""
+    if update_fields is not None and not set(update_fields) & {'is_deleted', *BookLookupService.SUMMARY_FIELDS}:
+        return
+
+    previous_isbn = getattr(instance, '_previous_isbn', None)
+    if update_fields is None or 'isbn' in update_fields:
+        instance._loaded_isbn = instance.isbn
+
+    def sync():
+        if previous_isbn != instance.isbn:
+            BookLookupService.remove([previous_isbn])
+        if instance.is_deleted:
+            BookLookupService.remove([instance.isbn])
+        else:
+            BookLookupService.store([instance])
+
+    transaction.on_commit(sync)
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_isbn_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: BookLookupService.remove([instance.isbn]))
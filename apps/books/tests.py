@@ -1,9 +1,31 @@
+import io
+import json
+from itertools import islice
+import numpy as np
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from apps.books.models import Book
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from apps.books.models import Book, BookCopy, BookRecommendation
+from apps.books.services import (
+    BookImportService,
+    BookLookupService,
+    BookRecommendationService,
+    BookService,
+    BookTrendingService
+)
+from apps.borrowings.models import BorrowingRecord
+from apps.borrowings.services import BorrowingService
+from apps.patrons.models import Patron
 
 User = get_user_model()
 
@@ -24,23 +46,23 @@ class BookAPITestCase(APITestCase):
             role='patron'
         )
         
-        self.book1 = Book.objects.create(
+        self.book1 = BookService.create_book(dict(
             title='Test Book 1',
             author='Test Author 1',
             isbn='1234567890123',
             publication_year=2020,
             available_copies=5,
             total_copies=5
-        )
+        ))
         
-        self.book2 = Book.objects.create(
+        self.book2 = BookService.create_book(dict(
             title='Test Book 2',
             author='Test Author 2',
             isbn='9876543210987',
             publication_year=2021,
             available_copies=3,
             total_copies=3
-        )
+        ))
         
         self.list_url = reverse('book-list')
         self.detail_url = reverse('book-detail', kwargs={'pk': self.book1.pk})
@@ -129,6 +151,24 @@ class BookAPITestCase(APITestCase):
         self.book1.refresh_from_db()
         self.assertEqual(self.book1.title, 'Updated Book Title')
     
+    def test_update_book_keeps_available_copies_in_step(self):
+        """Test that issuing and withdrawing copies moves available_copies, which clients cannot set"""
+        patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+        BorrowingService.borrow_book(self.book2, patron)
+        self.client.force_authenticate(user=self.librarian)
+        url = reverse('book-detail', kwargs={'pk': self.book2.pk})
+        update_data = {'title': 'Test Book 2', 'author': 'Test Author 2', 'isbn': '9876543210987'}
+        
+        response = self.client.patch(url, {**update_data, 'total_copies': 5, 'available_copies': 99}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['available_copies'], 4)
+        
+        self.client.patch(url, {**update_data, 'total_copies': 1}, format='json')
+        self.book2.refresh_from_db()
+        self.assertEqual(self.book2.available_copies, 0)
+        self.assertEqual(self.book2.copies.filter(status=BookCopy.AVAILABLE).count(), 0)
+        self.assertEqual(self.book2.copies.filter(status=BookCopy.ON_LOAN).count(), 1)
+    
     def test_update_book_as_patron(self):
         """Test updating a book as a patron (should be restricted)"""
         self.client.force_authenticate(user=self.patron)
@@ -150,6 +190,691 @@ class BookAPITestCase(APITestCase):
         self.client.force_authenticate(user=self.patron)
         response = self.client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(Book.objects.count(), 2)  
+        self.assertEqual(Book.objects.count(), 2)
 
-    
\ No newline at end of file
+    def test_list_books_cursor_pagination(self):
+        """Test walking the book list forwards and backwards with cursors"""
+        self.client.force_authenticate(user=self.patron)
+        Book.objects.create(title='Test Book 1', author='Another Author', isbn='1111111111111')
+        
+        response = self.client.get(self.list_url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first_page = [book['id'] for book in response.data['data']]
+        pagination = response.data['pagination']
+        self.assertEqual(len(first_page), 2)
+        self.assertIsNone(pagination['previous_cursor'])
+        self.assertIsNotNone(pagination['next_cursor'])
+        
+        response = self.client.get(self.list_url, {'page_size': 2, 'cursor': pagination['next_cursor']})
+        self.assertEqual([book['id'] for book in response.data['data']], [self.book2.pk])
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+        
+        response = self.client.get(
+            self.list_url, {'page_size': 2, 'cursor': response.data['pagination']['previous_cursor']}
+        )
+        self.assertEqual([book['id'] for book in response.data['data']], first_page)
+        self.assertIsNone(response.data['pagination']['previous_cursor'])
+    
+    def test_list_books_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(self.list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_search_books(self):
+        """Test full-text search ranks title matches above description matches"""
+        self.client.force_authenticate(user=self.patron)
+        title_match = Book.objects.create(
+            title='Dragons of Autumn', author='Margaret Weis', isbn='2222222222222'
+        )
+        description_match = Book.objects.create(
+            title='Atlas of Myths', author='Someone Else', isbn='3333333333333',
+            description='Includes a chapter about dragons.'
+        )
+        search_url = reverse('book-search')
+        
+        response = self.client.get(search_url, {'q': 'dragon', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['id'] for book in response.data['data']], [title_match.pk])
+        
+        response = self.client.get(
+            search_url, {'q': 'dragon', 'page_size': 1, 'cursor': response.data['pagination']['next_cursor']}
+        )
+        self.assertEqual([book['id'] for book in response.data['data']], [description_match.pk])
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+    
+    def test_search_books_requires_query(self):
+        """Test searching without a query"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(reverse('book-search'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['success'])
+    
+    def test_autocomplete_titles_and_authors(self):
+        """Test fuzzy typeahead suggestions for titles and authors"""
+        self.client.force_authenticate(user=self.patron)
+        harry = Book.objects.create(
+            title='Harry Potter and the Goblet of Fire', author='J. K. Rowling', isbn='4444444444444'
+        )
+        autocomplete_url = reverse('book-autocomplete')
+        
+        response = self.client.get(autocomplete_url, {'q': 'harr pott'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'][0]['id'], harry.pk)
+        self.assertGreater(response.data['data'][0]['similarity'], 0)
+        
+        response = self.client.get(autocomplete_url, {'q': 'rowlin', 'field': 'author'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([match['author'] for match in response.data['data']], ['J. K. Rowling'])
+    
+    def test_autocomplete_rejects_short_query(self):
+        """Test autocomplete with a one-character query"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(reverse('book-autocomplete'), {'q': 'h'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_filter_books(self):
+        """Test filtering the book list by author, year range and availability"""
+        self.client.force_authenticate(user=self.patron)
+        self.book2.available_copies = 0
+        self.book2.save()
+        
+        response = self.client.get(self.list_url, {'author': 'Test Author 2'})
+        self.assertEqual([book['id'] for book in response.data['data']], [self.book2.pk])
+        
+        response = self.client.get(self.list_url, {'year_min': 2021, 'year_max': 2030})
+        self.assertEqual([book['id'] for book in response.data['data']], [self.book2.pk])
+        
+        response = self.client.get(self.list_url, {'is_available': 'true'})
+        self.assertEqual([book['id'] for book in response.data['data']], [self.book1.pk])
+        
+        response = self.client.get(self.list_url, {'year_min': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_list_books_with_facets(self):
+        """Test facet counts are returned for the filtered list"""
+        self.client.force_authenticate(user=self.patron)
+        Book.objects.create(
+            title='Test Book 3', author='Test Author 1', isbn='6666666666666',
+            publication_year=1995, total_copies=1
+        )
+        self.book2.available_copies = 0
+        self.book2.save()
+        
+        response = self.client.get(self.list_url, {'facets': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        facets = response.data['facets']
+        self.assertEqual(facets['author'][0], {'value': 'Test Author 1', 'count': 2})
+        self.assertIn({'value': 2020, 'count': 2}, facets['decade'])
+        self.assertIn({'value': 1990, 'count': 1}, facets['decade'])
+        self.assertEqual(facets['availability'], {'available': 2, 'unavailable': 1})
+        
+        response = self.client.get(self.list_url)
+        self.assertNotIn('facets', response.data)
+    
+    def test_import_books_csv(self):
+        """Test bulk importing a CSV file with a per-row error report"""
+        self.client.force_authenticate(user=self.librarian)
+        Book.objects.create(title='Already There', author='Author C', isbn='9780140449136')
+        content = (
+            "title,author,isbn,publication_year,total_copies\n"
+            "Imported One,Author A,978-0-306-40615-7,2001,4\n"
+            "Bad Checksum,Author B,9780306406158,2001,1\n"
+            "Already There,Author C,9780140449136,2001,1\n"
+            "Missing Author,,9781861972712,2001,1\n"
+        )
+        upload = SimpleUploadedFile('catalog.csv', content.encode('utf-8'), content_type='text/csv')
+        
+        response = self.client.post(reverse('book-import-books'), {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report = response.data['data']
+        self.assertEqual(report['total_rows'], 4)
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['failed'], 2)
+        self.assertEqual(report['duplicates'], 1)
+        self.assertEqual([error['row'] for error in report['errors']], [3, 5, 4])
+        
+        book = Book.objects.get(isbn='9780306406157')
+        self.assertEqual(book.available_copies, 4)
+        self.assertEqual(book.copies.count(), 4)
+    
+    def test_import_books_counts_only_inserted_rows(self):
+        """Test that a book inserted by someone else after the duplicate check is reported as a duplicate"""
+        self.client.force_authenticate(user=self.librarian)
+        content = (
+            "title,author,isbn\n"
+            "New Book,Author A,9780306406157\n"
+            "Raced Book,Author B,9781861972712\n"
+        )
+        upload = SimpleUploadedFile('catalog.csv', content.encode('utf-8'), content_type='text/csv')
+        clean_row = BookImportService.clean_row
+        
+        def insert_and_clean(row):
+            # A concurrent import inserts one of the ISBNs while this one reads its rows.
+            if not Book.objects.filter(isbn='9781861972712').exists():
+                Book.objects.create(title='Raced Elsewhere', author='C', isbn='9781861972712')
+            return clean_row(row)
+        
+        with mock.patch.object(BookImportService, 'clean_row', side_effect=insert_and_clean):
+            response = self.client.post(reverse('book-import-books'), {'file': upload}, format='multipart')
+        
+        report = response.data['data']
+        self.assertEqual((report['created'], report['duplicates']), (1, 1))
+        self.assertEqual([error['row'] for error in report['errors']], [3])
+        self.assertEqual(Book.objects.get(isbn='9781861972712').title, 'Raced Elsewhere')
+    
+    def test_import_books_jsonl(self):
+        """Test bulk importing a JSONL file"""
+        self.client.force_authenticate(user=self.librarian)
+        lines = [
+            json.dumps({'title': 'Line One', 'author': 'Author A', 'isbn': '9780306406157'}),
+            'not json',
+            json.dumps({'title': 'Line One Again', 'author': 'Author A', 'isbn': '9780306406157'}),
+        ]
+        upload = SimpleUploadedFile('catalog.jsonl', '\n'.join(lines).encode('utf-8'))
+        
+        response = self.client.post(reverse('book-import-books'), {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['created'], 1)
+        self.assertEqual(len(response.data['data']['errors']), 2)
+    
+    def test_import_books_as_patron(self):
+        """Test importing books as a patron (should be restricted)"""
+        self.client.force_authenticate(user=self.patron)
+        upload = SimpleUploadedFile('catalog.csv', b"title,author,isbn\n")
+        response = self.client.post(reverse('book-import-books'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_book_copies_follow_total_copies(self):
+        """Test that copies are issued and withdrawn as total_copies changes"""
+        self.assertEqual(self.book1.copies.filter(status=BookCopy.AVAILABLE).count(), 5)
+        
+        BookService.update_book(self.book1, {'total_copies': 7})
+        self.assertEqual(self.book1.copies.filter(status=BookCopy.AVAILABLE).count(), 7)
+        
+        # Saves that leave total_copies alone do not touch the copies.
+        with mock.patch.object(BookCopy.objects, 'sync_with_books') as sync:
+            BookService.update_book(self.book1, {'title': 'Renamed', 'total_copies': 7})
+            self.book1.delete()
+        sync.assert_not_called()
+        
+        self.book1.copies.filter(pk=self.book1.copies.first().pk).update(status=BookCopy.ON_LOAN)
+        BookService.update_book(self.book1, {'total_copies': 2})
+        self.assertEqual(self.book1.copies.exclude(status=BookCopy.WITHDRAWN).count(), 2)
+        self.assertEqual(self.book1.copies.filter(status=BookCopy.ON_LOAN).count(), 1)
+        self.assertEqual(len(set(self.book1.copies.values_list('barcode', flat=True))), 7)
+        
+        # A counter already out of step is reported rather than clamped.
+        Book.all_objects.filter(pk=self.book1.pk).update(available_copies=0)
+        with self.assertLogs('apps.books.models', 'ERROR'):
+            BookService.update_book(self.book1, {'total_copies': 1})
+        self.assertEqual(Book.all_objects.get(pk=self.book1.pk).available_copies, 0)
+        self.assertEqual(self.book1.copies.filter(status=BookCopy.AVAILABLE).count(), 0)
+    
+    def test_batch_create_books(self):
+        """Test creating several books from a JSON array"""
+        self.client.force_authenticate(user=self.librarian)
+        batch = [
+            {'title': 'Batch One', 'author': 'Author A', 'isbn': '1000000000001', 'total_copies': 2},
+            {'title': 'Batch Two', 'author': 'Author B', 'isbn': '1000000000002'},
+        ]
+        response = self.client.post(self.list_url, batch, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = [Book.objects.get(isbn=item['isbn']).pk for item in batch]
+        self.assertEqual(response.data['data'], [
+            {'index': 0, 'id': created[0], 'status': 'created'},
+            {'index': 1, 'id': created[1], 'status': 'created'},
+        ])
+        self.assertEqual(Book.objects.get(isbn='1000000000001').available_copies, 2)
+        self.assertEqual(BookCopy.objects.filter(book__isbn='1000000000001').count(), 2)
+    
+    def test_batch_create_books_reports_item_errors(self):
+        """Test that an invalid item rejects the whole batch with per-item errors"""
+        self.client.force_authenticate(user=self.librarian)
+        batch = [
+            {'title': 'Batch One', 'author': 'Author A', 'isbn': '1000000000001'},
+            {'title': 'Batch Two', 'author': 'Author B', 'isbn': self.book1.isbn},
+            {'title': 'Batch Three', 'author': 'Author C', 'isbn': '1000000000001'},
+        ]
+        response = self.client.post(self.list_url, batch, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('isbn', errors[1])
+        self.assertIn('isbn', errors[2])
+        self.assertEqual(Book.objects.count(), 2)
+    
+    def test_batch_update_books(self):
+        """Test updating several books in one request"""
+        self.client.force_authenticate(user=self.librarian)
+        batch = [
+            {'id': self.book1.pk, 'fields': {'title': 'Renamed One'}},
+            {'id': self.book2.pk, 'fields': {'total_copies': 1}},
+        ]
+        response = self.client.patch(reverse('book-bulk-update'), batch, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], [
+            {'index': 0, 'id': self.book1.pk, 'status': 'updated'},
+            {'index': 1, 'id': self.book2.pk, 'status': 'updated'},
+        ])
+        self.book1.refresh_from_db()
+        self.book2.refresh_from_db()
+        self.assertEqual(self.book1.title, 'Renamed One')
+        self.assertEqual(self.book2.total_copies, 1)
+        self.assertEqual(self.book2.available_copies, 1)
+    
+    def test_batch_update_books_reports_item_errors(self):
+        """Test batch update errors for unknown books and taken ISBNs"""
+        self.client.force_authenticate(user=self.librarian)
+        batch = [
+            {'id': self.book1.pk, 'fields': {'isbn': self.book2.isbn}},
+            {'id': 999999, 'fields': {'title': 'Ghost'}},
+        ]
+        response = self.client.patch(reverse('book-bulk-update'), batch, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('isbn', response.data['errors'][0]['fields'])
+        self.assertIn('id', response.data['errors'][1])
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.isbn, '1234567890123')
+    
+    def test_batch_update_books_as_patron(self):
+        """Test batch updating books as a patron (should be restricted)"""
+        self.client.force_authenticate(user=self.patron)
+        batch = [{'id': self.book1.pk, 'fields': {'title': 'Nope'}}]
+        response = self.client.patch(reverse('book-bulk-update'), batch, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_retrieve_cache_is_shared_by_role(self):
+        """Test that librarians share one cached copy of a book"""
+        other_librarian = User.objects.create_user(
+            email='librarian2@example.com',
+            password='password123',
+            role='librarian'
+        )
+        self.client.force_authenticate(user=self.librarian)
+        self.client.get(self.detail_url)
+        
+        # A queryset update sends no signal, so the cached copy is still served.
+        Book.objects.filter(pk=self.book1.pk).update(title='Changed Quietly')
+        self.client.force_authenticate(user=other_librarian)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['data']['title'], 'Test Book 1')
+    
+    def test_retrieve_cache_invalidated_on_save(self):
+        """Test that saving a book makes its cached responses stale"""
+        self.client.force_authenticate(user=self.patron)
+        self.client.get(self.detail_url)
+        self.client.get(self.list_url)
+        
+        self.book1.title = 'Renamed Book'
+        self.book1.save()
+        
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['data']['title'], 'Renamed Book')
+        response = self.client.get(self.list_url)
+        self.assertIn('Renamed Book', [book['title'] for book in response.data['data']])
+    
+    def test_cached_books_show_current_availability(self):
+        """Test that lending keeps cached books but refreshes their availability"""
+        self.client.force_authenticate(user=self.patron)
+        self.client.get(self.detail_url)
+        self.client.get(self.list_url)
+        self.client.get(self.list_url, {'is_available': 'true'})
+        
+        # A queryset update sends no signal, so a changed title shows a cache hit.
+        Book.objects.filter(pk=self.book1.pk).update(title='Changed Quietly')
+        patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+        BorrowingService.borrow_book(self.book1, patron)
+        
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['data']['title'], 'Test Book 1')
+        self.assertEqual(response.data['data']['available_copies'], 4)
+        
+        Book.objects.filter(pk=self.book1.pk).update(available_copies=0)
+        response = self.client.get(self.list_url)
+        book = next(book for book in response.data['data'] if book['id'] == self.book1.pk)
+        self.assertEqual(book['title'], 'Test Book 1')
+        self.assertFalse(book['is_available'])
+        
+        # Lists filtered by availability are rebuilt after a loan.
+        response = self.client.get(self.list_url, {'is_available': 'true'})
+        self.assertEqual([book['title'] for book in response.data['data']], ['Test Book 2'])
+    
+    def test_list_books_sparse_fields(self):
+        """Test that ?fields= limits the payload and the columns read"""
+        self.client.force_authenticate(user=self.patron)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url, {'fields': 'id,title,is_available', 'facets': 'true'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['data'][0]), {'id', 'title', 'is_available'})
+        self.assertTrue(response.data['data'][0]['is_available'])
+        self.assertIn('facets', response.data)
+        page_query = next(q['sql'] for q in queries if 'LIMIT' in q['sql'])
+        self.assertNotIn('"description"', page_query)
+        self.assertNotIn('"isbn"', page_query)
+    
+    def test_retrieve_book_omit_fields(self):
+        """Test that ?omit= drops fields from a book"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(self.detail_url, {'omit': 'description,publisher'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', response.data['data'])
+        self.assertNotIn('publisher', response.data['data'])
+        self.assertEqual(response.data['data']['isbn'], self.book1.isbn)
+    
+    def test_list_books_unknown_sparse_field(self):
+        """Test that an unknown field name is rejected"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(self.list_url, {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_list_books_conditional_get(self):
+        """Test that an unchanged book list answers 304 to If-None-Match"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(self.list_url)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+        
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.book2.delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+    
+    def test_retrieve_book_conditional_get(self):
+        """Test conditional GET of a book with ETag and Last-Modified"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(self.detail_url)
+        etag = response.headers['ETag']
+        
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.book1.title = 'Changed Title'
+        self.book1.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['title'], 'Changed Title')
+    
+    def test_export_books_ndjson(self):
+        """Test streaming the filtered catalog as NDJSON"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(reverse('book-export'), {'author': 'Test Author 2', 'fields': 'id,isbn'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'id': self.book2.pk, 'isbn': self.book2.isbn}])
+    
+    def test_export_books_csv(self):
+        """Test streaming the catalog as CSV"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(reverse('book-export'), {'export_format': 'csv', 'fields': 'title,isbn'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['title,isbn', 'Test Book 1,1234567890123', 'Test Book 2,9876543210987'])
+    
+    def test_export_books_as_patron(self):
+        """Test exporting books as a patron (should be restricted)"""
+        self.client.force_authenticate(user=self.patron)
+        response = self.client.get(reverse('book-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookIsbnLookupTestCase(APITestCase):
+    """Test cases for the Redis-backed ISBN lookup"""
+    
+    def setUp(self):
+        """Set up test data"""
+        get_redis_connection('default').delete(BookLookupService.HASH_KEY, BookLookupService.GENERATION_KEY)
+        self.patron = User.objects.create_user(
+            email='patron@example.com',
+            password='password123',
+            role='patron'
+        )
+        self.book = Book.objects.create(
+            title='Scanned Book',
+            author='Scan Author',
+            isbn='9780306406157'
+        )
+        self.client.force_authenticate(user=self.patron)
+    
+    def lookup_url(self, isbn):
+        return reverse('book-isbn-lookup', kwargs={'isbn': isbn})
+    
+    def test_lookup_fills_index_on_miss(self):
+        """Test that a miss is served from the database and then from Redis"""
+        response = self.client.get(self.lookup_url('978-0-306-40615-7'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['id'], self.book.pk)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.lookup_url(self.book.isbn))
+        self.assertEqual(response.data['data']['title'], 'Scanned Book')
+    
+    def test_lookup_by_isbn10(self):
+        """Test that an ISBN-10 finds the book stored under its ISBN-13"""
+        response = self.client.get(self.lookup_url('0-306-40615-2'))
+        self.assertEqual(response.data['data']['id'], self.book.pk)
+        self.assertEqual(BookLookupService.normalize_isbn('0-8044-2957-x'), '9780804429573')
+        
+        # A wrong check digit is not converted and matches nothing.
+        response = self.client.get(self.lookup_url('0306406153'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_lookup_unknown_isbn(self):
+        """Test looking up an ISBN that is not in the catalog"""
+        response = self.client.get(self.lookup_url('9781861972712'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_signals_keep_index_current(self):
+        """Test that ISBN changes and deletes are applied to the index without reading the old ISBN"""
+        self.client.get(self.lookup_url(self.book.isbn))
+        
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            self.book.isbn = '9781861972712'
+            self.book.save()
+        self.assertIsNone(get_redis_connection('default').hget(BookLookupService.HASH_KEY, '9780306406157'))
+        self.assertEqual(self.client.get(self.lookup_url('9780306406157')).status_code, status.HTTP_404_NOT_FOUND)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertEqual(self.client.get(self.lookup_url('9781861972712')).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_fill_after_removal_is_dropped(self):
+        """Test that a miss does not write back an entry removed while it read the database"""
+        filter_books = Book.objects.filter
+        
+        def remove_during_read(*args, **kwargs):
+            BookLookupService.remove([self.book.isbn])
+            return filter_books(*args, **kwargs)
+        
+        with mock.patch.object(Book.objects, 'filter', side_effect=remove_during_read):
+            response = self.client.get(self.lookup_url(self.book.isbn))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_redis_connection('default').hget(BookLookupService.HASH_KEY, self.book.isbn))
+        
+        self.client.get(self.lookup_url(self.book.isbn))
+        self.assertIsNotNone(get_redis_connection('default').hget(BookLookupService.HASH_KEY, self.book.isbn))
+    
+    def test_rebuild_isbn_index_command(self):
+        """Test rebuilding the whole index from the database"""
+        call_command('rebuild_isbn_index', stdout=io.StringIO())
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.lookup_url(self.book.isbn))
+        self.assertEqual(response.data['data']['author'], 'Scan Author')
+    
+    def test_rebuild_keeps_writes_made_meanwhile(self):
+        """Test that index writes made while a rebuild runs survive its swap"""
+        other = Book.objects.create(title='Leaving Book', author='A', isbn='9781861972712')
+        redis = get_redis_connection('default')
+        generation = int(redis.get(BookLookupService.GENERATION_KEY) or 0)
+        read_batch = islice
+        
+        def write_after_snapshot(*args):
+            batch = list(read_batch(*args))
+            if batch and Book.objects.filter(pk=other.pk).exists():
+                # What the Book signals do for writes committed meanwhile.
+                Book.objects.filter(pk=self.book.pk).update(title='Renamed Meanwhile')
+                BookLookupService.store([Book.objects.get(pk=self.book.pk)])
+                other.delete()
+                BookLookupService.remove([other.isbn])
+            return batch
+        
+        with mock.patch('apps.books.services.islice', side_effect=write_after_snapshot):
+            self.assertEqual(BookLookupService.rebuild(), 1)
+        
+        self.assertEqual(self.client.get(self.lookup_url(self.book.isbn)).data['data']['title'], 'Renamed Meanwhile')
+        self.assertIsNone(redis.hget(BookLookupService.HASH_KEY, other.isbn))
+        # One bump for the removal, one before the snapshot and one at the swap.
+        self.assertEqual(int(redis.get(BookLookupService.GENERATION_KEY)), generation + 3)
+
+
+class BookTrendingTestCase(APITestCase):
+    """Test cases for the trending books leaderboard"""
+    
+    def setUp(self):
+        """Set up test data"""
+        redis = get_redis_connection('default')
+        for key in redis.scan_iter(f"{BookTrendingService.KEY_PREFIX}:*"):
+            redis.delete(key)
+        
+        self.patron = User.objects.create_user(
+            email='patron@example.com',
+            password='password123',
+            role='patron'
+        )
+        self.popular = Book.objects.create(title='Popular', author='A', isbn='9780306406157')
+        self.steady = Book.objects.create(title='Steady', author='B', isbn='9781861972712')
+        self.client.force_authenticate(user=self.patron)
+    
+    def record(self, book, days_ago, times):
+        key = BookTrendingService.day_key(timezone.localdate() - timezone.timedelta(days=days_ago))
+        get_redis_connection('default').zincrby(key, times, book.pk)
+    
+    def test_trending_windows(self):
+        """Test that the 7 and 30 day windows roll up the daily counts"""
+        for _ in range(3):
+            BookTrendingService.record_borrow(self.popular.pk)
+        self.record(self.steady, days_ago=2, times=2)
+        self.record(self.steady, days_ago=20, times=5)
+        
+        response = self.client.get(reverse('book-trending'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(book['title'], book['borrow_count']) for book in response.data['data']],
+            [('Popular', 3), ('Steady', 2)]
+        )
+        
+        response = self.client.get(reverse('book-trending'), {'window': 30})
+        self.assertEqual(
+            [(book['title'], book['borrow_count']) for book in response.data['data']],
+            [('Steady', 7), ('Popular', 3)]
+        )
+    
+    def test_trending_skips_deleted_books(self):
+        """Test that deleted books drop out of the leaderboard"""
+        self.record(self.popular, days_ago=0, times=4)
+        self.record(self.steady, days_ago=0, times=1)
+        self.popular.delete()
+        
+        response = self.client.get(reverse('book-trending'), {'limit': 1})
+        self.assertEqual([book['title'] for book in response.data['data']], ['Steady'])
+    
+    def test_trending_without_redis(self):
+        """Test that the leaderboard is empty rather than failing while Redis is down"""
+        with mock.patch('apps.books.services.get_redis_connection', side_effect=RedisError):
+            response = self.client.get(reverse('book-trending'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], [])
+    
+    def test_trending_invalid_window(self):
+        """Test requesting an unsupported window"""
+        response = self.client.get(reverse('book-trending'), {'window': 14})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookRecommendationTestCase(APITestCase):
+    """Test cases for "patrons who borrowed this also borrowed" recommendations"""
+    
+    def setUp(self):
+        """Set up a small borrowing history"""
+        self.patron = User.objects.create_user(
+            email='patron@example.com',
+            password='password123',
+            role='patron'
+        )
+        self.client.force_authenticate(user=self.patron)
+        
+        self.dune = Book.objects.create(title='Dune', author='A', isbn='9780306406157')
+        self.messiah = Book.objects.create(title='Messiah', author='A', isbn='9781861972712')
+        self.cookbook = Book.objects.create(title='Cookbook', author='B', isbn='9780140449136')
+        
+        history = {
+            'P1': [self.dune, self.messiah],
+            'P2': [self.dune, self.messiah, self.cookbook],
+            'P3': [self.dune, self.cookbook],
+            'P4': [self.dune, self.messiah],
+        }
+        for member_id, books in history.items():
+            patron = Patron.objects.create(
+                first_name=member_id, last_name='Reader', email=f'{member_id}@example.com', member_id=member_id
+            )
+            for book in books:
+                BorrowingRecord.objects.create(
+                    book=book,
+                    patron=patron,
+                    due_date=timezone.now() + timezone.timedelta(days=14),
+                    status=BorrowingRecord.RETURNED
+                )
+    
+    def test_top_neighbours(self):
+        """Test cosine scores and ranking of the co-occurrence matrix"""
+        books, neighbours, scores, ranks = BookRecommendationService.top_neighbours(
+            np.array([1, 1, 2, 2, 2, 3]), np.array([10, 20, 10, 20, 30, 30]), top_k=1, min_count=1
+        )
+        
+        self.assertEqual(list(zip(books, neighbours, ranks)), [(10, 20, 1), (20, 10, 1), (30, 10, 1)])
+        self.assertAlmostEqual(scores[0], 1.0)
+        self.assertAlmostEqual(scores[2], 0.5)
+    
+    def test_build_and_read_recommendations(self):
+        """Test building the table and reading a book's recommendations"""
+        call_command('build_recommendations', '--min-count', '1', stdout=io.StringIO())
+        
+        url = reverse('book-recommendations', kwargs={'pk': self.dune.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['title'] for book in response.data['data']], ['Messiah', 'Cookbook'])
+        self.assertGreater(response.data['data'][0]['score'], response.data['data'][1]['score'])
+    
+    def test_recommendations_min_count(self):
+        """Test that pairs with too few shared borrowers are left out"""
+        call_command('build_recommendations', '--min-count', '3', stdout=io.StringIO())
+        
+        response = self.client.get(reverse('book-recommendations', kwargs={'pk': self.cookbook.pk}))
+        self.assertEqual(response.data['data'], [])
+        self.assertEqual(BookRecommendation.objects.count(), 2)
+    
+    def test_recommendations_for_unknown_book(self):
+        """Test that unknown and deleted books are not found"""
+        response = self.client.get(reverse('book-recommendations', kwargs={'pk': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        self.cookbook.delete()
+        response = self.client.get(reverse('book-recommendations', kwargs={'pk': self.cookbook.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,28 +1,58 @@
+import io
 from django.shortcuts import render
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from django.utils.translation import gettext_lazy as _
 from apps.core.mixins.response_mixins import ResponseMixin
+from apps.core.mixins.export_mixins import ExportMixin
+from apps.core.utils.cache import cache_response
+from apps.core.utils.conditional import conditional_get, detail_validators, list_validators
 from apps.authentication.permissions import IsLibrarian
 from apps.core.aspects.decorators import log_method_call
 from apps.core.aspects.decorators import measure_performance
+from apps.core.utils.pagination import KeysetPagination
+from .filters import BookFilterBackend
 from .models import Book
-from .serializers import BookSerializer, BookListSerializer
-from .services import BookService
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page 
-from django.views.decorators.vary import vary_on_headers
+from .serializers import (
+    BookSerializer,
+    BookListSerializer,
+    BookBatchItemSerializer,
+    BookBatchUpdateSerializer
+)
+from .services import (
+    BookService,
+    BookAvailabilityService,
+    BookImportService,
+    BookLookupService,
+    BookRecommendationService,
+    BookTrendingService
+)
 
 
 # Create your views here.
 
-class BookViewSet(ResponseMixin, viewsets.ModelViewSet):
+def availability_namespaces(request):
+    """Lists filtered or faceted by availability are also stale once it moves."""
+    params = request.query_params
+    if params.get('is_available') or params.get('facets', '').lower() in BookFilterBackend.TRUE_VALUES:
+        return [BookAvailabilityService.CACHE_NAMESPACE]
+    return []
+
+
+class BookViewSet(ResponseMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for Book model.
     Provides CRUD operations with proper permissions and responses.
     """
     queryset = Book.objects.all()
+    batch_max_size = 1000
+    export_filename = 'books'
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [BookFilterBackend]
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -35,29 +65,145 @@ class BookViewSet(ResponseMixin, viewsets.ModelViewSet):
         Instantiate and return the list of permissions that this view requires.
         Only librarians can create, update or delete books.
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_books', 'bulk_update',
+                           'export']:
             permission_classes = [IsAuthenticated, IsLibrarian]
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def get_queryset(self):
+        """Only read the columns behind the fields requested with ``fields``/``omit``."""
+        return self.get_serializer_class().sparse_queryset(super().get_queryset(), self.request)
+    
     @log_method_call("Book List Request")
     @measure_performance("Book List Performance")
-    @method_decorator(vary_on_headers('Authorization'))
-    @method_decorator(cache_page(timeout=60 * 5))
+    @conditional_get(list_validators)
+    @cache_response(Book, vary_on=availability_namespaces, refresh=BookAvailabilityService.refresh)
     def list(self, request, *args, **kwargs):
-        """Get paginated list of books."""
-        queryset = self.filter_queryset(self.get_queryset())      
-        serializer = self.get_serializer(queryset, many=True)
-        return self.send_success_response(
+        """
+        Get a cursor-paginated list of books ordered by title.
+        Pass ``facets=true`` to also receive counts for the filtered list.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        
+        facets = None
+        if request.query_params.get('facets', '').lower() in BookFilterBackend.TRUE_VALUES:
+            facets = BookService.get_facets(queryset)
+        
+        return self.send_paginated_response(
+            data=serializer.data,
+            message=_("Books retrieved successfully"),
+            facets=facets
+        )
+    
+    @log_method_call("Book Search Request")
+    @measure_performance("Book Search Performance")
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over the catalog, best matches first."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return self.send_error_response(
+                message=_("Search query is required"),
+                errors={"q": [_("This query parameter is required.")]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = BookListSerializer.sparse_queryset(BookService.search_books(query), request)
+        queryset = self.filter_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        serializer = BookListSerializer(page, many=True, context=self.get_serializer_context())
+        return self.send_paginated_response(
             data=serializer.data,
-            message=_("Books retrieved successfully")
+            message=_("Search results retrieved successfully")
+        )
+    
+    @log_method_call("Book Autocomplete Request")
+    @measure_performance("Book Autocomplete Performance")
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """As-you-type suggestions for book titles or authors."""
+        query = request.query_params.get('q', '').strip()
+        field = request.query_params.get('field', 'title')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        if len(query) < 2:
+            return self.send_error_response(
+                message=_("Autocomplete query is too short"),
+                errors={"q": [_("Enter at least 2 characters.")]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        suggestions = BookService.autocomplete(query, field=field, limit=limit)
+        return self.send_success_response(
+            data=suggestions,
+            message=_("Suggestions retrieved successfully")
+        )
+    
+    @log_method_call("Book Trending Request")
+    @measure_performance("Book Trending Performance")
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Most borrowed books over the last 7 or 30 days."""
+        try:
+            window = int(request.query_params.get('window', 7))
+        except ValueError:
+            window = None
+        if window not in BookTrendingService.WINDOWS:
+            return self.send_error_response(
+                message=_("Unsupported trending window"),
+                errors={"window": [_("Choose one of: 7, 30.")]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        return self.send_success_response(
+            data=BookTrendingService.get_trending(window=window, limit=limit),
+            message=_("Trending books retrieved successfully")
+        )
+    
+    @log_method_call("Book Recommendations Request")
+    @measure_performance("Book Recommendations Performance")
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, pk=None):
+        """Books most often borrowed by the patrons who borrowed this one."""
+        book = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), BookRecommendationService.DEFAULT_TOP_K)
+        except ValueError:
+            limit = 10
+        
+        return self.send_success_response(
+            data=BookRecommendationService.get_recommendations(book.pk, limit=limit),
+            message=_("Recommendations retrieved successfully")
+        )
+    
+    @log_method_call("Book ISBN Lookup")
+    @measure_performance("Book ISBN Lookup Performance")
+    @action(detail=False, methods=['get'], url_path=r'isbn/(?P<isbn>[0-9][0-9 -]*[Xx]?)')
+    def isbn_lookup(self, request, isbn):
+        """Resolve a scanned ISBN to a book summary, served from Redis."""
+        summary = BookLookupService.get_by_isbn(isbn)
+        if summary is None:
+            raise NotFound(_("No book with this ISBN."))
+        return self.send_success_response(
+            data=summary,
+            message=_("Book details retrieved successfully")
         )
     
     @log_method_call("Book Retrieval")
     @measure_performance("Book Retrieval Performance")
-    @method_decorator(vary_on_headers('Authorization'))
-    @method_decorator(cache_page(timeout=60 * 5))
+    @conditional_get(detail_validators)
+    @cache_response(Book, refresh=BookAvailabilityService.refresh)
     def retrieve(self, request, *args, **kwargs):
         """Get a single book by ID."""
         instance = self.get_object()
@@ -70,7 +216,10 @@ class BookViewSet(ResponseMixin, viewsets.ModelViewSet):
     @log_method_call("Book Creation")
     @measure_performance("Book Creation Performance")
     def create(self, request, *args, **kwargs):
-        """Create a new book."""
+        """Create a new book, or a batch of books from a JSON array."""
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -82,6 +231,21 @@ class BookViewSet(ResponseMixin, viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
+    def bulk_create(self, request):
+        """Create a batch of books in one transaction."""
+        serializer = BookBatchItemSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.batch_max_size
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        books = BookService.bulk_create_books(serializer.validated_data)
+        
+        return self.send_success_response(
+            data=[{'index': index, 'id': book.pk, 'status': 'created'} for index, book in enumerate(books)],
+            message=_("Books created successfully"),
+            status=status.HTTP_201_CREATED
+        )
+    
     @log_method_call("Book Update")
     @measure_performance("Book Update Performance")
     def update(self, request, *args, **kwargs):
@@ -97,6 +261,54 @@ class BookViewSet(ResponseMixin, viewsets.ModelViewSet):
             message=_("Book updated successfully")
         )
     
+    @log_method_call("Book Import")
+    @measure_performance("Book Import Performance")
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_books(self, request):
+        """Bulk import books from an uploaded CSV or JSONL file."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return self.send_error_response(
+                message=_("An import file is required"),
+                errors={"file": [_("Upload a CSV or JSONL file.")]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file_format = request.data.get('file_format') or BookImportService.detect_format(upload.name)
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            report = BookImportService.import_books(BookImportService.read_rows(stream, file_format))
+        except UnicodeDecodeError:
+            return self.send_error_response(
+                message=_("Import file must be UTF-8 encoded"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        report['errors_truncated'] = len(report['errors']) > BookImportService.MAX_REPORTED_ERRORS
+        report['errors'] = report['errors'][:BookImportService.MAX_REPORTED_ERRORS]
+        return self.send_success_response(
+            data=report,
+            message=_("Books imported successfully"),
+            status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK
+        )
+    
+    @log_method_call("Book Bulk Update")
+    @measure_performance("Book Bulk Update Performance")
+    @action(detail=False, methods=['patch'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Update a batch of books given as a list of ``{id, fields}``."""
+        serializer = BookBatchUpdateSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=self.batch_max_size
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        books = BookService.bulk_update_books(serializer.validated_data)
+        
+        return self.send_success_response(
+            data=[{'index': index, 'id': book.pk, 'status': 'updated'} for index, book in enumerate(books)],
+            message=_("Books updated successfully")
+        )
+    
     @log_method_call("Book Deletion")
     def destroy(self, request, *args, **kwargs):
         """Soft delete a book."""
@@ -0,0 +1,111 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import BorrowingRecord, Hold
+
+
+class BorrowingFilterBackend(BaseFilterBackend):
+    """
+    Filter borrowing records by status, patron, book and borrow date.
+
+    Query parameters: ``status`` (one or more, comma-separated), ``patron``
+    and ``book`` (ids), ``borrowed_from`` and ``borrowed_to`` (ISO dates or
+    datetimes, inclusive). Each filter has a composite index ending in
+    ``(borrow_date, id)`` so the filtered list is still read in keyset order.
+    """
+    STATUSES = {choice for choice, _label in BorrowingRecord.STATUS_CHOICES}
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if params.get('status'):
+            statuses = [value.strip() for value in params['status'].split(',') if value.strip()]
+            if not set(statuses) <= self.STATUSES:
+                raise ValidationError({'status': [
+                    _("Choose from: %(statuses)s.") % {'statuses': ', '.join(sorted(self.STATUSES))}
+                ]})
+            queryset = queryset.filter(status__in=statuses)
+
+        for name in ('patron', 'book'):
+            value = self.parse_id(params, name)
+            if value is not None:
+                queryset = queryset.filter(**{f'{name}_id': value})
+
+        borrowed_from = self.parse_moment(params, 'borrowed_from')
+        if borrowed_from is not None:
+            queryset = queryset.filter(borrow_date__gte=borrowed_from)
+
+        borrowed_to = self.parse_moment(params, 'borrowed_to', end_of_day=True)
+        if borrowed_to is not None:
+            queryset = queryset.filter(borrow_date__lt=borrowed_to)
+
+        return queryset
+
+    @staticmethod
+    def parse_id(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: [_("Must be an id.")]})
+
+    @staticmethod
+    def parse_moment(params, name, end_of_day=False):
+        """
+        Parse an ISO date or datetime. A bare date means the start of that
+        day, or with ``end_of_day`` the start of the next one, so that the
+        bound stays a plain range on the indexed column.
+        """
+        value = params.get(name)
+        if not value:
+            return None
+
+        # Try the date first: parse_datetime also accepts a bare date.
+        try:
+            day = parse_date(value)
+            moment = parse_datetime(value) if day is None else None
+        except ValueError:
+            moment = day = None
+
+        if day is not None:
+            if end_of_day:
+                day += timedelta(days=1)
+            return timezone.make_aware(datetime.combine(day, time.min))
+        if moment is None:
+            raise ValidationError({name: [_("Must be a date, e.g. 2025-03-15.")]})
+
+        if end_of_day:
+            moment += timedelta(microseconds=1)
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+class HoldFilterBackend(BaseFilterBackend):
+    """
+    Filter holds by status (one or more, comma-separated), ``patron`` and
+    ``book``.
+    """
+    STATUSES = {choice for choice, _label in Hold.STATUS_CHOICES}
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if params.get('status'):
+            statuses = [value.strip() for value in params['status'].split(',') if value.strip()]
+            if not set(statuses) <= self.STATUSES:
+                raise ValidationError({'status': [
+                    _("Choose from: %(statuses)s.") % {'statuses': ', '.join(sorted(self.STATUSES))}
+                ]})
+            queryset = queryset.filter(status__in=statuses)
+
+        for name in ('patron', 'book'):
+            value = BorrowingFilterBackend.parse_id(params, name)
+            if value is not None:
+                queryset = queryset.filter(**{f'{name}_id': value})
+
+        return queryset
@@ -0,0 +1,93 @@
+import statistics
+import threading
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.books.models import Book, BookCopy
+from apps.books.services import BookService
+from apps.borrowings.models import BorrowingRecord
+from apps.borrowings.services import BorrowingService
+from apps.patrons.models import Patron
+
+class Command(BaseCommand):
+    help = 'Borrow one title from many threads at once and check the availability counters for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50, help='Concurrent borrowers')
+        parser.add_argument('--borrows-per-thread', type=int, default=4, help='Borrow attempts per thread')
+        parser.add_argument('--copies', type=int, default=100, help='Copies of the benchmark title')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark book, patrons and loans')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        attempts = threads * options['borrows_per_thread']
+        copies = options['copies']
+        tag = f"{time.time_ns() % 10 ** 10:010d}"
+        
+        book = BookService.create_book(dict(
+            title=f'Contention benchmark {tag}',
+            author='Benchmark',
+            isbn=f'999{tag}',
+            total_copies=copies
+        ))
+        patrons = Patron.objects.bulk_create(
+            Patron(first_name='Bench', last_name=str(i), email=f'bench-{tag}-{i}@example.com', member_id=f'B{tag}{i}')
+            for i in range(attempts)
+        )
+        
+        self.stdout.write(f'{threads} threads making {attempts} borrows of a title with {copies} copies')
+        borrowed, rejected, latencies = [], [], []
+        barrier = threading.Barrier(threads)
+        
+        def borrower(index):
+            try:
+                barrier.wait()
+                for patron in patrons[index::threads]:
+                    start = time.monotonic()
+                    try:
+                        BorrowingService.borrow_book(book, patron)
+                        borrowed.append(patron.pk)
+                    except ValidationError:
+                        rejected.append(patron.pk)
+                    latencies.append(time.monotonic() - start)
+            finally:
+                connection.close()
+        
+        workers = [threading.Thread(target=borrower, args=(index,)) for index in range(threads)]
+        start = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - start
+        
+        book.refresh_from_db()
+        loans = BorrowingRecord.objects.filter(book=book)
+        loaned_copies = loans.values('copy').distinct().count()
+        on_loan = BookCopy.objects.filter(book=book, status=BookCopy.ON_LOAN).count()
+        expected = min(copies, attempts)
+        
+        latencies.sort()
+        self.stdout.write(
+            f'{len(borrowed)} borrowed, {len(rejected)} rejected in {elapsed:.2f}s '
+            f'({attempts / elapsed:.0f} borrows/s); latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms'
+        )
+        self.stdout.write(
+            f'available_copies={book.available_copies}, loans={loans.count()}, '
+            f'copies on loan={on_loan}, distinct copies loaned={loaned_copies}'
+        )
+        
+        drifted = not (
+            len(borrowed) == loans.count() == on_loan == loaned_copies == expected
+            and book.available_copies == copies - expected
+        )
+        
+        if not options['keep']:
+            Book.all_objects.filter(pk=book.pk).delete()
+            Patron.all_objects.filter(pk__in=[patron.pk for patron in patrons]).delete()
+        
+        if drifted:
+            raise CommandError('Availability counters drifted under concurrency.')
+        self.stdout.write(self.style.SUCCESS('No drift: every borrow took exactly one copy.'))
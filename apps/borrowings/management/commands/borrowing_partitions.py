@@ -0,0 +1,216 @@
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+TABLE = 'borrowings_borrowingrecord'
+DEFAULT_PARTITION = f'{TABLE}_default'
+LEGACY = f'{TABLE}_legacy'
+ACTIVE = "('pending', 'borrowed', 'overdue')"
+BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def month_start(moment, months=0):
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def parse_bound(value):
+    return None if value in ('MINVALUE', 'MAXVALUE') else datetime.fromisoformat(value.strip("'"))
+
+
+class Command(BaseCommand):
+    help = ('Create the coming monthly partitions of the borrowing records and detach, archive or drop '
+            'partitions older than a cutoff')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Make sure partitions exist from this month to this many months ahead')
+        parser.add_argument('--archive-before', metavar='YYYY-MM',
+                            help='Detach partitions holding only loans borrowed before this month')
+        parser.add_argument('--archive-dir', help='Write each detached partition to <dir>/<partition>.csv')
+        parser.add_argument('--drop', action='store_true', help='Drop detached partitions once archived')
+        parser.add_argument('--split-legacy', type=int, default=0, metavar='MONTHS',
+                            help='Move up to this many of the oldest months out of the legacy partition')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done')
+
+    def handle(self, *args, **options):
+        if options['drop'] and not options['archive_dir']:
+            raise CommandError('--drop needs --archive-dir, so that dropped loans are kept somewhere')
+        cutoff = None
+        if options['archive_before']:
+            try:
+                cutoff = datetime.strptime(options['archive_before'], '%Y-%m').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                raise CommandError('--archive-before must look like 2024-01')
+            if cutoff > month_start(timezone.now()):
+                raise CommandError('--archive-before cannot be later than the current month')
+
+        if options['split_legacy'] < 0:
+            raise CommandError('--split-legacy must not be negative')
+
+        for _ in range(options['split_legacy']):
+            if not self.split_legacy(options['dry_run']):
+                break
+
+        this_month = month_start(timezone.now())
+        for months in range(options['months_ahead'] + 1):
+            self.create_partition(month_start(this_month, months), month_start(this_month, months + 1),
+                                  options['dry_run'])
+
+        if cutoff:
+            for name, lower, upper in self.get_partitions():
+                if upper is not None and upper <= cutoff:
+                    self.archive_partition(name, options['archive_dir'], options['drop'], options['dry_run'])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {DEFAULT_PARTITION}")
+            stray = cursor.fetchone()[0]
+        if stray:
+            self.stdout.write(self.style.WARNING(
+                f'{stray} loans are in {DEFAULT_PARTITION}; run with a larger --months-ahead to move them'
+            ))
+
+    @staticmethod
+    def get_partitions():
+        """Return ``(name, lower, upper)`` for every range partition, oldest first."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+                "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = %s::regclass",
+                [TABLE]
+            )
+            rows = cursor.fetchall()
+
+        partitions = []
+        for name, bound in rows:
+            match = BOUND_RE.search(bound)
+            if match:
+                partitions.append((name, parse_bound(match.group(1)), parse_bound(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition[1] or datetime.min.replace(tzinfo=dt_timezone.utc))
+
+    def create_partition(self, start, end, dry_run):
+        """
+        Create the partition for ``[start, end)`` unless one already covers
+        part of it. Loans that landed in the default partition for want of
+        it are moved across in the same transaction.
+        """
+        for name, lower, upper in self.get_partitions():
+            if (lower is None or lower < end) and (upper is None or upper > start):
+                return
+
+        name = f'{TABLE}_p{start:%Y_%m}'
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        if dry_run:
+            self.stdout.write(f'Would create {name}')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE borrow_date >= %s AND borrow_date < %s)",
+                [start, end]
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES {bounds}")
+            else:
+                cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE borrow_date >= %s AND borrow_date < %s "
+                    f"RETURNING *) INSERT INTO {name} SELECT * FROM moved",
+                    [start, end]
+                )
+                cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}")
+        self.stdout.write(self.style.SUCCESS(f'Created {name}'))
+
+    def split_legacy(self, dry_run):
+        """
+        Move the oldest month of the legacy partition, the table attached
+        whole by migration ``borrowings.0007``, into a partition of its own.
+        The legacy partition is reattached with the narrower bound, proven
+        by a CHECK, and dropped once empty. Returns False when there is
+        nothing left to split.
+        """
+        legacy = next((partition for partition in self.get_partitions() if partition[0] == LEGACY), None)
+        if legacy is None:
+            return False
+        upper = legacy[2]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT min(borrow_date) FROM {LEGACY}")
+            oldest = cursor.fetchone()[0]
+        if oldest is None:
+            if dry_run:
+                self.stdout.write(f'Would drop the empty {LEGACY}')
+                return False
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {LEGACY}")
+                cursor.execute(f"DROP TABLE {LEGACY}")
+            self.stdout.write(self.style.SUCCESS(f'Dropped the empty {LEGACY}'))
+            return False
+
+        start = month_start(oldest)
+        end = month_start(start, 1)
+        name = f'{TABLE}_p{start:%Y_%m}'
+        if dry_run:
+            self.stdout.write(f'Would move {start:%Y-%m} from {LEGACY} to {name}')
+            return False
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {LEGACY} WHERE borrow_date < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved",
+                [end]
+            )
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {LEGACY}")
+            cursor.execute(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            if end < upper:
+                cursor.execute(
+                    f"ALTER TABLE {LEGACY} ADD CONSTRAINT borrowings_legacy_bound "
+                    f"CHECK (borrow_date >= %s AND borrow_date < %s)",
+                    [end, upper]
+                )
+                cursor.execute(
+                    f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY} "
+                    f"FOR VALUES FROM ('{end.isoformat()}') TO ('{upper.isoformat()}')"
+                )
+                cursor.execute(f"ALTER TABLE {LEGACY} DROP CONSTRAINT borrowings_legacy_bound")
+            else:
+                cursor.execute(f"DROP TABLE {LEGACY}")
+        self.stdout.write(self.style.SUCCESS(f'Moved {start:%Y-%m} from {LEGACY} to {name}'))
+        return end < upper
+
+    def archive_partition(self, name, archive_dir, drop, dry_run):
+        """
+        Detach a partition so that operational queries no longer touch it,
+        then optionally write it out and drop it. Partitions that still hold
+        active loans are left attached.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE status IN {ACTIVE})")
+            if cursor.fetchone()[0]:
+                self.stdout.write(self.style.WARNING(f'Kept {name}: it still has active loans'))
+                return
+            if dry_run:
+                self.stdout.write(f'Would detach {name}')
+                return
+
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            self.stdout.write(self.style.SUCCESS(f'Detached {name}'))
+
+            if archive_dir:
+                path = os.path.join(archive_dir, f'{name}.csv')
+                with open(path, 'w', encoding='utf-8', newline='') as archive:
+                    cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+                self.stdout.write(f'Archived {name} to {path}')
+
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+                self.stdout.write(f'Dropped {name}')
@@ -0,0 +1,21 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from apps.borrowings.services import HoldService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Expire ready holds that were not collected in time and pass their copies on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Holds expired per statement')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        expired = HoldService.expire_holds(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - start
+
+        logger.info("Hold sweep expired %d holds in %.3fs", expired, elapsed)
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} holds in {elapsed:.3f}s'))
@@ -0,0 +1,38 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from apps.borrowings.services import BorrowingService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Mark borrowed books past their due date as overdue, in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Loans marked per statement')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+        parser.add_argument('--ids-file', help='Append the ids of the loans marked overdue to this file, one per line')
+
+    def handle(self, *args, **options):
+        ids_file = open(options['ids_file'], 'a', encoding='utf-8') if options['ids_file'] else None
+
+        def emit(ids):
+            if ids_file:
+                ids_file.writelines(f'{pk}\n' for pk in ids)
+                ids_file.flush()
+
+        start = time.monotonic()
+        try:
+            updated = BorrowingService.check_overdue_books(
+                batch_size=options['batch_size'],
+                sleep=options['sleep'],
+                on_chunk=emit
+            )
+        finally:
+            if ids_file:
+                ids_file.close()
+        elapsed = time.monotonic() - start
+
+        logger.info("Overdue sweep marked %d loans in %.3fs", updated, elapsed)
+        self.stdout.write(self.style.SUCCESS(f'Marked {updated} loans overdue in {elapsed:.3f}s'))
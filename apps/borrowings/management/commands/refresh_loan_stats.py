@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from apps.borrowings.services import BorrowingService
+
+
+class Command(BaseCommand):
+    help = "Recount patrons' loan stats from their borrowing records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patrons', type=int, nargs='+', metavar='ID',
+                            help='Only recount these patrons')
+
+    def handle(self, *args, **options):
+        count = BorrowingService.refresh_loan_stats(options['patrons'])
+        self.stdout.write(self.style.SUCCESS(f'Recounted loan stats of {count} patrons'))
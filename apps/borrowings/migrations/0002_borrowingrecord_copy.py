@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowingrecord',
+            name='copy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='borrowing_records', to='books.bookcopy'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:29
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def create_book_copies(apps, schema_editor):
+    """
+    Give every book ``total_copies`` copies, of which the ones not counted in
+    ``available_copies`` start out on loan.
+    """
+    Book = apps.get_model('books', 'Book')
+    BookCopy = apps.get_model('books', 'BookCopy')
+
+    copies = []
+    books = Book.objects.order_by('pk').values_list('pk', 'total_copies', 'available_copies')
+    for book_id, total_copies, available_copies in books.iterator(chunk_size=BATCH_SIZE):
+        on_loan = max(total_copies - available_copies, 0)
+        for number in range(1, total_copies + 1):
+            copies.append(BookCopy(
+                book_id=book_id,
+                barcode=f"{book_id:08d}-{number:04d}",
+                status='on_loan' if number <= on_loan else 'available',
+            ))
+        if len(copies) >= BATCH_SIZE:
+            BookCopy.objects.bulk_create(copies)
+            copies = []
+    BookCopy.objects.bulk_create(copies)
+
+
+def delete_book_copies(apps, schema_editor):
+    apps.get_model('books', 'BookCopy').objects.all().delete()
+
+
+# Pair each active loan with an on-loan copy of the same book.
+ATTACH_ACTIVE_LOANS = """
+WITH loans AS (
+    SELECT id, book_id, row_number() OVER (PARTITION BY book_id ORDER BY id) AS n
+    FROM borrowings_borrowingrecord
+    WHERE status IN ('pending', 'borrowed', 'overdue') AND copy_id IS NULL
+), copies AS (
+    SELECT id, book_id, row_number() OVER (PARTITION BY book_id ORDER BY id) AS n
+    FROM books_bookcopy
+    WHERE status = 'on_loan'
+)
+UPDATE borrowings_borrowingrecord AS record
+SET copy_id = copies.id
+FROM loans
+JOIN copies ON copies.book_id = loans.book_id AND copies.n = loans.n
+WHERE record.id = loans.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0002_borrowingrecord_copy'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_book_copies, delete_book_copies),
+        migrations.RunSQL(ATTACH_ACTIVE_LOANS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:35
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the new indexes without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0003_backfill_book_copies'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='borrowingrecord',
+            index=models.Index(fields=['-borrow_date', '-id'], name='borrowings_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowingrecord',
+            index=models.Index(fields=['status', '-borrow_date', '-id'], name='borrowings_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowingrecord',
+            index=models.Index(fields=['patron', '-borrow_date', '-id'], name='borrowings_patron_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='borrowingrecord',
+            index=models.Index(fields=['book', '-borrow_date', '-id'], name='borrowings_book_date_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='borrowingrecord',
+            name='borrowings__status_b39208_idx',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:51
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the new index without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0004_borrowing_list_indexes'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='borrowingrecord',
+            index=models.Index(condition=models.Q(('status', 'borrowed')), fields=['due_date'], name='borrowings_borrowed_due_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='borrowingrecord',
+            name='borrowings__due_dat_446a8e_idx',
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:54
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import migrations, models
+from django.db.models import Count
+
+ACTIVE_STATUSES = ['pending', 'borrowed', 'overdue']
+
+
+def check_duplicate_active_loans(apps, schema_editor):
+    """
+    Stop before building the index if a patron holds more than one active
+    loan of a book. A failed concurrent build would leave an invalid index
+    behind, and which loan to close is for a librarian to decide.
+    """
+    BorrowingRecord = apps.get_model('borrowings', 'BorrowingRecord')
+    duplicates = list(
+        BorrowingRecord.objects.filter(status__in=ACTIVE_STATUSES)
+        .order_by()
+        .values('patron_id', 'book_id')
+        .annotate(count=Count('id'), loans=ArrayAgg('id', ordering='id'))
+        .filter(count__gt=1)
+        .values_list('patron_id', 'book_id', 'loans')[:50]
+    )
+    if duplicates:
+        lines = '\n'.join(
+            f"  patron {patron_id}, book {book_id}: loans {loans}" for patron_id, book_id, loans in duplicates
+        )
+        raise RuntimeError(
+            "Some patrons hold more than one active loan of the same book (first 50 shown). "
+            "Return or close all but one loan of each pair, then run the migration again:\n" + lines
+        )
+
+
+class Migration(migrations.Migration):
+    # The constraint is a partial unique index; build it without blocking
+    # writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0005_overdue_sweep_index'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(check_duplicate_active_loans, migrations.RunPython.noop),
+                # Clear an invalid index left by an interrupted earlier run.
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "borrowings_one_active_loan"',
+                    migrations.RunSQL.noop,
+                ),
+                migrations.RunSQL(
+                    """
+                    CREATE UNIQUE INDEX CONCURRENTLY "borrowings_one_active_loan"
+                    ON "borrowings_borrowingrecord" ("patron_id", "book_id")
+                    WHERE "status" IN ('pending', 'borrowed', 'overdue')
+                    """,
+                    'DROP INDEX CONCURRENTLY IF EXISTS "borrowings_one_active_loan"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='borrowingrecord',
+                    constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'borrowed', 'overdue'])), fields=('patron', 'book'), name='borrowings_one_active_loan'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,232 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:02
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+TABLE = 'borrowings_borrowingrecord'
+LEGACY = 'borrowings_borrowingrecord_legacy'
+SEQUENCE = 'borrowings_borrowingrecord_id_seq'
+MONTHS_AHEAD = 3
+
+ACTIVE = "('pending', 'borrowed', 'overdue')"
+
+# A unique index on a partitioned table must include the partition key, so
+# one active loan per patron and book is enforced by a trigger instead. The
+# advisory lock serialises concurrent loans of the same pair, and the error
+# looks like the unique violation it replaces.
+ONE_ACTIVE_LOAN_TRIGGER = f"""
+CREATE FUNCTION borrowings_one_active_loan() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.status IN {ACTIVE} THEN
+        PERFORM pg_advisory_xact_lock(
+            hashtextextended('borrowings_one_active_loan:' || NEW.patron_id || ':' || NEW.book_id, 0)
+        );
+        IF EXISTS (
+            SELECT 1 FROM {TABLE}
+            WHERE patron_id = NEW.patron_id AND book_id = NEW.book_id
+              AND status IN {ACTIVE} AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "borrowings_one_active_loan"'
+                USING ERRCODE = 'unique_violation', CONSTRAINT = 'borrowings_one_active_loan';
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER borrowings_one_active_loan
+BEFORE INSERT OR UPDATE OF status, patron_id, book_id ON {TABLE}
+FOR EACH ROW EXECUTE FUNCTION borrowings_one_active_loan();
+"""
+
+
+def month_start(moment, months=0):
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def literal(moment):
+    return f"'{moment.isoformat()}'"
+
+
+def partition_borrowing_records(apps, schema_editor):
+    """
+    Turn the borrowing table into a parent partitioned by month of
+    ``borrow_date``, without copying rows.
+
+    The existing table is attached whole as the partition for everything
+    before next month, or after its latest loan if that is later. Its bound is proven by a CHECK validated while
+    writes continue, and it already has an index matching each index of
+    the parent, so the attach itself only changes the catalog. Monthly
+    partitions are created for the months after it, with a default
+    partition catching anything beyond them.
+
+    ``borrowing_partitions --split-legacy`` then moves the history out of
+    the attached table into monthly partitions, a month per transaction.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        # Loans dated ahead, e.g. imported reservations, stay in the table too.
+        cursor.execute(f"SELECT max(borrow_date) FROM {TABLE}")
+        latest = cursor.fetchone()[0]
+        bound = max(month_start(timezone.now(), 1), month_start(latest, 1) if latest else month_start(timezone.now()))
+
+        # A constraint left NOT VALID by an interrupted run is replaced.
+        cursor.execute(f"ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS borrowings_legacy_bound")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT borrowings_legacy_bound "
+            f"CHECK (borrow_date < {literal(bound)}) NOT VALID"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT borrowings_legacy_bound")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+
+        # Index names are unique per schema: the parent takes over the
+        # current names and the table keeps its indexes under new ones.
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [TABLE])
+        indexes = cursor.fetchall()
+        for name, _definition in indexes:
+            if not name.startswith('borrowings_legacy_'):
+                cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:50]}_legacy"')
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY}")
+
+        # The primary key of a partitioned table includes the partition key.
+        cursor.execute(
+            f'ALTER TABLE {LEGACY} DROP CONSTRAINT "borrowings_borrowingrecord_pkey_legacy", '
+            f"ADD CONSTRAINT borrowings_legacy_pkey PRIMARY KEY USING INDEX borrowings_legacy_id_date"
+        )
+
+        # Identity columns cannot be shared with partitions; hand the ids
+        # over to a plain sequence owned by the parent.
+        cursor.execute(
+            f"SELECT GREATEST(COALESCE(MAX(id), 0), COALESCE(pg_sequence_last_value("
+            f"pg_get_serial_sequence('{LEGACY}', 'id')::regclass), 0)) FROM {LEGACY}"
+        )
+        last_id = cursor.fetchone()[0]
+        cursor.execute(f"ALTER TABLE {LEGACY} ALTER COLUMN id DROP IDENTITY")
+        cursor.execute(f"CREATE SEQUENCE {SEQUENCE}")
+        if last_id:
+            cursor.execute("SELECT setval(%s, %s)", [SEQUENCE, last_id])
+
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS) PARTITION BY RANGE (borrow_date)")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT borrowings_borrowingrecord_pkey PRIMARY KEY (id, borrow_date)")
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+        for name, definition in indexes:
+            if name not in ('borrowings_borrowingrecord_pkey', 'borrowings_one_active_loan') \
+                    and not name.startswith('borrowings_legacy_'):
+                cursor.execute(definition)
+        cursor.execute(
+            f"CREATE INDEX borrowings_active_loan_idx ON {TABLE} (patron_id, book_id) WHERE status IN {ACTIVE}"
+        )
+        cursor.execute(ONE_ACTIVE_LOAN_TRIGGER)
+
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY} FOR VALUES FROM (MINVALUE) TO ({literal(bound)})")
+        cursor.execute(f"ALTER TABLE {LEGACY} DROP CONSTRAINT borrowings_legacy_bound")
+        cursor.execute('DROP INDEX "borrowings_one_active_loan_legacy"')
+
+        for months in range(MONTHS_AHEAD):
+            start, end = month_start(bound, months), month_start(bound, months + 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{start:%Y_%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ({literal(start)}) TO ({literal(end)})"
+            )
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+
+def unpartition_borrowing_records(apps, schema_editor):
+    """
+    Fold the attached partitions back into one plain table with the
+    indexes and one-active-loan index of the previous migration. Rows are
+    copied under a lock, so expect downtime proportional to the history.
+    Partitions already detached by ``borrowing_partitions`` are left out.
+    """
+    connection = schema_editor.connection
+    flat = f'{TABLE}_flat'
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [TABLE])
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f"CREATE TABLE {flat} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        cursor.execute(f"ALTER TABLE {flat} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"INSERT INTO {flat} SELECT * FROM {TABLE}")
+        # Drops the partitions, the trigger and the id sequence with it.
+        cursor.execute(f"DROP TABLE {TABLE}")
+        cursor.execute("DROP FUNCTION IF EXISTS borrowings_one_active_loan()")
+        cursor.execute(f"ALTER TABLE {flat} RENAME TO {TABLE}")
+
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT borrowings_borrowingrecord_pkey PRIMARY KEY (id)")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {TABLE}"
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+        for name, definition in indexes:
+            if name not in ('borrowings_borrowingrecord_pkey', 'borrowings_active_loan_idx'):
+                cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+        cursor.execute(
+            f'CREATE UNIQUE INDEX "borrowings_one_active_loan" ON {TABLE} (patron_id, book_id) WHERE status IN {ACTIVE}'
+        )
+
+
+class Migration(migrations.Migration):
+    # The indexes the attach relies on are built without blocking writes.
+    atomic = False
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0006_one_active_loan'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # Indexes left behind by an interrupted run are rebuilt.
+                migrations.RunSQL(
+                    [
+                        "DROP INDEX CONCURRENTLY IF EXISTS borrowings_legacy_id_date",
+                        f"CREATE UNIQUE INDEX CONCURRENTLY borrowings_legacy_id_date ON {TABLE} (id, borrow_date)",
+                    ],
+                    "DROP INDEX CONCURRENTLY IF EXISTS borrowings_legacy_id_date",
+                ),
+                migrations.RunSQL(
+                    [
+                        "DROP INDEX CONCURRENTLY IF EXISTS borrowings_legacy_active_loan",
+                        f"CREATE INDEX CONCURRENTLY borrowings_legacy_active_loan ON {TABLE} (patron_id, book_id) "
+                        f"WHERE status IN {ACTIVE}",
+                    ],
+                    "DROP INDEX CONCURRENTLY IF EXISTS borrowings_legacy_active_loan",
+                ),
+                migrations.RunPython(partition_borrowing_records, unpartition_borrowing_records),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='borrowingrecord',
+                    name='borrowings_one_active_loan',
+                ),
+                migrations.AddIndex(
+                    model_name='borrowingrecord',
+                    index=models.Index(condition=models.Q(('status__in', ['pending', 'borrowed', 'overdue'])), fields=['patron', 'book'], name='borrowings_active_loan_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# One row per patron who has ever borrowed, counted from their records.
+BACKFILL_LOAN_STATS = """
+INSERT INTO borrowings_patronloanstats
+    (patron_id, active_loans, overdue_loans, total_borrowed, last_borrow_date, updated_at)
+SELECT patron_id,
+       count(*) FILTER (WHERE status IN ('pending', 'borrowed', 'overdue')),
+       count(*) FILTER (WHERE status = 'overdue'),
+       count(*),
+       max(borrow_date),
+       now()
+FROM borrowings_borrowingrecord
+GROUP BY patron_id
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrowings', '0007_partition_by_borrow_date'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatronLoanStats',
+            fields=[
+                ('patron', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_stats', serialize=False, to='patrons.patron')),
+                ('active_loans', models.IntegerField(default=0, verbose_name='Active Loans')),
+                ('overdue_loans', models.IntegerField(default=0, verbose_name='Overdue Loans')),
+                ('total_borrowed', models.IntegerField(default=0, verbose_name='Total Borrowed')),
+                ('last_borrow_date', models.DateTimeField(blank=True, null=True, verbose_name='Last Borrow Date')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Patron Loan Stats',
+                'verbose_name_plural': 'Patron Loan Stats',
+            },
+        ),
+        migrations.RunSQL(BACKFILL_LOAN_STATS, migrations.RunSQL.noop),
+    ]
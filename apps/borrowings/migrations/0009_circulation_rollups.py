@@ -0,0 +1,98 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TABLE = 'borrowings_borrowingrecord'
+INDEX = 'borrowings_return_date_idx'
+
+
+def create_return_date_index(apps, schema_editor):
+    """
+    Index the return dates of a partitioned table without blocking writes.
+    The parent's index starts out invalid, each partition's index is built
+    concurrently and attached, and the parent's becomes valid once all of
+    them are.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX {INDEX} ON ONLY {TABLE} (return_date) WHERE return_date IS NOT NULL")
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass", [TABLE]
+        )
+        for (partition,) in cursor.fetchall():
+            name = f'{partition}_return_date_idx'
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY {name} ON {partition} (return_date) WHERE return_date IS NOT NULL"
+            )
+            cursor.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {name}")
+
+
+def drop_return_date_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX {INDEX}")
+
+
+class Migration(migrations.Migration):
+    # The return date index is built concurrently on each partition.
+    atomic = False
+
+    dependencies = [
+        ('books', '0009_book_copy'),
+        ('borrowings', '0008_patron_loan_stats'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCirculation',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='Day')),
+                ('borrowed', models.IntegerField(default=0, verbose_name='Borrowed')),
+                ('returned', models.IntegerField(default=0, verbose_name='Returned')),
+                ('active', models.IntegerField(default=0, verbose_name='Active')),
+                ('overdue', models.IntegerField(default=0, verbose_name='Overdue')),
+                ('refreshed_at', models.DateTimeField(verbose_name='Refreshed At')),
+            ],
+            options={
+                'verbose_name': 'Daily Circulation',
+                'verbose_name_plural': 'Daily Circulation',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTitleUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('loans', models.IntegerField(default=0, verbose_name='Loans')),
+                ('loaned_days', models.FloatField(default=0, verbose_name='Loaned Days')),
+            ],
+            options={
+                'verbose_name': 'Daily Title Utilization',
+                'verbose_name_plural': 'Daily Title Utilization',
+                'ordering': ['day', 'book'],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_return_date_index, drop_return_date_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='borrowingrecord',
+                    index=models.Index(condition=models.Q(('return_date__isnull', False)), fields=['return_date'], name='borrowings_return_date_idx'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dailytitleutilization',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_utilization', to='books.book'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytitleutilization',
+            constraint=models.UniqueConstraint(fields=('day', 'book'), name='borrowings_utilization_day_book'),
+        ),
+    ]
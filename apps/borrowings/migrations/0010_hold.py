@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-17 04:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_bookcopy_reserved'),
+        ('borrowings', '0009_circulation_rollups'),
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('ready', 'Ready'), ('fulfilled', 'Fulfilled'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='waiting', max_length=10, verbose_name='Status')),
+                ('ready_at', models.DateTimeField(blank=True, null=True, verbose_name='Ready At')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Expires At')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='books.book')),
+                ('copy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holds', to='books.bookcopy')),
+                ('patron', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='patrons.patron')),
+            ],
+            options={
+                'verbose_name': 'Hold',
+                'verbose_name_plural': 'Holds',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['book', 'created_at', 'id'], name='borrowings_hold_queue_idx'), models.Index(condition=models.Q(('status', 'ready')), fields=['expires_at'], name='borrowings_hold_expiry_idx'), models.Index(fields=['patron', 'created_at', 'id'], name='borrowings_hold_patron_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['waiting', 'ready'])), fields=('patron', 'book'), name='borrowings_one_open_hold')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:10
+
+from django.db import migrations
+
+TABLE = 'borrowings_borrowingrecord'
+ACTIVE = "('pending', 'borrowed', 'overdue')"
+
+# As created by migration 0007, for reversing this one.
+ONE_ACTIVE_LOAN_TRIGGER = f"""
+CREATE FUNCTION borrowings_one_active_loan() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.status IN {ACTIVE} THEN
+        PERFORM pg_advisory_xact_lock(
+            hashtextextended('borrowings_one_active_loan:' || NEW.patron_id || ':' || NEW.book_id, 0)
+        );
+        IF EXISTS (
+            SELECT 1 FROM {TABLE}
+            WHERE patron_id = NEW.patron_id AND book_id = NEW.book_id
+              AND status IN {ACTIVE} AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'duplicate key value violates unique constraint "borrowings_one_active_loan"'
+                USING ERRCODE = 'unique_violation', CONSTRAINT = 'borrowings_one_active_loan';
+        END IF;
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER borrowings_one_active_loan
+BEFORE INSERT OR UPDATE OF status, patron_id, book_id ON {TABLE}
+FOR EACH ROW EXECUTE FUNCTION borrowings_one_active_loan();
+"""
+
+
+class Migration(migrations.Migration):
+    # One active loan per patron and book is now the unique constraint
+    # books_copy_one_per_borrower on the copy each loan takes.
+
+    dependencies = [
+        ('books', '0011_bookcopy_borrower'),
+        ('borrowings', '0010_hold'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"""
+            DROP TRIGGER IF EXISTS borrowings_one_active_loan ON {TABLE};
+            DROP FUNCTION IF EXISTS borrowings_one_active_loan();
+            """,
+            ONE_ACTIVE_LOAN_TRIGGER,
+        ),
+    ]
@@ -19,9 +19,17 @@ class BorrowingRecord(TimeStampMixin , models.Model ):
         (RETURNED, _('Returned')),
         (OVERDUE, _('Overdue')),
     ]
+    ACTIVE_STATUSES = [PENDING, BORROWED, OVERDUE]
     
     book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='borrowing_records')
     patron = models.ForeignKey('patrons.Patron', on_delete=models.CASCADE, related_name='borrowing_records')
+    copy = models.ForeignKey(
+        'books.BookCopy',
+        on_delete=models.SET_NULL,
+        related_name='borrowing_records',
+        null=True,
+        blank=True
+    )
     borrow_date = models.DateTimeField(_("Borrow Date"), default=timezone.now)
     due_date = models.DateTimeField(_("Due Date"))
     return_date = models.DateTimeField(_("Return Date"), null=True, blank=True)
@@ -32,9 +40,37 @@ class BorrowingRecord(TimeStampMixin , models.Model ):
         verbose_name = _("Borrowing Record")
         verbose_name_plural = _("Borrowing Records")
         ordering = ["-borrow_date"]
+        # The table is partitioned by month of borrow_date (see migration
+        # 0007 and the borrowing_partitions command), so its primary key is
+        # (id, borrow_date) in the database. A patron holding at most one
+        # active loan of a book is enforced on the copy each loan takes, by
+        # the books_copy_one_per_borrower constraint, as a unique index here
+        # would have to include borrow_date.
         indexes = [
-            models.Index(fields=["status"]),
-            models.Index(fields=["due_date"]),
+            models.Index(
+                fields=["patron", "book"],
+                name="borrowings_active_loan_idx",
+                condition=models.Q(status__in=["pending", "borrowed", "overdue"]),
+            ),
+            # The overdue sweeper only looks at open loans.
+            models.Index(
+                fields=["due_date"],
+                name="borrowings_borrowed_due_idx",
+                condition=models.Q(status="borrowed"),
+            ),
+            # Keyset pagination walks (borrow_date, id) newest first, alone
+            # or after an equality filter.
+            models.Index(fields=["-borrow_date", "-id"], name="borrowings_date_idx"),
+            models.Index(fields=["status", "-borrow_date", "-id"], name="borrowings_status_date_idx"),
+            models.Index(fields=["patron", "-borrow_date", "-id"], name="borrowings_patron_date_idx"),
+            models.Index(fields=["book", "-borrow_date", "-id"], name="borrowings_book_date_idx"),
+            # Finds the loans returned since a day without reading the
+            # whole history, for the circulation rollups.
+            models.Index(
+                fields=["return_date"],
+                name="borrowings_return_date_idx",
+                condition=models.Q(return_date__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -50,3 +86,142 @@ class BorrowingRecord(TimeStampMixin , models.Model ):
     def is_overdue(self):
         """Check if the book is overdue"""
         return self.status != self.RETURNED and timezone.now() > self.due_date
+
+
+class PatronLoanStats(models.Model):
+    """
+    Running loan counts of a patron, so that a profile does not aggregate
+    the patron's borrowing records. BorrowingService updates the row in
+    the same statement that changes the loans.
+    """
+    patron = models.OneToOneField(
+        'patrons.Patron',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='loan_stats'
+    )
+    active_loans = models.IntegerField(_("Active Loans"), default=0)
+    overdue_loans = models.IntegerField(_("Overdue Loans"), default=0)
+    total_borrowed = models.IntegerField(_("Total Borrowed"), default=0)
+    last_borrow_date = models.DateTimeField(_("Last Borrow Date"), null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _("Patron Loan Stats")
+        verbose_name_plural = _("Patron Loan Stats")
+
+    def __str__(self):
+        return f"Loan stats of patron {self.patron_id}"
+
+
+class DailyCirculation(models.Model):
+    """
+    Circulation of one day, rolled up from the borrowing records by the
+    refresh_circulation_rollups command. Active and overdue loans are
+    counted as of the end of the day.
+    """
+    day = models.DateField(_("Day"), primary_key=True)
+    borrowed = models.IntegerField(_("Borrowed"), default=0)
+    returned = models.IntegerField(_("Returned"), default=0)
+    active = models.IntegerField(_("Active"), default=0)
+    overdue = models.IntegerField(_("Overdue"), default=0)
+    refreshed_at = models.DateTimeField(_("Refreshed At"))
+    
+    class Meta:
+        verbose_name = _("Daily Circulation")
+        verbose_name_plural = _("Daily Circulation")
+        ordering = ["day"]
+
+    def __str__(self):
+        return f"Circulation on {self.day}"
+
+    @property
+    def overdue_rate(self):
+        """Share of the loans active at the end of the day that were overdue"""
+        return self.overdue / self.active if self.active else 0.0
+
+
+class DailyTitleUtilization(models.Model):
+    """
+    Time the copies of one title spent on loan during one day, rolled up
+    alongside DailyCirculation. Titles without loans that day have no row.
+    """
+    day = models.DateField(_("Day"))
+    book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='daily_utilization')
+    loans = models.IntegerField(_("Loans"), default=0)
+    loaned_days = models.FloatField(_("Loaned Days"), default=0)
+    
+    class Meta:
+        verbose_name = _("Daily Title Utilization")
+        verbose_name_plural = _("Daily Title Utilization")
+        ordering = ["day", "book"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "book"], name="borrowings_utilization_day_book"),
+        ]
+
+    def __str__(self):
+        return f"Utilization of book {self.book_id} on {self.day}"
+
+
+class Hold(TimeStampMixin, models.Model):
+    """
+    A patron's place in the queue for a book with no free copy. Returned
+    copies go to the oldest waiting hold, which keeps the copy reserved
+    until the patron borrows it or the hold expires.
+    """
+    WAITING = 'waiting'
+    READY = 'ready'
+    FULFILLED = 'fulfilled'
+    CANCELLED = 'cancelled'
+    EXPIRED = 'expired'
+    
+    STATUS_CHOICES = [
+        (WAITING, _('Waiting')),
+        (READY, _('Ready')),
+        (FULFILLED, _('Fulfilled')),
+        (CANCELLED, _('Cancelled')),
+        (EXPIRED, _('Expired')),
+    ]
+    OPEN_STATUSES = [WAITING, READY]
+    
+    book = models.ForeignKey('books.Book', on_delete=models.CASCADE, related_name='holds')
+    patron = models.ForeignKey('patrons.Patron', on_delete=models.CASCADE, related_name='holds')
+    copy = models.ForeignKey(
+        'books.BookCopy',
+        on_delete=models.SET_NULL,
+        related_name='holds',
+        null=True,
+        blank=True
+    )
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    ready_at = models.DateTimeField(_("Ready At"), null=True, blank=True)
+    expires_at = models.DateTimeField(_("Expires At"), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _("Hold")
+        verbose_name_plural = _("Holds")
+        ordering = ["created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["patron", "book"],
+                name="borrowings_one_open_hold",
+                condition=models.Q(status__in=["waiting", "ready"]),
+            ),
+        ]
+        indexes = [
+            # The queue of a book, oldest first, as returns claim from it.
+            models.Index(
+                fields=["book", "created_at", "id"],
+                name="borrowings_hold_queue_idx",
+                condition=models.Q(status="waiting"),
+            ),
+            models.Index(
+                fields=["expires_at"],
+                name="borrowings_hold_expiry_idx",
+                condition=models.Q(status="ready"),
+            ),
+            models.Index(fields=["patron", "created_at", "id"], name="borrowings_hold_patron_idx"),
+        ]
+
+    def __str__(self):
+        return f"Hold on book {self.book_id} for patron {self.patron_id} ({self.status})"
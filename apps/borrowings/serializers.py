@@ -1,56 +1,75 @@
 from rest_framework import serializers
-from .models import BorrowingRecord
-from apps.books.models import Book
+from .models import BorrowingRecord, Hold, PatronLoanStats
 from apps.patrons.models import Patron
+from .services import BorrowingService
 
 class BorrowingRecordSerializer(serializers.ModelSerializer):
     book_title = serializers.CharField(source='book.title', read_only=True)
     patron_name = serializers.CharField(source='patron.full_name', read_only=True)
+    copy_barcode = serializers.CharField(source='copy.barcode', read_only=True, default=None)
     is_overdue = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = BorrowingRecord
         fields = [
-            'id', 'book', 'book_title', 'patron', 'patron_name', 
+            'id', 'book', 'book_title', 'copy_barcode', 'patron', 'patron_name', 
             'borrow_date', 'due_date', 'return_date', 'status',
             'notes', 'is_overdue', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        # Loans entered here take no copy, so the database constraint on
+        # copies does not see them.
+        book = attrs.get('book', getattr(self.instance, 'book', None))
+        patron = attrs.get('patron', getattr(self.instance, 'patron', None))
+        status = attrs.get('status', getattr(self.instance, 'status', BorrowingRecord.PENDING))
+        if status in BorrowingRecord.ACTIVE_STATUSES:
+            active = BorrowingRecord.objects.filter(book=book, patron=patron, status__in=BorrowingRecord.ACTIVE_STATUSES)
+            if self.instance is not None:
+                active = active.exclude(pk=self.instance.pk)
+            if active.exists():
+                raise serializers.ValidationError(
+                    {"non_field_errors": "This patron already has this book borrowed."}
+                )
+        return attrs
+
+class PatronLoanStatsSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = PatronLoanStats
+        fields = ['active_loans', 'overdue_loans', 'total_borrowed', 'last_borrow_date']
 
 class BorrowBookSerializer(serializers.Serializer):
     notes = serializers.CharField(required=False, allow_blank=True)
     
     def validate(self, attrs):
-        book_id = self.context.get('book_id')
-        patron_id = self.context.get('patron_id')
+        book, patron, already_borrowed = BorrowingService.get_borrow_candidates(
+            self.context.get('book_id'),
+            self.context.get('patron_id')
+        )
         
-        try:
-            book = Book.objects.get(pk=book_id)
-        except Book.DoesNotExist:
+        if book is None:
             raise serializers.ValidationError({"book_id": "Book does not exist."})
         
-        try:
-            patron = Patron.objects.get(pk=patron_id)
-        except Patron.DoesNotExist:
+        if patron is None:
             raise serializers.ValidationError({"patron_id": "Patron does not exist."})
         
-        if book.available_copies <= 0:
+        # A copy reserved for the patron's ready hold is theirs to take.
+        if book.available_copies <= 0 and book.ready_hold_id is None:
             raise serializers.ValidationError({"book_id": "This book is not available for borrowing."})
         
         if not patron.active:
             raise serializers.ValidationError({"patron_id": "This patron is not active."})
         
-        if BorrowingRecord.objects.filter(
-            book=book, 
-            patron=patron, 
-            status__in=[BorrowingRecord.BORROWED, BorrowingRecord.PENDING]
-        ).exists():
+        if already_borrowed:
             raise serializers.ValidationError(
                 {"non_field_errors": "This patron already has this book borrowed."}
             )
         
         attrs['book'] = book
         attrs['patron'] = patron
+        attrs['hold_id'] = book.ready_hold_id
         
         return attrs
 
@@ -61,29 +80,93 @@ class ReturnBookSerializer(serializers.Serializer):
         book_id = self.context.get('book_id')
         patron_id = self.context.get('patron_id')
         
-        try:
-            book = Book.objects.get(pk=book_id)
-        except Book.DoesNotExist:
+        borrowing_record = BorrowingService.get_active_loan(book_id, patron_id)
+        
+        # Only a failed lookup pays for working out which id was wrong.
+        if borrowing_record is None:
+            book, patron, _borrowed = BorrowingService.get_borrow_candidates(book_id, patron_id)
+            if book is None:
+                raise serializers.ValidationError({"book_id": "Book does not exist."})
+            if patron is None:
+                raise serializers.ValidationError({"patron_id": "Patron does not exist."})
+            raise serializers.ValidationError(
+                {"non_field_errors": "No active borrowing record found for this book and patron."}
+            )
+        
+        attrs['book'] = borrowing_record.book
+        attrs['patron'] = borrowing_record.patron
+        attrs['borrowing_record'] = borrowing_record
+        
+        return attrs
+
+class ReturnBatchSerializer(serializers.Serializer):
+    patron_id = serializers.IntegerField()
+    books = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=100,
+        help_text="Book ids or ISBNs"
+    )
+    notes = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate(self, attrs):
+        patron = Patron.objects.filter(pk=attrs['patron_id']).first()
+        if patron is None:
+            raise serializers.ValidationError({"patron_id": "Patron does not exist."})
+        
+        attrs['patron'] = patron
+        return attrs
+
+class BorrowBatchSerializer(ReturnBatchSerializer):
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if not attrs['patron'].active:
+            raise serializers.ValidationError({"patron_id": "This patron is not active."})
+        return attrs
+
+class HoldSerializer(serializers.ModelSerializer):
+    book_title = serializers.CharField(source='book.title', read_only=True)
+    patron_name = serializers.CharField(source='patron.full_name', read_only=True)
+    copy_barcode = serializers.CharField(source='copy.barcode', read_only=True, default=None)
+    position = serializers.IntegerField(read_only=True, default=None)
+    
+    class Meta:
+        model = Hold
+        fields = [
+            'id', 'book', 'book_title', 'patron', 'patron_name', 'copy_barcode',
+            'status', 'position', 'ready_at', 'expires_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+class PlaceHoldSerializer(serializers.Serializer):
+    book_id = serializers.IntegerField()
+    patron_id = serializers.IntegerField()
+    
+    def validate(self, attrs):
+        book, patron, already_borrowed = BorrowingService.get_borrow_candidates(
+            attrs['book_id'],
+            attrs['patron_id']
+        )
+        
+        if book is None:
             raise serializers.ValidationError({"book_id": "Book does not exist."})
         
-        try:
-            patron = Patron.objects.get(pk=patron_id)
-        except Patron.DoesNotExist:
+        if patron is None:
             raise serializers.ValidationError({"patron_id": "Patron does not exist."})
         
-        try:
-            borrowing_record = BorrowingRecord.objects.get(
-                book=book,
-                patron=patron,
-                status__in=[BorrowingRecord.BORROWED, BorrowingRecord.OVERDUE]
-            )
-        except BorrowingRecord.DoesNotExist:
+        if book.available_copies > 0:
+            raise serializers.ValidationError({"book_id": "This book is available for borrowing."})
+        
+        if not patron.active:
+            raise serializers.ValidationError({"patron_id": "This patron is not active."})
+        
+        if already_borrowed:
             raise serializers.ValidationError(
-                {"non_field_errors": "No active borrowing record found for this book and patron."}
+                {"non_field_errors": "This patron already has this book borrowed."}
             )
         
         attrs['book'] = book
         attrs['patron'] = patron
-        attrs['borrowing_record'] = borrowing_record
         
         return attrs
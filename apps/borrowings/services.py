@@ -1,14 +1,92 @@
+import logging
+import time
+from itertools import islice
+from datetime import datetime, timezone as dt_timezone
 from django.utils import timezone
-from django.db import transaction
-from .models import BorrowingRecord
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, ExpressionWrapper, F, FloatField, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import NullIf
+from apps.books.models import Book, BookCopy
+from apps.books.services import BookAvailabilityService, BookLookupService, BookTrendingService
+from apps.patrons.models import Patron
+from .models import BorrowingRecord, DailyCirculation, DailyTitleUtilization, Hold, PatronLoanStats
 from django.core.exceptions import ValidationError
+from .sql import (
+    BORROW_CANDIDATES_SQL, BORROW_HOLD_SQL, BORROW_SQL, CLAIM_COPIES_SQL, OVERDUE_SQL, RELEASE_HOLDS_SQL,
+    RESERVE_AVAILABLE_SQL, RETURN_SQL, ROLLUP_SQL
+)
+
+logger = logging.getLogger(__name__)
+
 
 class BorrowingService:
-    """Service class for borrowing operations"""
+    """
+    Service class for borrowing operations.
+    
+    A borrow or a return costs two queries: one read of everything the
+    request is validated against, then one statement that makes every
+    change. A single statement is atomic on its own, so neither path opens
+    a transaction. The writes are in SQL because the ORM would need a
+    query per table.
+    """
+    STATS_BATCH_SIZE = 1000
+    
+    @staticmethod
+    def get_borrow_candidates(book_id, patron_id):
+        """
+        Fetch a book, a patron and whether the patron already has the book
+        borrowed, in a single query
+        
+        Returns:
+            A ``(book, patron, already_borrowed)`` tuple. ``book`` and
+            ``patron`` only have the fields a borrow needs loaded, and are
+            None when they do not exist. ``book`` is annotated with
+            ``ready_hold_id``, the patron's hold on it that is ready to
+            collect, or None.
+        """
+        book_id, patron_id = _parse_id(book_id), _parse_id(patron_id)
+        if book_id is None and patron_id is None:
+            return None, None, False
+        
+        with connection.cursor() as cursor:
+            cursor.execute(BORROW_CANDIDATES_SQL, {
+                'book_id': book_id,
+                'patron_id': patron_id,
+                'now': timezone.now(),
+            })
+            row = cursor.fetchone()
+        
+        book = patron = None
+        if row[0] is not None:
+            book = Book.from_db(connection.alias, ['id', 'title', 'available_copies'], row[0:3])
+            book.ready_hold_id = row[8]
+        if row[3] is not None:
+            patron = Patron.from_db(connection.alias, ['id', 'first_name', 'last_name', 'active'], row[3:7])
+        return book, patron, row[7]
+    
+    @staticmethod
+    def get_active_loan(book_id, patron_id):
+        """
+        Fetch the open loan of a book by a patron, with the book, patron and
+        copy it shows, in a single query
+        
+        Returns:
+            The BorrowingRecord, or None
+        """
+        book_id, patron_id = _parse_id(book_id), _parse_id(patron_id)
+        if book_id is None or patron_id is None:
+            return None
+        
+        return BorrowingRecord.objects.select_related('book', 'patron', 'copy').filter(
+            book_id=book_id,
+            book__is_deleted=False,
+            patron_id=patron_id,
+            patron__is_deleted=False,
+            status__in=[BorrowingRecord.BORROWED, BorrowingRecord.OVERDUE]
+        ).order_by('id').first()
     
     @staticmethod
-    @transaction.atomic
-    def borrow_book(book, patron, notes=""):
+    def borrow_book(book, patron, notes="", hold_id=None):
         """
         Create a borrowing record to lend a book to a patron
         
@@ -16,31 +94,53 @@ class BorrowingService:
             book: The Book object to borrow
             patron: The Patron who is borrowing the book
             notes: Optional notes about the borrowing
+            hold_id: The patron's ready hold on the book, whose reserved
+                copy is lent instead of a free one
             
         Returns:
             The created BorrowingRecord
         """
-        if book.available_copies <= 0:
-            raise ValidationError("This book is not available for borrowing.")
+        now = timezone.now()
+        due_date = now + timezone.timedelta(days=14)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(BORROW_HOLD_SQL if hold_id else BORROW_SQL, {
+                    'hold_id': hold_id,
+                    'book_id': book.pk,
+                    'patron_id': patron.pk,
+                    'now': now,
+                    'due_date': due_date,
+                    'notes': notes,
+                })
+                row = cursor.fetchone()
+        except IntegrityError as exc:
+            _raise_if_already_borrowed(exc)
+            raise
         
-        borrowing_record = BorrowingRecord(
-            book=book,
-            patron=patron,
-            status=BorrowingRecord.BORROWED,
-            borrow_date=timezone.now(),
-            due_date=timezone.now() + timezone.timedelta(days=14),
-            notes=notes
-        )
+        if row is None:
+            raise ValidationError("This book is not available for borrowing.")
         
-        book.available_copies = max(0, book.available_copies - 1)
-        book.save(update_fields=['available_copies'])
+        record_id, copy_id, barcode = row
+        copy = BookCopy.from_db(connection.alias, ['id', 'book_id', 'barcode', 'status'],
+                                [copy_id, book.pk, barcode, BookCopy.ON_LOAN])
+        borrowing_record = BorrowingRecord.from_db(connection.alias, [
+            'id', 'created_at', 'updated_at', 'book_id', 'patron_id', 'copy_id',
+            'borrow_date', 'due_date', 'return_date', 'status', 'notes'
+        ], [
+            record_id, now, now, book.pk, patron.pk, copy_id,
+            now, due_date, None, BorrowingRecord.BORROWED, notes
+        ])
+        borrowing_record.book = book
+        borrowing_record.patron = patron
+        borrowing_record.copy = copy
         
-        borrowing_record.save()
+        # Queryset and raw updates send no signals.
+        BookAvailabilityService.changed()
+        transaction.on_commit(lambda: BookTrendingService.record_borrow(book.pk))
         
         return borrowing_record
     
     @staticmethod
-    @transaction.atomic
     def return_book(borrowing_record, notes=""):
         """
         Record the return of a borrowed book
@@ -52,36 +152,592 @@ class BorrowingService:
         Returns:
             The updated BorrowingRecord
         """
-        borrowing_record.status = BorrowingRecord.RETURNED
-        borrowing_record.return_date = timezone.now()
+        if not BorrowingService.close_loans([borrowing_record], notes):
+            raise ValidationError("No active borrowing record found for this book and patron.")
+        
+        return borrowing_record
+    
+    @staticmethod
+    def close_loans(borrowing_records, notes=""):
+        """
+        Return a set of loans in one statement, updating the given records
+        in place
         
-        if notes:
-            borrowing_record.notes += f"\nReturn notes: {notes}"
+        Args:
+            borrowing_records: The BorrowingRecords to close
+            notes: Optional notes added to every record
+            
+        Returns:
+            The records that were still active and are now returned
+        """
+        now = timezone.now()
+        suffix = f"\nReturn notes: {notes}" if notes else ""
         
-        book = borrowing_record.book
-        book.available_copies = min(book.total_copies, book.available_copies + 1)
-        book.save(update_fields=['available_copies'])
+        with connection.cursor() as cursor:
+            cursor.execute(RETURN_SQL, {
+                'record_ids': [record.pk for record in borrowing_records],
+                'now': now,
+                'expires_at': now + timezone.timedelta(days=HoldService.PICKUP_DAYS),
+                'notes': suffix,
+            })
+            rows = cursor.fetchall()
         
-        borrowing_record.save()
+        closed = {record_id: (counted, held) for record_id, counted, held in rows}
+        returned = [record for record in borrowing_records if record.pk in closed]
+        for record in returned:
+            counted, held = closed[record.pk]
+            if not counted and not held:
+                logger.error(
+                    "Available copies of book %s would exceed total copies on return; counter left unchanged",
+                    record.book_id
+                )
+            record.status = BorrowingRecord.RETURNED
+            record.return_date = now
+            record.updated_at = now
+            record.notes += suffix
+            if record.copy_id is not None:
+                record.copy.status = BookCopy.RESERVED if held else BookCopy.AVAILABLE
         
-        return borrowing_record
+        if returned:
+            BookAvailabilityService.changed()
+        return returned
     
     @staticmethod
-    def check_overdue_books():
+    def resolve_books(identifiers, patron_id):
         """
-        Update status of overdue books
+        Look up the books behind a list of ids and ISBNs in one query
+        
+        Strings of 10 or 13 characters once hyphens and spaces are removed
+        are ISBNs, other numbers are ids. ISBN-10s are matched by the
+        ISBN-13 they convert to.
         
+        Returns:
+            A list of ``(identifier, book)`` pairs in the order given. Each
+            book is annotated with ``already_borrowed`` and ``ready_hold_id``
+            for the patron, and is None when the identifier matches no live
+            book.
+        """
+        keys = [_parse_book_identifier(identifier) for identifier in identifiers]
+        ids = [value for kind, value in filter(None, keys) if kind == 'id']
+        isbns = [value for kind, value in filter(None, keys) if kind == 'isbn']
+        
+        books = Book.objects.filter(Q(pk__in=ids) | Q(isbn__in=isbns)).annotate(
+            already_borrowed=Exists(BorrowingRecord.objects.filter(
+                book=OuterRef('pk'),
+                patron_id=patron_id,
+                status__in=BorrowingRecord.ACTIVE_STATUSES
+            )),
+            ready_hold_id=Subquery(Hold.objects.filter(
+                book=OuterRef('pk'),
+                patron_id=patron_id,
+                status=Hold.READY,
+                expires_at__gt=timezone.now()
+            ).values('id')[:1])
+        ).only('id', 'isbn', 'title', 'available_copies')
+        found = {}
+        for book in books:
+            found[('id', book.pk)] = found[('isbn', book.isbn)] = book
+        
+        return [(identifier, found.get(key)) for identifier, key in zip(identifiers, keys)]
+    
+    @staticmethod
+    def borrow_books(patron, identifiers, notes=""):
+        """
+        Lend a list of books to one patron with a fixed number of queries
+        
+        Every book is validated against a single lookup. Copies and counters
+        for all of them are then claimed in one statement and the records
+        written with one ``bulk_create``, in one transaction. A book the
+        patron has a ready hold on is lent the copy reserved for them.
+        
+        Args:
+            patron: The Patron who is borrowing the books
+            identifiers: Book ids or ISBNs
+            notes: Optional notes added to every record
+            
+        Returns:
+            A list with a ``{'book', 'record', 'error'}`` result per
+            identifier, in the order given
+        """
+        results = []
+        wanted = {}
+        for identifier, book in BorrowingService.resolve_books(identifiers, patron.pk):
+            result = {'book': identifier, 'record': None, 'error': None}
+            results.append(result)
+            if book is None:
+                result['error'] = "Book does not exist."
+            elif book.pk in wanted:
+                result['error'] = "This book is listed more than once."
+            elif book.available_copies <= 0 and book.ready_hold_id is None:
+                result['error'] = "This book is not available for borrowing."
+            elif book.already_borrowed:
+                result['error'] = "This patron already has this book borrowed."
+            else:
+                wanted[book.pk] = (book, result)
+        
+        if not wanted:
+            return results
+        
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(CLAIM_COPIES_SQL, {
+                        'book_ids': list(wanted),
+                        'patron_id': patron.pk,
+                        'now': now,
+                    })
+                    claimed = {book_id: (copy_id, barcode) for book_id, copy_id, barcode in cursor.fetchall()}
+                
+                records = []
+                for book_id, (book, result) in wanted.items():
+                    if book_id not in claimed:
+                        result['error'] = "This book is not available for borrowing."
+                        continue
+                    copy_id, barcode = claimed[book_id]
+                    result['record'] = BorrowingRecord(
+                        book=book,
+                        patron=patron,
+                        copy=BookCopy.from_db(connection.alias, ['id', 'book_id', 'barcode', 'status'],
+                                              [copy_id, book_id, barcode, BookCopy.ON_LOAN]),
+                        status=BorrowingRecord.BORROWED,
+                        borrow_date=now,
+                        due_date=now + timezone.timedelta(days=14),
+                        notes=notes
+                    )
+                    records.append(result['record'])
+                BorrowingRecord.objects.bulk_create(records)
+            
+                if claimed:
+                    BookAvailabilityService.changed()
+                for book_id in claimed:
+                    transaction.on_commit(lambda book_id=book_id: BookTrendingService.record_borrow(book_id))
+        except IntegrityError as exc:
+            _raise_if_already_borrowed(exc)
+            raise
+        
+        return results
+    
+    @staticmethod
+    def return_books(patron, identifiers, notes=""):
+        """
+        Record the return of a list of books by one patron with a fixed
+        number of queries
+        
+        Args:
+            patron: The Patron who is returning the books
+            identifiers: Book ids or ISBNs
+            notes: Optional notes added to every record
+            
+        Returns:
+            A list with a ``{'book', 'record', 'error'}`` result per
+            identifier, in the order given
+        """
+        keys = [_parse_book_identifier(identifier) for identifier in identifiers]
+        ids = [value for kind, value in filter(None, keys) if kind == 'id']
+        isbns = [value for kind, value in filter(None, keys) if kind == 'isbn']
+        
+        loans = {}
+        for record in BorrowingRecord.objects.select_related('book', 'patron', 'copy').filter(
+            Q(book_id__in=ids) | Q(book__isbn__in=isbns),
+            patron=patron,
+            book__is_deleted=False,
+            status__in=[BorrowingRecord.BORROWED, BorrowingRecord.OVERDUE]
+        ).order_by('id'):
+            loans.setdefault(('id', record.book_id), record)
+            loans.setdefault(('isbn', record.book.isbn), record)
+        
+        results = []
+        closing = {}
+        for identifier, key in zip(identifiers, keys):
+            record = loans.get(key)
+            result = {'book': identifier, 'record': None, 'error': None}
+            results.append(result)
+            if record is None:
+                result['error'] = "No active borrowing record found for this book and patron."
+            elif record.pk in closing:
+                result['error'] = "This book is listed more than once."
+            else:
+                closing[record.pk] = (record, result)
+        
+        if closing:
+            returned = BorrowingService.close_loans([record for record, _result in closing.values()], notes)
+            returned_ids = {record.pk for record in returned}
+            for record, result in closing.values():
+                if record.pk in returned_ids:
+                    result['record'] = record
+                else:
+                    result['error'] = "No active borrowing record found for this book and patron."
+        
+        return results
+    
+    @staticmethod
+    def check_overdue_books(batch_size=1000, sleep=0.0, on_chunk=None):
+        """
+        Mark borrowed books past their due date as overdue, in chunks
+        
+        Each chunk is one ``UPDATE ... RETURNING id`` over at most
+        ``batch_size`` loans, found through the partial index on the due
+        dates of borrowed loans. It commits on its own, so locks are held
+        briefly. Loans locked by a borrow or return are skipped and picked up
+        by the next run.
+        
+        Args:
+            batch_size: Loans marked per statement
+            sleep: Seconds to pause between chunks
+            on_chunk: Optional callable given the ids marked by each chunk
+            
         Returns:
             Number of records updated
         """
         now = timezone.now()
+        updated = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(OVERDUE_SQL, {'now': now, 'batch_size': batch_size})
+                ids = [row[0] for row in cursor.fetchall()]
+            
+            updated += len(ids)
+            if ids and on_chunk:
+                on_chunk(ids)
+            if len(ids) < batch_size:
+                return updated
+            if sleep:
+                time.sleep(sleep)
+    
+    @staticmethod
+    def refresh_loan_stats(patron_ids=None):
+        """
+        Recount patrons' loan stats from their borrowing records
         
-        overdue_records = BorrowingRecord.objects.filter(
-            status=BorrowingRecord.BORROWED,
-            due_date__lt=now
-        )
+        The service keeps the stats current on its own. This is for loans
+        written around it, such as records edited through the generic
+        endpoints, and for repairing drift. Patrons are counted and upserted
+        ``STATS_BATCH_SIZE`` at a time.
         
-        count = overdue_records.count()
-        overdue_records.update(status=BorrowingRecord.OVERDUE)
+        Args:
+            patron_ids: Patrons to recount, or None for every patron
+            
+        Returns:
+            Number of patrons recounted
+        """
+        patrons = Patron.all_objects.order_by('pk')
+        if patron_ids is not None:
+            patrons = patrons.filter(pk__in=list(patron_ids))
+        counts = patrons.annotate(
+            active_loans=Count(
+                'borrowing_records', filter=Q(borrowing_records__status__in=BorrowingRecord.ACTIVE_STATUSES)
+            ),
+            overdue_loans=Count('borrowing_records', filter=Q(borrowing_records__status=BorrowingRecord.OVERDUE)),
+            total_borrowed=Count('borrowing_records'),
+            last_borrow_date=Max('borrowing_records__borrow_date'),
+        ).values('pk', 'active_loans', 'overdue_loans', 'total_borrowed', 'last_borrow_date')
+        
+        rows = counts.iterator(chunk_size=BorrowingService.STATS_BATCH_SIZE)
+        refreshed = 0
+        while True:
+            batch = list(islice(rows, BorrowingService.STATS_BATCH_SIZE))
+            if not batch:
+                return refreshed
+            now = timezone.now()
+            PatronLoanStats.objects.bulk_create(
+                [
+                    PatronLoanStats(
+                        patron_id=row['pk'], active_loans=row['active_loans'], overdue_loans=row['overdue_loans'],
+                        total_borrowed=row['total_borrowed'], last_borrow_date=row['last_borrow_date'],
+                        updated_at=now
+                    )
+                    for row in batch
+                ],
+                update_conflicts=True,
+                unique_fields=['patron'],
+                update_fields=['active_loans', 'overdue_loans', 'total_borrowed', 'last_borrow_date', 'updated_at']
+            )
+            refreshed += len(batch)
+
+
+class HoldService:
+    """
+    Service class for the hold queue.
+    
+    A patron who finds no free copy places a hold instead of retrying the
+    borrow. Returns hand their copy to the oldest waiting hold on the book
+    in the same statement, and the copy stays reserved for PICKUP_DAYS.
+    The patron then borrows it through the usual borrow endpoint. Holds not
+    collected in time expire and their copy goes to the next in line.
+    """
+    PICKUP_DAYS = 3
+    
+    @staticmethod
+    def place_hold(book, patron):
+        """
+        Put a patron in the queue for a book
+        
+        Args:
+            book: The Book to hold, with no free copy
+            patron: The Patron waiting for it
+            
+        Returns:
+            The created Hold, annotated with its ``position`` in the queue
+        """
+        try:
+            with transaction.atomic():
+                hold = Hold.objects.create(book=book, patron=patron)
+        except IntegrityError as exc:
+            if _violated_constraint(exc) == 'borrowings_one_open_hold':
+                raise ValidationError("This patron already has a hold on this book.") from exc
+            raise
+        
+        hold.position = HoldService.get_position(hold)
+        return hold
+    
+    @staticmethod
+    def get_position(hold):
+        """Return the 1-based place of a waiting hold in its queue, or None."""
+        if hold.status != Hold.WAITING:
+            return None
+        return Hold.objects.filter(
+            Q(created_at__lt=hold.created_at) | Q(created_at=hold.created_at, id__lt=hold.pk),
+            book_id=hold.book_id,
+            status=Hold.WAITING
+        ).count() + 1
+    
+    @staticmethod
+    def cancel_hold(hold):
+        """
+        Cancel an open hold, handing a copy reserved for it to the next hold
+        in line or back to the shelf
+        
+        Returns:
+            Whether the hold was still open
+        """
+        if not HoldService.release_holds([hold.pk], Hold.CANCELLED, Hold.OPEN_STATUSES):
+            return False
+        hold.status = Hold.CANCELLED
+        return True
+    
+    @staticmethod
+    def expire_holds(batch_size=1000):
+        """
+        Expire ready holds not collected in time, in chunks
+        
+        Returns:
+            Number of holds expired
+        """
+        expired = 0
+        while True:
+            hold_ids = list(Hold.objects.filter(
+                status=Hold.READY,
+                expires_at__lt=timezone.now()
+            ).order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if hold_ids:
+                expired += len(HoldService.release_holds(hold_ids, Hold.EXPIRED, [Hold.READY]))
+            if len(hold_ids) < batch_size:
+                return expired
+    
+    @staticmethod
+    def release_holds(hold_ids, status, from_statuses):
+        """
+        Move holds that are in one of ``from_statuses`` to ``status`` and
+        hand out the copies reserved for them, in one statement
+        
+        Returns:
+            The ids of the holds moved
+        """
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(RELEASE_HOLDS_SQL, {
+                'hold_ids': list(hold_ids),
+                'status': status,
+                'from_statuses': list(from_statuses),
+                'now': now,
+                'expires_at': now + timezone.timedelta(days=HoldService.PICKUP_DAYS),
+            })
+            rows = cursor.fetchall()
+        
+        released = [hold_id for hold_id, _book_id in rows]
+        for book_id in {book_id for _hold_id, book_id in rows if book_id is not None}:
+            logger.error(
+                "Available copies of book %s would exceed total copies on release; counter left unchanged",
+                book_id
+            )
+        if released:
+            BookAvailabilityService.changed()
+        return released
+    
+    @staticmethod
+    def reserve_available_copies(book_ids):
+        """
+        Hand free copies of the given books to the holds waiting on them, in
+        one statement, for copies that join circulation other than by a
+        return
         
-        return count
+        Returns:
+            The ids of the holds made ready
+        """
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(RESERVE_AVAILABLE_SQL, {
+                'book_ids': list(book_ids),
+                'now': now,
+                'expires_at': now + timezone.timedelta(days=HoldService.PICKUP_DAYS),
+            })
+            rows = cursor.fetchall()
+        
+        ready = [hold_id for hold_id, _book_id, _counted in rows]
+        for book_id in {book_id for _hold_id, book_id, counted in rows if not counted}:
+            logger.error(
+                "Available copies of book %s would go below zero on reserving; counter left unchanged", book_id
+            )
+        if ready:
+            BookAvailabilityService.changed()
+        return ready
+
+
+class CirculationAnalyticsService:
+    """
+    Service class for circulation analytics.
+    
+    Reports are read from daily rollup tables instead of grouping the whole
+    borrowing history on every request. A refresh only rolls up the days
+    after the last one it finished, so it stays cheap as the history grows.
+    Days are rolled up once they are over, so reports run up to yesterday.
+    """
+    CHUNK_DAYS = 7
+    
+    @staticmethod
+    def refresh(since=None, until=None, chunk_days=CHUNK_DAYS, on_chunk=None):
+        """
+        Roll up the days from ``since`` up to, but not including, ``until``
+        
+        Each chunk of ``chunk_days`` days replaces its rollups in one short
+        transaction, so a failed run resumes where it stopped.
+        
+        Args:
+            since: First day to roll up. Defaults to the day after the last
+                rolled up one, or the first borrow when there is none.
+            until: Day to stop before. Defaults to today.
+            chunk_days: Days rolled up per transaction
+            on_chunk: Optional callable given the first and stop day of
+                each chunk
+            
+        Returns:
+            Number of days rolled up
+        """
+        until = until or timezone.now().date()
+        if since is None:
+            since = CirculationAnalyticsService.refreshed_through()
+            if since is not None:
+                since += timezone.timedelta(days=1)
+            else:
+                first_borrow = BorrowingRecord.objects.aggregate(first=Min('borrow_date'))['first']
+                if first_borrow is None:
+                    return 0
+                since = first_borrow.astimezone(dt_timezone.utc).date()
+        
+        day = since
+        while day < until:
+            stop = min(day + timezone.timedelta(days=chunk_days), until)
+            with transaction.atomic(), connection.cursor() as cursor:
+                DailyTitleUtilization.objects.filter(day__gte=day, day__lt=stop).delete()
+                cursor.execute(ROLLUP_SQL, {
+                    'start': _day_start(day),
+                    'end': _day_start(stop),
+                    'now': timezone.now(),
+                })
+            if on_chunk:
+                on_chunk(day, stop)
+            day = stop
+        
+        return max((until - since).days, 0)
+    
+    @staticmethod
+    def refreshed_through():
+        """Return the last day rolled up, or None."""
+        return DailyCirculation.objects.aggregate(last=Max('day'))['last']
+    
+    @staticmethod
+    def get_daily(start, end):
+        """
+        Return the rolled-up circulation of each day from ``start`` to
+        ``end`` inclusive, oldest first.
+        """
+        return [
+            {
+                'day': row.day,
+                'borrowed': row.borrowed,
+                'returned': row.returned,
+                'active': row.active,
+                'overdue': row.overdue,
+                'overdue_rate': round(row.overdue_rate, 4),
+            }
+            for row in DailyCirculation.objects.filter(day__gte=start, day__lte=end)
+        ]
+    
+    @staticmethod
+    def get_utilization(start, end, limit=50):
+        """
+        Return the ``limit`` most utilized titles from ``start`` to ``end``
+        inclusive. Utilization is the days the title's copies spent on loan
+        divided by its copy days, its current number of copies times the
+        number of days.
+        """
+        days = (end - start).days + 1
+        rows = DailyTitleUtilization.objects.filter(day__gte=start, day__lte=end).values(
+            'book_id', 'book__title', 'book__total_copies'
+        ).annotate(
+            loans=Sum('loans'),
+            loaned_days=Sum('loaned_days'),
+        ).annotate(
+            utilization=ExpressionWrapper(
+                F('loaned_days') / (NullIf(F('book__total_copies'), 0) * days),
+                output_field=FloatField()
+            )
+        ).order_by(F('utilization').desc(nulls_last=True), 'book_id')[:limit]
+        
+        return [
+            {
+                'book_id': row['book_id'],
+                'title': row['book__title'],
+                'loans': row['loans'],
+                'loaned_days': round(row['loaned_days'], 2),
+                'copy_days': row['book__total_copies'] * days,
+                'utilization': round(row['utilization'], 4) if row['utilization'] is not None else None,
+            }
+            for row in rows
+        ]
+
+
+def _violated_constraint(exc):
+    """Return the name of the constraint an IntegrityError broke, if any."""
+    return getattr(getattr(exc.__cause__, 'diag', None), 'constraint_name', None)
+
+
+def _raise_if_already_borrowed(exc):
+    """Turn a clash with the one-loan-per-borrower constraint into a ValidationError."""
+    if _violated_constraint(exc) == 'books_copy_one_per_borrower':
+        raise ValidationError("This patron already has this book borrowed.") from exc
+
+
+def _parse_book_identifier(identifier):
+    """Return ``('isbn', isbn)`` or ``('id', pk)`` for a book identifier, or None."""
+    value = BookLookupService.normalize_isbn(str(identifier))
+    # Valid ISBN-10s come back as ISBN-13s; other 10-character strings
+    # are still ISBNs, they just match nothing.
+    if len(value) in (10, 13):
+        return 'isbn', value
+    pk = _parse_id(value)
+    return ('id', pk) if pk is not None else None
+
+
+def _day_start(day):
+    """Return midnight UTC at the start of ``day``."""
+    return datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+
+
+def _parse_id(value):
+    """Return ``value`` as a primary key, or None if it cannot be one."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,10 @@
+from django.dispatch import receiver
+
+from apps.books.models import copies_issued
+from .services import HoldService
+
+
+@receiver(copies_issued)
+def reserve_issued_copies(sender, book_ids, **kwargs):
+    """Let holds waiting on a book claim the copies added to it."""
+    HoldService.reserve_available_copies(book_ids)
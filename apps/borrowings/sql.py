@@ -0,0 +1,477 @@
+"""
+SQL statements of the circulation services.
+
+Each statement does one job in a single round trip and is written out in
+full, so what runs is what is read here. Statements that hand out freed
+copies repeat the same hold assignment steps on purpose; keep them in step
+when changing one.
+"""
+
+# Book, patron, whether the patron already has the book borrowed and their
+# hold on it that is ready to collect, in one round trip. The outer joins
+# keep a row when either id is unknown.
+BORROW_CANDIDATES_SQL = """
+SELECT book.id, book.title, book.available_copies,
+       patron.id, patron.first_name, patron.last_name, patron.active,
+       EXISTS (
+           SELECT 1 FROM borrowings_borrowingrecord AS record
+           WHERE record.book_id = book.id AND record.patron_id = patron.id
+             AND record.status IN ('pending', 'borrowed', 'overdue')
+       ),
+       hold.id
+FROM (SELECT 1) AS request
+LEFT JOIN books_book AS book ON book.id = %(book_id)s AND NOT book.is_deleted
+LEFT JOIN patrons_patron AS patron ON patron.id = %(patron_id)s AND NOT patron.is_deleted
+LEFT JOIN borrowings_hold AS hold
+    ON hold.book_id = book.id AND hold.patron_id = patron.id AND hold.status = 'ready'
+    AND hold.expires_at > %(now)s
+"""
+
+# Lock a free copy, take it off the counter, mark it on loan and record the
+# loan in one statement, counting it in the patron's loan stats and closing
+# any hold the patron was still waiting on for the book. Each write only
+# runs if the one before it did, so either all of them happen or none do,
+# and no row comes back when no copy is free or the counter is already at
+# zero.
+BORROW_SQL = """
+WITH candidate AS (
+    SELECT id, barcode FROM books_bookcopy
+    WHERE book_id = %(book_id)s AND status = 'available'
+    ORDER BY id
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED
+), counter AS (
+    UPDATE books_book
+    SET available_copies = available_copies - 1, updated_at = %(now)s
+    WHERE id = %(book_id)s AND available_copies > 0 AND EXISTS (SELECT 1 FROM candidate)
+    RETURNING id
+), copy AS (
+    UPDATE books_bookcopy SET status = 'on_loan', borrower_id = %(patron_id)s, updated_at = %(now)s
+    FROM candidate, counter
+    WHERE books_bookcopy.id = candidate.id
+    RETURNING books_bookcopy.id, books_bookcopy.barcode
+), record AS (
+    INSERT INTO borrowings_borrowingrecord
+        (book_id, patron_id, copy_id, borrow_date, due_date, status, notes, created_at, updated_at)
+    SELECT %(book_id)s, %(patron_id)s, copy.id, %(now)s, %(due_date)s, 'borrowed', %(notes)s, %(now)s, %(now)s
+    FROM copy
+    RETURNING id
+), stats AS (
+    INSERT INTO borrowings_patronloanstats AS stats
+        (patron_id, active_loans, overdue_loans, total_borrowed, last_borrow_date, updated_at)
+    SELECT %(patron_id)s, 1, 0, 1, %(now)s, %(now)s FROM record
+    ON CONFLICT (patron_id) DO UPDATE
+    SET active_loans = stats.active_loans + 1,
+        total_borrowed = stats.total_borrowed + 1,
+        last_borrow_date = GREATEST(stats.last_borrow_date, EXCLUDED.last_borrow_date),
+        updated_at = EXCLUDED.updated_at
+), waiting AS (
+    UPDATE borrowings_hold SET status = 'fulfilled', updated_at = %(now)s
+    WHERE book_id = %(book_id)s AND patron_id = %(patron_id)s AND status = 'waiting'
+      AND EXISTS (SELECT 1 FROM record)
+)
+SELECT record.id, copy.id, copy.barcode FROM record, copy
+"""
+
+# Lend the copy reserved for a ready hold, mark the hold fulfilled and
+# record the loan as BORROW_SQL does. The copy was never counted as
+# available, so the counter is left alone. No row comes back when the hold
+# is no longer ready or has expired.
+BORROW_HOLD_SQL = """
+WITH hold AS (
+    UPDATE borrowings_hold SET status = 'fulfilled', updated_at = %(now)s
+    WHERE id = %(hold_id)s AND book_id = %(book_id)s AND patron_id = %(patron_id)s AND status = 'ready'
+      AND expires_at > %(now)s
+      AND EXISTS (
+          SELECT 1 FROM books_bookcopy
+          WHERE books_bookcopy.id = borrowings_hold.copy_id AND books_bookcopy.status = 'reserved'
+      )
+    RETURNING copy_id
+), copy AS (
+    UPDATE books_bookcopy SET status = 'on_loan', borrower_id = %(patron_id)s, updated_at = %(now)s
+    FROM hold
+    WHERE books_bookcopy.id = hold.copy_id
+    RETURNING books_bookcopy.id, books_bookcopy.barcode
+), record AS (
+    INSERT INTO borrowings_borrowingrecord
+        (book_id, patron_id, copy_id, borrow_date, due_date, status, notes, created_at, updated_at)
+    SELECT %(book_id)s, %(patron_id)s, copy.id, %(now)s, %(due_date)s, 'borrowed', %(notes)s, %(now)s, %(now)s
+    FROM copy
+    RETURNING id
+), stats AS (
+    INSERT INTO borrowings_patronloanstats AS stats
+        (patron_id, active_loans, overdue_loans, total_borrowed, last_borrow_date, updated_at)
+    SELECT %(patron_id)s, 1, 0, 1, %(now)s, %(now)s FROM record
+    ON CONFLICT (patron_id) DO UPDATE
+    SET active_loans = stats.active_loans + 1,
+        total_borrowed = stats.total_borrowed + 1,
+        last_borrow_date = GREATEST(stats.last_borrow_date, EXCLUDED.last_borrow_date),
+        updated_at = EXCLUDED.updated_at
+), waiting AS (
+    UPDATE borrowings_hold SET status = 'fulfilled', updated_at = %(now)s
+    WHERE book_id = %(book_id)s AND patron_id = %(patron_id)s AND status = 'waiting'
+      AND EXISTS (SELECT 1 FROM record)
+)
+SELECT record.id, copy.id, copy.barcode FROM record, copy
+"""
+
+# Lend each listed book to one patron for the circulation desk's batch
+# checkout. A book the patron has a ready hold on gets the copy reserved
+# for it, and the hold is fulfilled, as in BORROW_HOLD_SQL. Any other book
+# gets one free copy, locked, taken off its counter and marked on loan. A
+# book comes back only if it got a copy, and the patron's loan stats count
+# every book that comes back. Holds the patron was waiting on for those
+# books are closed.
+CLAIM_COPIES_SQL = """
+WITH hold AS (
+    UPDATE borrowings_hold SET status = 'fulfilled', updated_at = %(now)s
+    WHERE patron_id = %(patron_id)s AND book_id = ANY(%(book_ids)s::bigint[]) AND status = 'ready'
+      AND expires_at > %(now)s
+      AND EXISTS (
+          SELECT 1 FROM books_bookcopy
+          WHERE books_bookcopy.id = borrowings_hold.copy_id AND books_bookcopy.status = 'reserved'
+      )
+    RETURNING copy_id
+), reserved AS (
+    UPDATE books_bookcopy SET status = 'on_loan', borrower_id = %(patron_id)s, updated_at = %(now)s
+    FROM hold
+    WHERE books_bookcopy.id = hold.copy_id
+    RETURNING books_bookcopy.book_id, books_bookcopy.id, books_bookcopy.barcode
+), candidate AS (
+    SELECT free.id, free.book_id
+    FROM unnest(%(book_ids)s::bigint[]) AS wanted(book_id)
+    CROSS JOIN LATERAL (
+        SELECT id, book_id FROM books_bookcopy
+        WHERE book_id = wanted.book_id AND status = 'available'
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) AS free
+    WHERE wanted.book_id NOT IN (SELECT book_id FROM reserved)
+), counter AS (
+    UPDATE books_book
+    SET available_copies = available_copies - 1, updated_at = %(now)s
+    WHERE id IN (SELECT book_id FROM candidate) AND available_copies > 0
+    RETURNING id
+), free AS (
+    UPDATE books_bookcopy SET status = 'on_loan', borrower_id = %(patron_id)s, updated_at = %(now)s
+    FROM candidate JOIN counter ON counter.id = candidate.book_id
+    WHERE books_bookcopy.id = candidate.id
+    RETURNING books_bookcopy.book_id, books_bookcopy.id, books_bookcopy.barcode
+), copy AS (
+    SELECT book_id, id, barcode FROM reserved
+    UNION ALL
+    SELECT book_id, id, barcode FROM free
+), stats AS (
+    INSERT INTO borrowings_patronloanstats AS stats
+        (patron_id, active_loans, overdue_loans, total_borrowed, last_borrow_date, updated_at)
+    SELECT %(patron_id)s, count(*), 0, count(*), %(now)s, %(now)s FROM copy
+    HAVING count(*) > 0
+    ON CONFLICT (patron_id) DO UPDATE
+    SET active_loans = stats.active_loans + EXCLUDED.active_loans,
+        total_borrowed = stats.total_borrowed + EXCLUDED.total_borrowed,
+        last_borrow_date = GREATEST(stats.last_borrow_date, EXCLUDED.last_borrow_date),
+        updated_at = EXCLUDED.updated_at
+), waiting AS (
+    UPDATE borrowings_hold SET status = 'fulfilled', updated_at = %(now)s
+    WHERE patron_id = %(patron_id)s AND status = 'waiting' AND book_id IN (SELECT book_id FROM copy)
+)
+SELECT book_id, id, barcode FROM copy
+"""
+
+# Close loans and hand out their copies. Loans recorded before copies were
+# tracked free an on-loan copy of the book that no active loan points to.
+# Each freed copy goes to the oldest waiting hold on its book, claimed with
+# SKIP LOCKED, and is reserved for it; the rest become available and go
+# back on their counters. A loan with no copy still puts one back on the
+# counter. A counter that would go past its book's total copies has
+# drifted and is left alone. The patrons' loan stats stop counting the
+# loans. Only loans that were still active come back, each with whether
+# its book's counter took the copy back and whether the copy went to a
+# hold instead.
+RETURN_SQL = """
+WITH previous AS (
+    SELECT id, status FROM borrowings_borrowingrecord
+    WHERE id = ANY(%(record_ids)s) AND status IN ('borrowed', 'overdue')
+    FOR UPDATE
+), record AS (
+    UPDATE borrowings_borrowingrecord AS loan
+    SET status = 'returned', return_date = %(now)s, notes = loan.notes || %(notes)s, updated_at = %(now)s
+    FROM previous
+    WHERE loan.id = previous.id
+    RETURNING loan.id, loan.book_id, loan.copy_id, loan.patron_id, previous.status AS previous_status
+), legacy AS (
+    SELECT record.id AS record_id, free.id
+    FROM record
+    CROSS JOIN LATERAL (
+        SELECT id FROM books_bookcopy AS copy
+        WHERE copy.book_id = record.book_id AND copy.status = 'on_loan'
+          AND NOT EXISTS (
+              SELECT 1 FROM borrowings_borrowingrecord AS active
+              WHERE active.copy_id = copy.id AND active.status IN ('pending', 'borrowed', 'overdue')
+          )
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) AS free
+    WHERE record.copy_id IS NULL
+), freed AS (
+    SELECT on_loan.id, record.book_id
+    FROM record
+    LEFT JOIN legacy ON legacy.record_id = record.id
+    LEFT JOIN books_bookcopy AS on_loan
+        ON on_loan.id = COALESCE(record.copy_id, legacy.id) AND on_loan.status = 'on_loan'
+), queue AS (
+    SELECT book_id, count(id) AS copies FROM freed GROUP BY book_id
+), claimed AS (
+    SELECT hold.id, hold.book_id,
+           row_number() OVER (PARTITION BY hold.book_id ORDER BY hold.created_at, hold.id) AS n
+    FROM queue
+    CROSS JOIN LATERAL (
+        SELECT id, book_id, created_at FROM borrowings_hold
+        WHERE book_id = queue.book_id AND status = 'waiting'
+        ORDER BY created_at, id
+        LIMIT queue.copies
+        FOR UPDATE SKIP LOCKED
+    ) AS hold
+), assigned AS (
+    SELECT claimed.id AS hold_id, numbered.id AS copy_id
+    FROM claimed
+    JOIN (
+        SELECT id, book_id, row_number() OVER (PARTITION BY book_id ORDER BY id) AS n
+        FROM freed WHERE id IS NOT NULL
+    ) AS numbered ON numbered.book_id = claimed.book_id AND numbered.n = claimed.n
+), hold AS (
+    UPDATE borrowings_hold
+    SET status = 'ready', copy_id = assigned.copy_id, ready_at = %(now)s, expires_at = %(expires_at)s,
+        updated_at = %(now)s
+    FROM assigned
+    WHERE borrowings_hold.id = assigned.hold_id
+    RETURNING borrowings_hold.id, borrowings_hold.book_id
+), copy AS (
+    UPDATE books_bookcopy
+    SET status = CASE WHEN id IN (SELECT copy_id FROM assigned) THEN 'reserved' ELSE 'available' END,
+        borrower_id = NULL, updated_at = %(now)s
+    WHERE id IN (SELECT id FROM freed)
+    RETURNING id
+), unassigned AS (
+    SELECT freed.book_id, count(*) - count(assigned.copy_id) AS copies
+    FROM freed LEFT JOIN assigned ON assigned.copy_id = freed.id
+    GROUP BY freed.book_id
+), counter AS (
+    UPDATE books_book
+    SET available_copies = available_copies + unassigned.copies, updated_at = %(now)s
+    FROM unassigned
+    WHERE books_book.id = unassigned.book_id AND unassigned.copies > 0
+      AND available_copies + unassigned.copies <= total_copies
+    RETURNING books_book.id
+), stats AS (
+    UPDATE borrowings_patronloanstats AS stats
+    SET active_loans = GREATEST(stats.active_loans - closed.loans, 0),
+        overdue_loans = GREATEST(stats.overdue_loans - closed.overdue, 0),
+        updated_at = %(now)s
+    FROM (
+        SELECT patron_id, count(*) AS loans, count(*) FILTER (WHERE previous_status = 'overdue') AS overdue
+        FROM record GROUP BY patron_id
+    ) AS closed
+    WHERE stats.patron_id = closed.patron_id
+)
+SELECT record.id, record.book_id IN (SELECT id FROM counter), record.book_id IN (SELECT book_id FROM hold)
+FROM record
+"""
+
+# Mark one chunk of borrowed loans past their due date as overdue, and
+# count them in their patrons' loan stats.
+OVERDUE_SQL = """
+WITH marked AS (
+    UPDATE borrowings_borrowingrecord SET status = 'overdue', updated_at = %(now)s
+    WHERE id IN (
+        SELECT id FROM borrowings_borrowingrecord
+        WHERE status = 'borrowed' AND due_date < %(now)s
+        ORDER BY due_date
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, patron_id
+), stats AS (
+    UPDATE borrowings_patronloanstats AS stats
+    SET overdue_loans = stats.overdue_loans + late.loans, updated_at = %(now)s
+    FROM (SELECT patron_id, count(*) AS loans FROM marked GROUP BY patron_id) AS late
+    WHERE stats.patron_id = late.patron_id
+)
+SELECT id FROM marked
+"""
+
+# Close open holds and hand out the copies reserved for those that were
+# ready, as RETURN_SQL hands out returned copies. Only holds that were
+# still in one of ``from_statuses`` come back, each with the book of its
+# copy when that copy went neither to another hold nor back on its counter.
+RELEASE_HOLDS_SQL = """
+WITH released AS (
+    UPDATE borrowings_hold SET status = %(status)s, updated_at = %(now)s
+    WHERE id = ANY(%(hold_ids)s) AND status = ANY(%(from_statuses)s)
+    RETURNING id, copy_id
+), freed AS (
+    SELECT reserved.id, reserved.book_id
+    FROM released
+    JOIN books_bookcopy AS reserved ON reserved.id = released.copy_id AND reserved.status = 'reserved'
+), queue AS (
+    SELECT book_id, count(id) AS copies FROM freed GROUP BY book_id
+), claimed AS (
+    SELECT hold.id, hold.book_id,
+           row_number() OVER (PARTITION BY hold.book_id ORDER BY hold.created_at, hold.id) AS n
+    FROM queue
+    CROSS JOIN LATERAL (
+        SELECT id, book_id, created_at FROM borrowings_hold
+        WHERE book_id = queue.book_id AND status = 'waiting'
+        ORDER BY created_at, id
+        LIMIT queue.copies
+        FOR UPDATE SKIP LOCKED
+    ) AS hold
+), assigned AS (
+    SELECT claimed.id AS hold_id, numbered.id AS copy_id
+    FROM claimed
+    JOIN (
+        SELECT id, book_id, row_number() OVER (PARTITION BY book_id ORDER BY id) AS n
+        FROM freed WHERE id IS NOT NULL
+    ) AS numbered ON numbered.book_id = claimed.book_id AND numbered.n = claimed.n
+), hold AS (
+    UPDATE borrowings_hold
+    SET status = 'ready', copy_id = assigned.copy_id, ready_at = %(now)s, expires_at = %(expires_at)s,
+        updated_at = %(now)s
+    FROM assigned
+    WHERE borrowings_hold.id = assigned.hold_id
+    RETURNING borrowings_hold.id, borrowings_hold.book_id
+), copy AS (
+    UPDATE books_bookcopy
+    SET status = CASE WHEN id IN (SELECT copy_id FROM assigned) THEN 'reserved' ELSE 'available' END,
+        borrower_id = NULL, updated_at = %(now)s
+    WHERE id IN (SELECT id FROM freed)
+    RETURNING id
+), unassigned AS (
+    SELECT freed.book_id, count(*) - count(assigned.copy_id) AS copies
+    FROM freed LEFT JOIN assigned ON assigned.copy_id = freed.id
+    GROUP BY freed.book_id
+), counter AS (
+    UPDATE books_book
+    SET available_copies = available_copies + unassigned.copies, updated_at = %(now)s
+    FROM unassigned
+    WHERE books_book.id = unassigned.book_id AND unassigned.copies > 0
+      AND available_copies + unassigned.copies <= total_copies
+    RETURNING books_book.id
+)
+SELECT released.id, freed.book_id
+FROM released
+LEFT JOIN freed
+    ON freed.id = released.copy_id AND freed.id NOT IN (SELECT copy_id FROM assigned)
+    AND freed.book_id NOT IN (SELECT id FROM counter)
+"""
+
+# Reserve free copies of the given books for the holds waiting on them,
+# when copies join circulation other than by a return, and take them off
+# their counters. Copies locked by a borrow are skipped. Each hold made
+# ready comes back with whether its book's counter had the copy on it; a
+# counter that would go below zero has drifted and is left alone.
+RESERVE_AVAILABLE_SQL = """
+WITH waiting AS (
+    SELECT book_id, count(*) AS holds FROM borrowings_hold
+    WHERE book_id = ANY(%(book_ids)s::bigint[]) AND status = 'waiting'
+    GROUP BY book_id
+), freed AS (
+    SELECT free.id, free.book_id
+    FROM waiting
+    CROSS JOIN LATERAL (
+        SELECT id, book_id FROM books_bookcopy
+        WHERE book_id = waiting.book_id AND status = 'available'
+        ORDER BY id
+        LIMIT waiting.holds
+        FOR UPDATE SKIP LOCKED
+    ) AS free
+), queue AS (
+    SELECT book_id, count(id) AS copies FROM freed GROUP BY book_id
+), claimed AS (
+    SELECT hold.id, hold.book_id,
+           row_number() OVER (PARTITION BY hold.book_id ORDER BY hold.created_at, hold.id) AS n
+    FROM queue
+    CROSS JOIN LATERAL (
+        SELECT id, book_id, created_at FROM borrowings_hold
+        WHERE book_id = queue.book_id AND status = 'waiting'
+        ORDER BY created_at, id
+        LIMIT queue.copies
+        FOR UPDATE SKIP LOCKED
+    ) AS hold
+), assigned AS (
+    SELECT claimed.id AS hold_id, numbered.id AS copy_id
+    FROM claimed
+    JOIN (
+        SELECT id, book_id, row_number() OVER (PARTITION BY book_id ORDER BY id) AS n
+        FROM freed WHERE id IS NOT NULL
+    ) AS numbered ON numbered.book_id = claimed.book_id AND numbered.n = claimed.n
+), hold AS (
+    UPDATE borrowings_hold
+    SET status = 'ready', copy_id = assigned.copy_id, ready_at = %(now)s, expires_at = %(expires_at)s,
+        updated_at = %(now)s
+    FROM assigned
+    WHERE borrowings_hold.id = assigned.hold_id
+    RETURNING borrowings_hold.id, borrowings_hold.book_id
+), copy AS (
+    UPDATE books_bookcopy SET status = 'reserved', updated_at = %(now)s
+    WHERE id IN (SELECT copy_id FROM assigned)
+    RETURNING id, book_id
+), counter AS (
+    UPDATE books_book
+    SET available_copies = available_copies - taken.copies, updated_at = %(now)s
+    FROM (SELECT book_id, count(*) AS copies FROM copy GROUP BY book_id) AS taken
+    WHERE books_book.id = taken.book_id AND available_copies >= taken.copies
+    RETURNING books_book.id
+)
+SELECT hold.id, hold.book_id, hold.book_id IN (SELECT id FROM counter) FROM hold
+"""
+
+# Roll up the circulation of the days in [start, end). Only loans that
+# overlap those days are read: ones borrowed during them, ones borrowed
+# before and returned since, and ones still out. Each has an index, so a
+# refresh costs the same whatever the length of the history.
+ROLLUP_SQL = """
+WITH day AS (
+    SELECT day_start, day_start + interval '1 day' AS day_end
+    FROM generate_series(%(start)s::timestamptz, %(end)s::timestamptz - interval '1 day', interval '1 day')
+        AS series(day_start)
+), loan AS (
+    SELECT id, book_id, borrow_date, due_date, return_date FROM borrowings_borrowingrecord
+    WHERE borrow_date >= %(start)s AND borrow_date < %(end)s AND status <> 'pending'
+    UNION ALL
+    SELECT id, book_id, borrow_date, due_date, return_date FROM borrowings_borrowingrecord
+    WHERE borrow_date < %(start)s AND return_date >= %(start)s
+    UNION ALL
+    SELECT id, book_id, borrow_date, due_date, return_date FROM borrowings_borrowingrecord
+    WHERE borrow_date < %(start)s AND status IN ('borrowed', 'overdue')
+), overlap AS (
+    SELECT day.day_start, day.day_end, loan.*
+    FROM day
+    JOIN loan ON loan.borrow_date < day.day_end AND (loan.return_date IS NULL OR loan.return_date >= day.day_start)
+), circulation AS (
+    INSERT INTO borrowings_dailycirculation AS rollup (day, borrowed, returned, active, overdue, refreshed_at)
+    SELECT day.day_start::date,
+           count(overlap.id) FILTER (WHERE overlap.borrow_date >= day.day_start),
+           count(overlap.id) FILTER (WHERE overlap.return_date < day.day_end),
+           count(overlap.id) FILTER (WHERE overlap.return_date IS NULL OR overlap.return_date >= day.day_end),
+           count(overlap.id) FILTER (WHERE (overlap.return_date IS NULL OR overlap.return_date >= day.day_end)
+                                       AND overlap.due_date < day.day_end),
+           %(now)s
+    FROM day
+    LEFT JOIN overlap ON overlap.day_start = day.day_start
+    GROUP BY day.day_start
+    ON CONFLICT (day) DO UPDATE
+    SET borrowed = EXCLUDED.borrowed,
+        returned = EXCLUDED.returned,
+        active = EXCLUDED.active,
+        overdue = EXCLUDED.overdue,
+        refreshed_at = EXCLUDED.refreshed_at
+)
+INSERT INTO borrowings_dailytitleutilization (day, book_id, loans, loaned_days)
+SELECT day_start::date, book_id, count(*),
+       sum(EXTRACT(EPOCH FROM LEAST(return_date, day_end) - GREATEST(borrow_date, day_start)) / 86400)
+FROM overlap
+GROUP BY day_start, book_id
+"""
@@ -1,13 +1,29 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, time, timezone as dt_timezone
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-from apps.books.models import Book
+from django_redis import get_redis_connection
+
+from apps.books.models import Book, BookCopy
+from apps.books.services import BookService, BookTrendingService
 from apps.patrons.models import Patron
-from .models import BorrowingRecord
+from .management.commands.borrowing_partitions import month_start
+from .models import BorrowingRecord, DailyCirculation, DailyTitleUtilization, Hold, PatronLoanStats
+from .services import BorrowingService, CirculationAnalyticsService, HoldService
 
 User = get_user_model()
 
@@ -28,23 +44,23 @@ class BorrowingAPITestCase(APITestCase):
             role='patron'
         )
         
-        self.book1 = Book.objects.create(
+        self.book1 = BookService.create_book(dict(
             title="Available Book",
             author="Test Author",
             isbn="1234567890123",
             publication_year=2020,
             available_copies=3,
             total_copies=3
-        )
+        ))
         
-        self.book2 = Book.objects.create(
+        self.book2 = BookService.create_book(dict(
             title="Unavailable Book",
             author="Test Author",
             isbn="9876543210987",
             publication_year=2021,
             available_copies=0,
             total_copies=1
-        )
+        ))
         
         self.patron1 = Patron.objects.create(
             first_name="John",
@@ -126,6 +142,29 @@ class BorrowingAPITestCase(APITestCase):
         self.book1.refresh_from_db()
         self.assertEqual(self.book1.available_copies, 1)
     
+    def test_borrow_book_counts_towards_trending(self):
+        """Test that a committed borrow is counted in today's trending set"""
+        self.client.force_authenticate(user=self.librarian)
+        redis = get_redis_connection('default')
+        day_key = BookTrendingService.day_key(timezone.localdate())
+        before = redis.zscore(day_key, self.book1.pk) or 0
+        
+        new_patron = Patron.objects.create(
+            first_name="New",
+            last_name="Patron",
+            email="new.patron@example.com",
+            member_id="P54321"
+        )
+        borrow_url = reverse('borrowings:borrowing-borrow-book', kwargs={
+            'book_id': self.book1.pk,
+            'patron_id': new_patron.pk
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(borrow_url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(redis.zscore(day_key, self.book1.pk), before + 1)
+    
     def test_borrow_book_as_patron(self):
         """Test borrowing a book as a patron (should be forbidden)"""
         self.client.force_authenticate(user=self.patron_user)
@@ -191,6 +230,47 @@ class BorrowingAPITestCase(APITestCase):
         self.book1.refresh_from_db()
         self.assertEqual(self.book1.available_copies, 3)
     
+    def test_borrow_and_return_allocate_a_copy(self):
+        """Test that borrowing takes a specific copy and returning frees it"""
+        self.client.force_authenticate(user=self.librarian)
+        new_patron = Patron.objects.create(
+            first_name="New",
+            last_name="Patron",
+            email="new.patron@example.com",
+            member_id="P54321"
+        )
+        kwargs = {'book_id': self.book1.pk, 'patron_id': new_patron.pk}
+        
+        response = self.client.post(reverse('borrowings:borrowing-borrow-book', kwargs=kwargs), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = BookCopy.objects.get(barcode=response.data['data']['copy_barcode'])
+        self.assertEqual(copy.book, self.book1)
+        self.assertEqual(copy.status, BookCopy.ON_LOAN)
+        
+        response = self.client.put(reverse('borrowings:borrowing-return-book', kwargs=kwargs), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        copy.refresh_from_db()
+        self.assertEqual(copy.status, BookCopy.AVAILABLE)
+    
+    def test_borrow_without_free_copy(self):
+        """Test that a title with every copy on loan cannot be borrowed"""
+        self.client.force_authenticate(user=self.librarian)
+        self.book1.copies.update(status=BookCopy.ON_LOAN)
+        new_patron = Patron.objects.create(
+            first_name="New",
+            last_name="Patron",
+            email="new.patron@example.com",
+            member_id="P54321"
+        )
+        borrow_url = reverse('borrowings:borrowing-borrow-book', kwargs={
+            'book_id': self.book1.pk,
+            'patron_id': new_patron.pk
+        })
+        response = self.client.post(borrow_url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not available', str(response.data))
+    
     def test_return_book_as_patron(self):
         """Test returning a book as a patron (should be forbidden)"""
         self.client.force_authenticate(user=self.patron_user)
@@ -221,4 +301,601 @@ class BorrowingAPITestCase(APITestCase):
         response = self.client.get(list_url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertEqual(response.data['data'][0]['patron_name'], 'John Doe')
+        self.assertIn('pagination', response.data)
+    
+    def test_list_borrowings_query_count(self):
+        """Test that the borrowing list costs the same queries whatever the page size"""
+        self.client.force_authenticate(user=self.librarian)
+        for index in range(5):
+            BorrowingRecord.objects.create(
+                book=self.book2,
+                patron=self.patron2,
+                due_date=timezone.now() + timezone.timedelta(days=14),
+                status=BorrowingRecord.RETURNED
+            )
+        list_url = reverse('borrowings:borrowing-list')
+        
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(list_url, {'page_size': 1})
+        with CaptureQueriesContext(connection) as large_page:
+            response = self.client.get(list_url, {'page_size': 50})
+        
+        self.assertEqual(len(response.data['data']), 6)
+        self.assertEqual(len(small_page), len(large_page))
+    
+    def test_list_borrowings_filters_and_pagination(self):
+        """Test filtering borrowing records and paging through them newest first"""
+        self.client.force_authenticate(user=self.librarian)
+        now = timezone.now()
+        for days_ago in (1, 2, 3):
+            BorrowingRecord.objects.create(
+                book=self.book2,
+                patron=self.patron2,
+                borrow_date=now - timezone.timedelta(days=days_ago),
+                due_date=now + timezone.timedelta(days=14),
+                status=BorrowingRecord.RETURNED
+            )
+        list_url = reverse('borrowings:borrowing-list')
+        
+        response = self.client.get(list_url, {'patron': self.patron2.pk, 'status': 'returned', 'page_size': 2})
+        first_page = response.data['data']
+        self.assertEqual(len(first_page), 2)
+        self.assertGreater(first_page[0]['borrow_date'], first_page[1]['borrow_date'])
+        
+        response = self.client.get(list_url, {
+            'patron': self.patron2.pk, 'status': 'returned', 'page_size': 2,
+            'cursor': response.data['pagination']['next_cursor']
+        })
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+        
+        response = self.client.get(list_url, {
+            'book': self.book2.pk,
+            'borrowed_from': (now - timezone.timedelta(days=2, hours=1)).date().isoformat(),
+            'borrowed_to': (now - timezone.timedelta(days=1)).date().isoformat(),
+        })
+        self.assertEqual(len(response.data['data']), 2)
+        
+        response = self.client.get(list_url, {'status': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_export_borrowings(self):
+        """Test streaming borrowing records as NDJSON"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(reverse('borrowings:borrowing-export'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record['book_title'], 'Available Book')
+        self.assertEqual(record['patron_name'], 'John Doe')
+    
+    def test_export_borrowings_unknown_format(self):
+        """Test exporting with an unsupported format"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(reverse('borrowings:borrowing-export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BorrowingContentionTestCase(TransactionTestCase):
+    """Test concurrent borrowing of one title from many threads"""
+    
+    def test_concurrent_borrows_do_not_drift(self):
+        """Test that concurrent borrows never over-allocate or lose counter updates"""
+        out = io.StringIO()
+        call_command(
+            'benchmark_borrowing', '--threads', '12', '--borrows-per-thread', '2', '--copies', '8', '--keep',
+            stdout=out
+        )
+        
+        self.assertIn('No drift', out.getvalue())
+        book = Book.objects.get(author='Benchmark')
+        self.assertEqual(book.available_copies, 0)
+        self.assertEqual(BorrowingRecord.objects.filter(book=book).count(), 8)
+        self.assertEqual(BookCopy.objects.filter(book=book, status=BookCopy.ON_LOAN).count(), 8)
+
+
+class BorrowingQueryBudgetTestCase(APITransactionTestCase):
+    """Test the number of queries a borrow and a return cost"""
+    
+    def setUp(self):
+        """Set up a librarian, a book and a patron"""
+        self.librarian = User.objects.create_user(
+            email='librarian@example.com',
+            password='password123',
+            role='librarian'
+        )
+        self.book = BookService.create_book(dict(title="Budget Book", author="Test Author", isbn="9780306406157", total_copies=2))
+        self.patron = Patron.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john.doe@example.com",
+            member_id="P12345"
+        )
+        kwargs = {'book_id': self.book.pk, 'patron_id': self.patron.pk}
+        self.borrow_url = reverse('borrowings:borrowing-borrow-book', kwargs=kwargs)
+        self.return_url = reverse('borrowings:borrowing-return-book', kwargs=kwargs)
+        self.client.force_authenticate(user=self.librarian)
+    
+    def test_borrow_and_return_take_two_queries_each(self):
+        """Test that a borrow and a return each cost at most two queries"""
+        with self.assertNumQueries(2):
+            response = self.client.post(self.borrow_url, {'notes': 'Desk'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['book_title'], 'Budget Book')
+        self.assertEqual(response.data['data']['patron_name'], 'John Doe')
+        self.assertEqual(response.data['data']['status'], 'borrowed')
+        
+        with self.assertNumQueries(2):
+            response = self.client.put(self.return_url, {'notes': 'Fine'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['status'], 'returned')
+        self.assertEqual(response.data['data']['notes'], 'Desk\nReturn notes: Fine')
+        
+        record = BorrowingRecord.objects.get()
+        self.assertEqual(record.status, BorrowingRecord.RETURNED)
+        self.assertEqual(record.copy.status, BookCopy.AVAILABLE)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+    
+    def test_borrow_errors(self):
+        """Test that unknown ids and unavailable books keep their error fields"""
+        missing = reverse('borrowings:borrowing-borrow-book', kwargs={'book_id': 0, 'patron_id': self.patron.pk})
+        response = self.client.post(missing, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('book_id', response.data['errors'])
+        
+        missing = reverse('borrowings:borrowing-borrow-book', kwargs={'book_id': self.book.pk, 'patron_id': 'abc'})
+        response = self.client.post(missing, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('patron_id', response.data['errors'])
+        
+        Book.objects.filter(pk=self.book.pk).update(available_copies=0)
+        response = self.client.post(self.borrow_url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not available', str(response.data['errors']['book_id']))
+        
+        # A counter at zero must not leave the free copy claimed.
+        with self.assertRaises(ValidationError):
+            BorrowingService.borrow_book(self.book, self.patron)
+        self.assertFalse(BookCopy.objects.filter(status=BookCopy.ON_LOAN).exists())
+        self.assertFalse(BorrowingRecord.objects.exists())
+    
+    def test_one_active_loan_per_book(self):
+        """Test that the database refuses a second active loan of a book for a patron"""
+        self.client.post(self.borrow_url, {}, format='json')
+        
+        # Skip the validation read, as a concurrent request would.
+        with self.assertRaisesMessage(ValidationError, 'already has this book borrowed'):
+            BorrowingService.borrow_book(self.book, self.patron)
+        
+        self.assertEqual(BorrowingRecord.objects.count(), 1)
+        self.assertEqual(BookCopy.objects.get(status=BookCopy.ON_LOAN).borrower, self.patron)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+        
+        BorrowingRecord.objects.update(status=BorrowingRecord.OVERDUE)
+        response = self.client.post(self.borrow_url, {}, format='json')
+        self.assertIn('already has this book borrowed', str(response.data['errors']))
+        
+        # Returning the copy lets the patron borrow the book again.
+        BorrowingService.return_book(BorrowingRecord.objects.get())
+        self.assertFalse(BookCopy.objects.filter(borrower__isnull=False).exists())
+        BorrowingService.borrow_book(self.book, self.patron)
+        self.assertEqual(BorrowingRecord.objects.filter(status=BorrowingRecord.BORROWED).count(), 1)
+        
+        # Loans entered by hand take no copy and are checked when saved.
+        response = self.client.post(reverse('borrowings:borrowing-list'), {
+            'book': self.book.pk, 'patron': self.patron.pk, 'status': BorrowingRecord.PENDING,
+            'due_date': (timezone.now() + timezone.timedelta(days=14)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('already has this book borrowed', str(response.data))
+    
+    def test_batch_checkout_and_return(self):
+        """Test batch checkout and return by id, ISBN-13 or ISBN-10 with a query count independent of size"""
+        books = [self.book] + [
+            BookService.create_book(dict(title=f"Batch Book {isbn}", author="Test Author", isbn=isbn, total_copies=1))
+            for isbn in ("9781861972712", "9780140449136", "9780262033848")
+        ]
+        borrow_url = reverse('borrowings:borrowing-borrow-batch')
+        return_url = reverse('borrowings:borrowing-return-batch')
+        
+        with CaptureQueriesContext(connection) as single:
+            response = self.client.post(borrow_url, {'patron_id': self.patron.pk, 'books': [books[0].pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        Book.objects.filter(pk=books[3].pk).update(available_copies=0)
+        items = [books[0].pk, '978-1-86197-271-2', '0-14-044913-2', books[2].pk, books[3].pk, 0]
+        with CaptureQueriesContext(connection) as batch:
+            response = self.client.post(borrow_url, {'patron_id': self.patron.pk, 'books': items}, format='json')
+        self.assertEqual(len(batch), len(single))
+        
+        report = response.data['data']
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((report['succeeded'], report['failed']), (2, 4))
+        self.assertEqual([item['success'] for item in report['results']], [False, True, True, False, False, False])
+        self.assertIn('already has this book', report['results'][0]['error'])
+        self.assertIn('more than once', report['results'][3]['error'])
+        self.assertIn('not available', report['results'][4]['error'])
+        self.assertIn('does not exist', report['results'][5]['error'])
+        self.assertEqual(report['results'][1]['record']['book_title'], books[1].title)
+        self.assertEqual(BorrowingRecord.objects.filter(patron=self.patron, status='borrowed').count(), 3)
+        
+        items = [books[0].isbn, books[1].pk, books[2].pk, books[3].pk]
+        with self.assertNumQueries(3):
+            response = self.client.put(return_url, {'patron_id': self.patron.pk, 'books': items}, format='json')
+        report = response.data['data']
+        self.assertEqual((report['succeeded'], report['failed']), (3, 1))
+        self.assertEqual(report['results'][0]['record']['status'], 'returned')
+        self.assertIn('No active borrowing record', report['results'][3]['error'])
+        
+        self.assertFalse(BookCopy.objects.filter(status=BookCopy.ON_LOAN).exists())
+        self.assertEqual(
+            list(Book.objects.order_by('pk').values_list('available_copies', flat=True)),
+            [2, 1, 1, 0]
+        )
+    
+    def test_loan_stats_follow_loans(self):
+        """Test that borrows, overdue sweeps and returns keep the patron's loan stats current"""
+        def stats():
+            row = PatronLoanStats.objects.get(patron=self.patron)
+            return row.active_loans, row.overdue_loans, row.total_borrowed
+        
+        other = BookService.create_book(dict(title="Other Book", author="Test Author", isbn="9781861972712", total_copies=1))
+        self.client.post(self.borrow_url, {}, format='json')
+        self.assertEqual(stats(), (1, 0, 1))
+        
+        self.client.post(reverse('borrowings:borrowing-borrow-batch'),
+                         {'patron_id': self.patron.pk, 'books': [other.pk, self.book.pk]}, format='json')
+        self.assertEqual(stats(), (2, 0, 2))
+        self.assertEqual(
+            PatronLoanStats.objects.get(patron=self.patron).last_borrow_date,
+            BorrowingRecord.objects.get(book=other).borrow_date
+        )
+        
+        BorrowingRecord.objects.filter(book=self.book).update(due_date=timezone.now() - timezone.timedelta(days=1))
+        BorrowingService.check_overdue_books()
+        self.assertEqual(stats(), (2, 1, 2))
+        
+        self.client.put(self.return_url, {}, format='json')
+        self.assertEqual(stats(), (1, 0, 2))
+        
+        # Records written around the service are recounted.
+        record = BorrowingRecord.objects.get(book=other)
+        self.client.delete(reverse('borrowings:borrowing-detail', kwargs={'pk': record.pk}))
+        self.assertEqual(stats(), (0, 0, 1))
+        
+        PatronLoanStats.objects.update(active_loans=7, total_borrowed=0)
+        self.assertEqual(BorrowingService.refresh_loan_stats(), 1)
+        self.assertEqual(stats(), (0, 0, 1))
+    
+    def test_hold_queue(self):
+        """Test that returns hand copies to the oldest waiting hold, which its patron then borrows"""
+        book = BookService.create_book(dict(title="Held Book", author="Test Author", isbn="9780140449136", total_copies=1))
+        borrow = lambda patron: self.client.post(
+            reverse('borrowings:borrowing-borrow-book', kwargs={'book_id': book.pk, 'patron_id': patron.pk}),
+            {}, format='json'
+        )
+        waiting = [
+            Patron.objects.create(first_name=name, last_name="Doe", email=f"{name}@example.com", member_id=name)
+            for name in ("Ann", "Bob", "Cy")
+        ]
+        holds_url = reverse('borrowings:hold-list')
+        
+        response = self.client.post(holds_url, {'book_id': book.pk, 'patron_id': waiting[0].pk}, format='json')
+        self.assertIn('available for borrowing', str(response.data['errors']))
+        borrow(self.patron)
+        
+        positions = []
+        for patron in waiting:
+            response = self.client.post(holds_url, {'book_id': book.pk, 'patron_id': patron.pk}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            positions.append(response.data['data']['position'])
+        self.assertEqual(positions, [1, 2, 3])
+        response = self.client.post(holds_url, {'book_id': book.pk, 'patron_id': waiting[0].pk}, format='json')
+        self.assertIn('already has a hold', str(response.data['errors']))
+        response = self.client.post(holds_url, {'book_id': book.pk, 'patron_id': self.patron.pk}, format='json')
+        self.assertIn('already has this book borrowed', str(response.data['errors']))
+        
+        # The returned copy skips the shelf and waits for the first in line.
+        return_url = reverse('borrowings:borrowing-return-book', kwargs={'book_id': book.pk, 'patron_id': self.patron.pk})
+        with self.assertNumQueries(2):
+            self.client.put(return_url, {}, format='json')
+        first = Hold.objects.get(patron=waiting[0])
+        self.assertEqual(first.status, Hold.READY)
+        self.assertEqual(first.copy.status, BookCopy.RESERVED)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 0)
+        
+        self.assertIn('not available', str(borrow(waiting[1]).data['errors']))
+        with self.assertNumQueries(2):
+            response = borrow(waiting[0])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['copy_barcode'], first.copy.barcode)
+        first.refresh_from_db()
+        self.assertEqual(first.status, Hold.FULFILLED)
+        
+        BorrowingService.return_book(BorrowingRecord.objects.get(patron=waiting[0]))
+        second = Hold.objects.get(patron=waiting[1])
+        self.assertEqual(second.status, Hold.READY)
+        
+        Hold.objects.filter(pk=second.pk).update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        out = io.StringIO()
+        call_command('expire_holds', stdout=out)
+        self.assertIn('Expired 1 holds', out.getvalue())
+        third = Hold.objects.get(patron=waiting[2])
+        self.assertEqual(third.status, Hold.READY)
+        self.assertEqual(third.copy_id, second.copy_id)
+        
+        response = self.client.get(holds_url, {'book': book.pk, 'status': 'ready'})
+        self.assertEqual([hold['id'] for hold in response.data['data']], [third.pk])
+        
+        detail_url = reverse('borrowings:hold-detail', kwargs={'pk': third.pk})
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.data['data']['status'], Hold.CANCELLED)
+        self.assertEqual(self.client.delete(detail_url).status_code, status.HTTP_400_BAD_REQUEST)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 1)
+        self.assertEqual(BookCopy.objects.get(book=book).status, BookCopy.AVAILABLE)
+    
+    def test_batch_checkout_collects_ready_hold(self):
+        """Test that a batch checkout lends the copy reserved for the patron's ready hold"""
+        book = BookService.create_book(dict(title="Held Book", author="Test Author", isbn="9780140449136", total_copies=1))
+        patron = Patron.objects.create(first_name="Ann", last_name="Doe", email="ann@example.com", member_id="Ann")
+        BorrowingService.borrow_book(book, self.patron)
+        hold = HoldService.place_hold(book, patron)
+        BorrowingService.return_book(BorrowingRecord.objects.get(book=book, patron=self.patron))
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.READY)
+        
+        response = self.client.post(reverse('borrowings:borrowing-borrow-batch'),
+                                    {'patron_id': patron.pk, 'books': [book.pk]}, format='json')
+        self.assertEqual(response.data['data']['succeeded'], 1)
+        self.assertEqual(response.data['data']['results'][0]['record']['copy_barcode'], hold.copy.barcode)
+        
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.FULFILLED)
+        self.assertEqual(BookCopy.objects.get(book=book).status, BookCopy.ON_LOAN)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 0)
+    
+    def test_new_copies_go_to_waiting_holds(self):
+        """Test that copies added to a held book are reserved for the queue, and expired holds cannot be collected"""
+        book = BookService.create_book(dict(title="Held Book", author="Test Author", isbn="9780140449136", total_copies=1))
+        patron = Patron.objects.create(first_name="Ann", last_name="Doe", email="ann@example.com", member_id="Ann")
+        BorrowingService.borrow_book(book, self.patron)
+        hold = HoldService.place_hold(book, patron)
+        
+        book = BookService.update_book(book, {'total_copies': 2})
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.READY)
+        self.assertEqual(hold.copy.status, BookCopy.RESERVED)
+        self.assertEqual(book.available_copies, 0)
+        
+        Hold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        response = self.client.post(
+            reverse('borrowings:borrowing-borrow-book', kwargs={'book_id': book.pk, 'patron_id': patron.pk}),
+            {}, format='json'
+        )
+        self.assertIn('not available', str(response.data['errors']))
+        with self.assertRaises(ValidationError):
+            BorrowingService.borrow_book(book, patron, hold_id=hold.pk)
+        self.assertEqual(BookCopy.objects.get(pk=hold.copy_id).status, BookCopy.RESERVED)
+    
+    def test_drifted_counters_are_reported_and_left_alone(self):
+        """Test that a counter out of step with the copies is logged instead of clamped"""
+        record = BorrowingService.borrow_book(self.book, self.patron)
+        Book.objects.filter(pk=self.book.pk).update(available_copies=2)
+        
+        with self.assertLogs('apps.borrowings.services', 'ERROR') as logs:
+            BorrowingService.return_book(record)
+        self.assertIn(f'book {self.book.pk} would exceed total copies', logs.output[0])
+        self.assertEqual(BookCopy.objects.get(pk=record.copy_id).status, BookCopy.AVAILABLE)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+        
+        patron = Patron.objects.create(first_name="Ann", last_name="Doe", email="ann@example.com", member_id="Ann")
+        hold = HoldService.place_hold(self.book, patron)
+        Book.objects.filter(pk=self.book.pk).update(available_copies=0)
+        with self.assertLogs('apps.borrowings.services', 'ERROR') as logs:
+            self.assertEqual(HoldService.reserve_available_copies([self.book.pk]), [hold.pk])
+        self.assertIn(f'book {self.book.pk} would go below zero', logs.output[0])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+
+class MarkOverdueCommandTestCase(TestCase):
+    """Test cases for the mark_overdue management command"""
+    
+    def setUp(self):
+        """Set up loans due in the past and the future"""
+        patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+        now = timezone.now()
+        
+        def loan(days, status):
+            return BorrowingRecord.objects.create(
+                book=Book.objects.create(title="Test Book", author="A", isbn=f"978{days + 10:010d}", total_copies=1),
+                patron=patron,
+                due_date=now + timezone.timedelta(days=days),
+                status=status
+            )
+        
+        self.late = [loan(-3, BorrowingRecord.BORROWED), loan(-2, BorrowingRecord.BORROWED), loan(-1, BorrowingRecord.BORROWED)]
+        self.on_time = loan(7, BorrowingRecord.BORROWED)
+        self.returned = loan(-5, BorrowingRecord.RETURNED)
+    
+    def test_mark_overdue_in_chunks(self):
+        """Test that only borrowed loans past due are marked, and their ids are emitted"""
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'overdue.txt')
+            call_command('mark_overdue', '--batch-size', '2', '--ids-file', path, stdout=out)
+            with open(path) as f:
+                ids = [int(line) for line in f]
+        
+        self.assertEqual(sorted(ids), sorted(record.pk for record in self.late))
+        self.assertIn('Marked 3 loans overdue', out.getvalue())
+        self.assertEqual(
+            set(BorrowingRecord.objects.filter(status=BorrowingRecord.OVERDUE).values_list('pk', flat=True)),
+            set(ids)
+        )
+        self.on_time.refresh_from_db()
+        self.returned.refresh_from_db()
+        self.assertEqual(self.on_time.status, BorrowingRecord.BORROWED)
+        self.assertEqual(self.returned.status, BorrowingRecord.RETURNED)
+        
+        self.assertEqual(BorrowingService.check_overdue_books(), 0)
+
+
+class BorrowingPartitionsCommandTestCase(TestCase):
+    """Test cases for the borrowing_partitions management command"""
+    
+    def setUp(self):
+        """Set up a book and a patron to lend it to"""
+        self.book = Book.objects.create(title="Test Book", author="A", isbn="9780306406157", total_copies=5)
+        self.patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+    
+    def loan(self, borrow_date, status=BorrowingRecord.RETURNED):
+        return BorrowingRecord.objects.create(
+            book=self.book,
+            patron=self.patron,
+            borrow_date=borrow_date,
+            due_date=borrow_date + timezone.timedelta(days=14),
+            status=status
+        )
+    
+    @staticmethod
+    def partition_of(record):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text FROM borrowings_borrowingrecord WHERE id = %s", [record.pk])
+            return cursor.fetchone()[0]
+    
+    def test_create_partitions_moves_stray_loans(self):
+        """Test that new monthly partitions take over loans from the default partition"""
+        far_month = month_start(timezone.now(), 8)
+        stray = self.loan(far_month + timezone.timedelta(days=2))
+        self.assertEqual(self.partition_of(stray), 'borrowings_borrowingrecord_default')
+        
+        out = io.StringIO()
+        call_command('borrowing_partitions', '--months-ahead', '9', stdout=out)
+        
+        self.assertIn(f'Created borrowings_borrowingrecord_p{far_month:%Y_%m}', out.getvalue())
+        self.assertEqual(self.partition_of(stray), f'borrowings_borrowingrecord_p{far_month:%Y_%m}')
+        self.assertEqual(BorrowingRecord.objects.get(pk=stray.pk).status, BorrowingRecord.RETURNED)
+    
+    def test_archive_old_partitions(self):
+        """Test that old partitions are archived and dropped unless they hold active loans"""
+        now = timezone.now()
+        old = self.loan(now - timezone.timedelta(days=400))
+        active = self.loan(month_start(now, 1) + timezone.timedelta(days=1), BorrowingRecord.BORROWED)
+        later = month_start(now, 3)
+        # Run the deferred foreign key checks now, as a table with pending
+        # trigger events cannot be dropped in the same transaction.
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('django.utils.timezone.now', return_value=later + timezone.timedelta(days=3)):
+            call_command(
+                'borrowing_partitions', '--months-ahead', '0', '--archive-before', f'{later:%Y-%m}',
+                '--archive-dir', directory, '--drop', stdout=out
+            )
+            with open(os.path.join(directory, 'borrowings_borrowingrecord_legacy.csv')) as f:
+                archived = list(csv.DictReader(f))
+        
+        self.assertEqual([int(row['id']) for row in archived], [old.pk])
+        self.assertIn(f'Kept borrowings_borrowingrecord_p{month_start(now, 1):%Y_%m}', out.getvalue())
+        self.assertFalse(BorrowingRecord.objects.filter(pk=old.pk).exists())
+        self.assertTrue(BorrowingRecord.objects.filter(pk=active.pk).exists())
+    
+    def test_split_legacy_into_monthly_partitions(self):
+        """Test that the legacy partition gives up its oldest months one partition each"""
+        now = timezone.now()
+        oldest = self.loan(month_start(now, -14) + timezone.timedelta(days=3))
+        older = self.loan(month_start(now, -13) + timezone.timedelta(days=3), BorrowingRecord.BORROWED)
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        
+        out = io.StringIO()
+        call_command('borrowing_partitions', '--months-ahead', '0', '--split-legacy', '1', stdout=out)
+        
+        self.assertEqual(self.partition_of(oldest), f'borrowings_borrowingrecord_p{month_start(now, -14):%Y_%m}')
+        self.assertEqual(self.partition_of(older), 'borrowings_borrowingrecord_legacy')
+        
+        call_command('borrowing_partitions', '--months-ahead', '0', '--split-legacy', '5', stdout=out)
+        
+        self.assertEqual(self.partition_of(older), f'borrowings_borrowingrecord_p{month_start(now, -13):%Y_%m}')
+        self.assertIn('Dropped the empty borrowings_borrowingrecord_legacy', out.getvalue())
+        self.assertEqual(BorrowingRecord.objects.get(pk=older.pk).status, BorrowingRecord.BORROWED)
+
+
+class CirculationAnalyticsTestCase(APITestCase):
+    """Test cases for the circulation rollups and analytics endpoints"""
+    
+    def setUp(self):
+        """Set up two titles with one returned and one overdue loan"""
+        self.librarian = User.objects.create_user(email='librarian@example.com', password='password123', role='librarian')
+        self.patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+        self.shared = Book.objects.create(title="Shared", author="A", isbn="9780306406157", total_copies=2)
+        self.single = Book.objects.create(title="Single", author="A", isbn="9781861972712", total_copies=1)
+        
+        today = timezone.now().date()
+        self.first_day = today - timezone.timedelta(days=5)
+        start = datetime.combine(self.first_day, time.min, tzinfo=dt_timezone.utc)
+        day = timezone.timedelta(days=1)
+        BorrowingRecord.objects.create(
+            book=self.shared, patron=self.patron, status=BorrowingRecord.RETURNED,
+            borrow_date=start + day / 2, due_date=start + 14 * day, return_date=start + 2.5 * day
+        )
+        BorrowingRecord.objects.create(
+            book=self.single, patron=self.patron, status=BorrowingRecord.OVERDUE,
+            borrow_date=start + day, due_date=start + 2 * day
+        )
+        self.client.force_authenticate(user=self.librarian)
+    
+    def test_refresh_rolls_up_only_new_days(self):
+        """Test that the command rolls up every day once and picks up where it stopped"""
+        out = io.StringIO()
+        call_command('refresh_circulation_rollups', '--chunk-days', '2', stdout=out)
+        self.assertIn('Rolled up 5 days', out.getvalue())
+        
+        rows = [(row.borrowed, row.returned, row.active, row.overdue) for row in DailyCirculation.objects.all()]
+        self.assertEqual(rows, [(1, 0, 1, 0), (1, 0, 2, 0), (0, 1, 1, 1), (0, 0, 1, 1), (0, 0, 1, 1)])
+        self.assertEqual(DailyCirculation.objects.all()[2].overdue_rate, 1.0)
+        
+        self.assertEqual(CirculationAnalyticsService.refresh(), 0)
+        self.assertEqual(CirculationAnalyticsService.refresh(since=self.first_day + timezone.timedelta(days=2)), 3)
+        self.assertEqual(DailyCirculation.objects.count(), 5)
+        self.assertEqual(DailyTitleUtilization.objects.filter(book=self.single).count(), 4)
+    
+    def test_analytics_endpoints(self):
+        """Test the daily circulation and title utilization endpoints"""
+        CirculationAnalyticsService.refresh()
+        period = {'from': self.first_day.isoformat(), 'to': (self.first_day + timezone.timedelta(days=4)).isoformat()}
+        
+        response = self.client.get(reverse('borrowings:analytics-daily'), period)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([day['borrowed'] for day in response.data['data']['days']], [1, 1, 0, 0, 0])
+        self.assertEqual(response.data['data']['days'][3]['overdue_rate'], 1.0)
+        self.assertEqual(response.data['data']['refreshed_through'], self.first_day + timezone.timedelta(days=4))
+        
+        response = self.client.get(reverse('borrowings:analytics-utilization'), period)
+        titles = response.data['data']['titles']
+        self.assertEqual([title['title'] for title in titles], ['Single', 'Shared'])
+        self.assertEqual((titles[0]['loaned_days'], titles[0]['copy_days'], titles[0]['utilization']), (4.0, 5, 0.8))
+        self.assertEqual((titles[1]['loaned_days'], titles[1]['copy_days'], titles[1]['utilization']), (2.0, 10, 0.2))
+        
+        response = self.client.get(reverse('borrowings:analytics-daily'), {'from': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('from', response.data['errors'])
+        
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='patron@example.com', password='password123', role='patron'
+        ))
+        response = self.client.get(reverse('borrowings:analytics-daily'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BorrowingViewSet
+from .views import BorrowingViewSet, CirculationAnalyticsViewSet, HoldViewSet
 
 router = DefaultRouter()
+router.register('analytics', CirculationAnalyticsViewSet, basename='analytics')
+router.register('holds', HoldViewSet, basename='hold')
 router.register('', BorrowingViewSet, basename='borrowing')
 
 app_name = 'borrowings'
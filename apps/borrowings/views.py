@@ -1,28 +1,75 @@
 from django.shortcuts import render
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction
 
 from apps.core.mixins.response_mixins import ResponseMixin
+from apps.core.mixins.export_mixins import ExportMixin
 from apps.core.aspects.decorators import log_method_call, measure_performance, log_transaction
 from apps.authentication.permissions import IsLibrarian
+from apps.core.utils.pagination import KeysetPagination
 
-from .models import BorrowingRecord
-from .serializers import BorrowingRecordSerializer, BorrowBookSerializer, ReturnBookSerializer
-from .services import BorrowingService
+from .filters import BorrowingFilterBackend, HoldFilterBackend
+from .models import BorrowingRecord, Hold
+from .serializers import (
+    BorrowingRecordSerializer,
+    BorrowBookSerializer,
+    ReturnBookSerializer,
+    BorrowBatchSerializer,
+    ReturnBatchSerializer,
+    HoldSerializer,
+    PlaceHoldSerializer,
+)
+from .services import BorrowingService, CirculationAnalyticsService, HoldService
 
 
-class BorrowingViewSet(ResponseMixin, viewsets.ModelViewSet):
+class BorrowingViewSet(ResponseMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for borrowing operations.
     """
-    queryset = BorrowingRecord.objects.all()
+    # Join the book, copy and patron that every serialized record shows.
+    queryset = BorrowingRecord.objects.select_related('book', 'copy', 'patron')
     serializer_class = BorrowingRecordSerializer
     permission_classes = [IsAuthenticated, IsLibrarian]
+    pagination_class = KeysetPagination
+    filter_backends = [BorrowingFilterBackend]
+    export_filename = 'borrowings'
     
+    @log_method_call("List Borrowings")
+    @measure_performance("List Borrowings Performance")
+    def list(self, request, *args, **kwargs):
+        """Get a cursor-paginated list of borrowing records, newest first."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.send_paginated_response(
+            data=serializer.data,
+            message=_("Borrowing records retrieved successfully")
+        )
+    
+    # Records written through the generic endpoints bypass the service's
+    # statements, so the patrons' loan stats are recounted after them, in
+    # the same transaction as the write.
     @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+        BorrowingService.refresh_loan_stats([serializer.instance.patron_id])
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_patron_id = serializer.instance.patron_id
+        serializer.save()
+        BorrowingService.refresh_loan_stats({previous_patron_id, serializer.instance.patron_id})
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        BorrowingService.refresh_loan_stats([instance.patron_id])
+    
     @log_transaction("BOOK_BORROW")
     @log_method_call("Borrow Book")
     @measure_performance("Borrow Book Performance")
@@ -40,7 +87,9 @@ class BorrowingViewSet(ResponseMixin, viewsets.ModelViewSet):
         patron = serializer.validated_data['patron']
         notes = serializer.validated_data.get('notes', '')
         
-        borrowing_record = BorrowingService.borrow_book(book, patron, notes)
+        borrowing_record = BorrowingService.borrow_book(
+            book, patron, notes, hold_id=serializer.validated_data['hold_id']
+        )
         
         result_serializer = BorrowingRecordSerializer(borrowing_record)
         return self.send_success_response(
@@ -49,7 +98,6 @@ class BorrowingViewSet(ResponseMixin, viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
-    @transaction.atomic
     @log_transaction("BOOK_RETURN")
     @log_method_call("Return Book")
     @measure_performance("Return Book Performance")
@@ -74,3 +122,222 @@ class BorrowingViewSet(ResponseMixin, viewsets.ModelViewSet):
             message=_("Book returned successfully"),
             status=status.HTTP_200_OK
         )
+    
+    @log_transaction("BOOK_BORROW_BATCH")
+    @log_method_call("Borrow Books Batch")
+    @measure_performance("Borrow Books Batch Performance")
+    @action(detail=False, methods=['post'], url_path='borrow-batch')
+    def borrow_batch(self, request):
+        """Lend a list of books, given by id or ISBN, to one patron"""
+        
+        serializer = BorrowBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = BorrowingService.borrow_books(
+            serializer.validated_data['patron'],
+            serializer.validated_data['books'],
+            serializer.validated_data.get('notes', '')
+        )
+        
+        report = self.batch_report(results)
+        return self.send_success_response(
+            data=report,
+            message=_("Batch checkout processed"),
+            status=status.HTTP_201_CREATED if report['succeeded'] else status.HTTP_200_OK
+        )
+    
+    @log_transaction("BOOK_RETURN_BATCH")
+    @log_method_call("Return Books Batch")
+    @measure_performance("Return Books Batch Performance")
+    @action(detail=False, methods=['put'], url_path='return-batch')
+    def return_batch(self, request):
+        """Record the return of a list of books, given by id or ISBN, by one patron"""
+        
+        serializer = ReturnBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = BorrowingService.return_books(
+            serializer.validated_data['patron'],
+            serializer.validated_data['books'],
+            serializer.validated_data.get('notes', '')
+        )
+        
+        return self.send_success_response(
+            data=self.batch_report(results),
+            message=_("Batch return processed"),
+            status=status.HTTP_200_OK
+        )
+    
+    @staticmethod
+    def batch_report(results):
+        """Summarise the per-book results of a batch checkout or return."""
+        items = []
+        for result in results:
+            if result['record'] is not None:
+                items.append({
+                    'book': result['book'],
+                    'success': True,
+                    'record': BorrowingRecordSerializer(result['record']).data
+                })
+            else:
+                items.append({'book': result['book'], 'success': False, 'error': result['error']})
+        
+        succeeded = sum(item['success'] for item in items)
+        return {
+            'succeeded': succeeded,
+            'failed': len(items) - succeeded,
+            'results': items,
+        }
+
+
+class HoldViewSet(ResponseMixin, viewsets.GenericViewSet):
+    """
+    ViewSet for the hold queue. A hold is placed when a book has no free
+    copy and becomes ready once a returned copy is reserved for it.
+    """
+    queryset = Hold.objects.select_related('book', 'copy', 'patron')
+    serializer_class = HoldSerializer
+    permission_classes = [IsAuthenticated, IsLibrarian]
+    pagination_class = KeysetPagination
+    filter_backends = [HoldFilterBackend]
+    
+    @log_method_call("List Holds")
+    @measure_performance("List Holds Performance")
+    def list(self, request, *args, **kwargs):
+        """Get a cursor-paginated list of holds, oldest first."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.send_paginated_response(
+            data=serializer.data,
+            message=_("Holds retrieved successfully")
+        )
+    
+    @log_method_call("Retrieve Hold")
+    @measure_performance("Retrieve Hold Performance")
+    def retrieve(self, request, *args, **kwargs):
+        """Get a hold with its place in the queue."""
+        hold = self.get_object()
+        hold.position = HoldService.get_position(hold)
+        return self.send_success_response(
+            data=self.get_serializer(hold).data,
+            message=_("Hold details retrieved successfully")
+        )
+    
+    @log_transaction("HOLD_PLACE")
+    @log_method_call("Place Hold")
+    @measure_performance("Place Hold Performance")
+    def create(self, request, *args, **kwargs):
+        """Put a patron in the queue for a book with no free copy."""
+        serializer = PlaceHoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        hold = HoldService.place_hold(
+            serializer.validated_data['book'],
+            serializer.validated_data['patron']
+        )
+        return self.send_success_response(
+            data=self.get_serializer(hold).data,
+            message=_("Hold placed successfully"),
+            status=status.HTTP_201_CREATED
+        )
+    
+    @log_transaction("HOLD_CANCEL")
+    @log_method_call("Cancel Hold")
+    def destroy(self, request, *args, **kwargs):
+        """Cancel an open hold, passing a copy reserved for it on."""
+        hold = self.get_object()
+        if not HoldService.cancel_hold(hold):
+            return self.send_error_response(
+                message=_("This hold is no longer open"),
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.send_success_response(
+            data=self.get_serializer(hold).data,
+            message=_("Hold cancelled successfully")
+        )
+
+
+class CirculationAnalyticsViewSet(ResponseMixin, viewsets.ViewSet):
+    """
+    ViewSet for circulation analytics, served from the daily rollups kept
+    by the refresh_circulation_rollups command.
+    """
+    permission_classes = [IsAuthenticated, IsLibrarian]
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 366
+    
+    @log_method_call("Daily Circulation")
+    @measure_performance("Daily Circulation Performance")
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        """Borrows, returns and overdue rate per day."""
+        period = self.get_period(request)
+        if not isinstance(period, tuple):
+            return period
+        
+        start, end = period
+        return self.send_success_response(
+            data={
+                'refreshed_through': CirculationAnalyticsService.refreshed_through(),
+                'days': CirculationAnalyticsService.get_daily(start, end),
+            },
+            message=_("Daily circulation retrieved successfully")
+        )
+    
+    @log_method_call("Title Utilization")
+    @measure_performance("Title Utilization Performance")
+    @action(detail=False, methods=['get'])
+    def utilization(self, request):
+        """Most utilized titles, by days on loan per copy day."""
+        period = self.get_period(request)
+        if not isinstance(period, tuple):
+            return period
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+        
+        start, end = period
+        return self.send_success_response(
+            data={
+                'refreshed_through': CirculationAnalyticsService.refreshed_through(),
+                'titles': CirculationAnalyticsService.get_utilization(start, end, limit=limit),
+            },
+            message=_("Title utilization retrieved successfully")
+        )
+    
+    def get_period(self, request):
+        """
+        Return the inclusive ``(start, end)`` days asked for with ``from``
+        and ``to``, by default the last 30 days up to yesterday, or an
+        error response.
+        """
+        errors = {}
+        days = {}
+        for name in ('from', 'to'):
+            value = request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                days[name] = parse_date(value)
+            except ValueError:
+                days[name] = None
+            if days[name] is None:
+                errors[name] = [_("Enter a date as YYYY-MM-DD.")]
+        
+        if not errors:
+            end = days.get('to') or timezone.now().date() - timezone.timedelta(days=1)
+            start = days.get('from') or end - timezone.timedelta(days=self.DEFAULT_DAYS - 1)
+            if start > end:
+                errors['from'] = [_("Must not be after to.")]
+            elif (end - start).days >= self.MAX_DAYS:
+                errors['from'] = [_("Ask for at most %(days)s days.") % {'days': self.MAX_DAYS}]
+            else:
+                return start, end
+        
+        return self.send_error_response(
+            message=_("Invalid period"),
+            errors=errors,
+            status=status.HTTP_400_BAD_REQUEST
+        )
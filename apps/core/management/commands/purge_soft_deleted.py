@@ -0,0 +1,86 @@
+import json
+import time
+from datetime import timedelta
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+# Soft-deleted models that can be purged, with the relations holding
+# circulation history. Deleting a row cascades to these, so rows that still
+# have any history are kept; copies, recommendations and loan stats are
+# derived from the row and go with it.
+PURGEABLE_MODELS = {
+    'book': ('books.Book', ['borrowing_records', 'holds', 'daily_utilization']),
+    'patron': ('patrons.Patron', ['borrowing_records', 'holds']),
+    'user': ('authentication.User', []),
+}
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete soft-deleted rows older than a retention window, in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Keep rows deleted within this many days')
+        parser.add_argument('--models', nargs='+', choices=PURGEABLE_MODELS, default=list(PURGEABLE_MODELS),
+                            help='Models to purge (default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between chunks')
+        parser.add_argument('--archive-file', help='Append the purged rows to this NDJSON file before deleting them')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be purged')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archive = open(options['archive_file'], 'a', encoding='utf-8') if options['archive_file'] else None
+
+        try:
+            for name in options['models']:
+                queryset = self.get_purgeable(name, cutoff)
+                if options['dry_run']:
+                    self.stdout.write(f'{name}: {queryset.count()} rows would be purged')
+                    continue
+
+                purged = self.purge(queryset, options['batch_size'], options['sleep'], archive)
+                self.stdout.write(self.style.SUCCESS(f'{name}: purged {purged} rows deleted before {cutoff:%Y-%m-%d}'))
+        finally:
+            if archive:
+                archive.close()
+
+    @staticmethod
+    def get_purgeable(name, cutoff):
+        label, history = PURGEABLE_MODELS[name]
+        model = apps.get_model(label)
+        queryset = model.all_objects.filter(is_deleted=True, deleted_at__lt=cutoff)
+        for relation in history:
+            queryset = queryset.exclude(**{f'{relation}__isnull': False})
+        return queryset.order_by('pk')
+
+    @staticmethod
+    def purge(queryset, batch_size, sleep, archive):
+        """
+        Delete ``queryset`` one chunk per transaction so that row locks are
+        held briefly. Rows locked by another transaction are skipped and
+        picked up by the next run.
+        """
+        model = queryset.model
+        purged = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    queryset.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+
+                chunk = model.all_objects.filter(pk__in=ids)
+                if archive:
+                    for row in chunk.values():
+                        row.pop('search_vector', None)
+                        archive.write(json.dumps({'model': model._meta.label, **row}, cls=DjangoJSONEncoder) + '\n')
+                chunk.delete()
+
+            purged += len(ids)
+            if sleep:
+                time.sleep(sleep)
+        return purged
@@ -5,7 +5,8 @@ from ..utils.response import create_response
 class ResponseMixin:
     """Mixin to standardize response formats across views."""
     
-    def send_response(self, data=None, message="", status=200, success=True, errors=None):
+    def send_response(self, data=None, message="", status=200, success=True, errors=None, pagination=None,
+                      facets=None):
         """
         Send a standardized response.
         """
@@ -14,7 +15,9 @@ class ResponseMixin:
             message=message,
             data=data,
             errors=errors,
-            status_code=status
+            status_code=status,
+            pagination=pagination,
+            facets=facets
         )
         return Response(response_data, status=status)
 
@@ -24,6 +27,18 @@ class ResponseMixin:
         """
         return self.send_response(data=data, message=message, status=status)
 
+    def send_paginated_response(self, data=None, message="Success", status=200, facets=None):
+        """
+        Send a success response for a page produced by ``self.paginator``.
+        """
+        return self.send_response(
+            data=data,
+            message=message,
+            status=status,
+            pagination=self.paginator.get_pagination_data(),
+            facets=facets
+        )
+
     def send_error_response(self, message="Error", errors=None, status=400):
         """
         Send an error response.
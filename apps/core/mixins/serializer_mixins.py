@@ -0,0 +1,80 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin for model serializers that lets clients pick the fields they need
+    with ``?fields=id,title`` or drop some with ``?omit=description``.
+
+    Only read requests are narrowed; writes always see every field. Use
+    ``sparse_queryset()`` on the view's queryset so that unrequested columns
+    are not read from the database either. ``field_sources`` maps serializer
+    fields that are not model columns to the columns they are computed from.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        selected = self.get_sparse_field_names(request)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_sparse_field_names(cls, request):
+        """Return the serializer fields selected by the request."""
+        available = list(cls.Meta.fields)
+        requested = cls._parse_names(request, cls.fields_query_param)
+        omitted = cls._parse_names(request, cls.omit_query_param)
+
+        unknown = (requested | omitted) - set(available)
+        if unknown:
+            param = cls.fields_query_param if requested & unknown else cls.omit_query_param
+            raise ValidationError({
+                param: [_("Unknown fields: %(fields)s.") % {'fields': ', '.join(sorted(unknown))}]
+            })
+
+        return [
+            name for name in available
+            if (not requested or name in requested) and name not in omitted
+        ]
+
+    @classmethod
+    def get_sparse_columns(cls, request):
+        """Return the model columns needed to render the selected fields."""
+        model = cls.Meta.model
+        columns = []
+        for name in cls.get_sparse_field_names(request):
+            for source in cls.field_sources.get(name, (name,)):
+                try:
+                    model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    continue
+                if source not in columns:
+                    columns.append(source)
+        return columns
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        """
+        Restrict ``queryset`` to the columns of the selected fields plus the
+        model's default ordering, which keyset pagination reads.
+        """
+        if request.method not in SAFE_METHODS:
+            return queryset
+        ordering = [field.lstrip('-') for field in queryset.model._meta.ordering]
+        return queryset.only(*cls.get_sparse_columns(request), *ordering)
+
+    @staticmethod
+    def _parse_names(request, param):
+        value = request.query_params.get(param, '')
+        return {name.strip() for name in value.split(',') if name.strip()}
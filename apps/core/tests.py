@@ -1,3 +1,71 @@
+import io
+import json
+import os
+import tempfile
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from apps.books.models import Book
+from apps.borrowings.models import BorrowingRecord
+from apps.patrons.models import Patron
+
+
+class PurgeSoftDeletedCommandTestCase(TestCase):
+    """Test cases for the purge_soft_deleted management command"""
+
+    def setUp(self):
+        """Set up soft-deleted books of different ages"""
+        old = timezone.now() - timezone.timedelta(days=120)
+
+        self.live_book = Book.objects.create(title="Live", author="A", isbn="9780306406157")
+        self.recent_book = Book.objects.create(title="Recent", author="A", isbn="9781861972712")
+        self.recent_book.delete()
+
+        self.old_book = Book.objects.create(title="Old", author="A", isbn="9780140449136")
+        self.loaned_book = Book.objects.create(title="Loaned", author="A", isbn="9780262033848")
+        self.returned_book = Book.objects.create(title="Returned", author="A", isbn="9780201633610")
+        Book.all_objects.filter(pk__in=[self.old_book.pk, self.loaned_book.pk, self.returned_book.pk]).update(
+            is_deleted=True, deleted_at=old
+        )
+
+        patron = Patron.objects.create(first_name="John", last_name="Doe", email="john@example.com", member_id="P1")
+        BorrowingRecord.objects.create(
+            book=self.loaned_book,
+            patron=patron,
+            due_date=timezone.now() + timezone.timedelta(days=14),
+            status=BorrowingRecord.BORROWED
+        )
+        BorrowingRecord.objects.create(
+            book=self.returned_book,
+            patron=patron,
+            due_date=timezone.now() + timezone.timedelta(days=14),
+            return_date=timezone.now(),
+            status=BorrowingRecord.RETURNED
+        )
+
+    def test_purge_old_soft_deleted_books(self):
+        """Test that only old soft-deleted rows without loan history are purged"""
+        call_command('purge_soft_deleted', '--models', 'book', '--batch-size', '1', stdout=io.StringIO())
+
+        remaining = set(Book.all_objects.values_list('pk', flat=True))
+        self.assertEqual(
+            remaining, {self.live_book.pk, self.recent_book.pk, self.loaned_book.pk, self.returned_book.pk}
+        )
+        self.assertEqual(BorrowingRecord.objects.count(), 2)
+
+    def test_purge_dry_run_and_archive(self):
+        """Test dry runs leave rows alone and the archive file records purged rows"""
+        out = io.StringIO()
+        call_command('purge_soft_deleted', '--models', 'book', '--dry-run', stdout=out)
+        self.assertIn('book: 1 rows would be purged', out.getvalue())
+        self.assertTrue(Book.all_objects.filter(pk=self.old_book.pk).exists())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive.ndjson')
+            call_command('purge_soft_deleted', '--models', 'book', '--archive-file', path, stdout=io.StringIO())
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertEqual([row['isbn'] for row in rows], [self.old_book.isbn])
+        self.assertFalse(Book.all_objects.filter(pk=self.old_book.pk).exists())
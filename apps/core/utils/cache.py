@@ -0,0 +1,117 @@
+import functools
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+from rest_framework import status
+from rest_framework.response import Response
+
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+
+def _namespace_label(namespace):
+    return namespace if isinstance(namespace, str) else namespace._meta.label_lower
+
+
+def _version_key(namespace):
+    return f"cache_version:{_namespace_label(namespace)}"
+
+
+def get_cache_version(namespace):
+    """
+    Return the current cache version of a model, or of a namespace given by
+    name, starting it at 1.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_cache_version(*models):
+    """
+    Invalidate every cached response built from ``models``, which may also
+    be namespaces given by name.
+
+    Cached entries are keyed by the model's version, so incrementing it makes
+    the old entries unreachable; they age out on their own timeout. Inside a
+    transaction the version is bumped again on commit, so a response cached
+    from the pre-commit snapshot in the meantime is discarded too.
+    """
+    for model in models:
+        _incr_version(_version_key(model))
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(functools.partial(_incr_version, _version_key(model)))
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+        cache.incr(key)
+
+
+def get_request_role(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    return getattr(user, 'role', None) or 'user'
+
+
+def response_cache_key(request, models):
+    """
+    Build a cache key shared by every caller with the same role, language and
+    URL, namespaced by the version of each model the response depends on.
+    """
+    versions = '.'.join(str(get_cache_version(model)) for model in models)
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    names = '.'.join(_namespace_label(model) for model in models)
+    return f"response:{names}:v{versions}:{get_request_role(request)}:{get_language()}:{path}"
+
+
+def cache_response(*models, timeout=RESPONSE_CACHE_TIMEOUT, vary_on=None, refresh=None):
+    """
+    Cache successful responses of a view method in the shared cache.
+
+    Unlike ``cache_page`` with ``vary_on_headers('Authorization')``, entries
+    are shared by all users of the same role instead of being stored once per
+    access token, and they are invalidated as soon as any of ``models`` is
+    written (see ``bump_cache_version``).
+
+    ``vary_on(request)`` returns further namespaces a particular request
+    depends on. ``refresh(request, data)`` runs on every hit to bring fields
+    that change too often to invalidate on up to date, and returns the data
+    to send, or None to build the response afresh.
+
+    Must be applied below the DRF machinery so that ``request.user`` is
+    already authenticated and permissions have been checked.
+
+    Usage:
+    @cache_response(Book)
+    def list(self, request, *args, **kwargs):
+        # method body
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            namespaces = models + tuple(vary_on(request) if vary_on else ())
+            key = response_cache_key(request, namespaces)
+            cached = cache.get(key)
+            if cached is not None:
+                data, status_code = cached
+                if refresh is not None:
+                    data = refresh(request, data)
+                if data is not None:
+                    return Response(data, status=status_code)
+
+            response = func(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                cache.set(key, (response.data, response.status_code), timeout)
+            return response
+
+        return wrapper
+    return decorator
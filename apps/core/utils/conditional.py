@@ -0,0 +1,78 @@
+import functools
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+from rest_framework import status
+
+from .cache import get_request_role
+
+
+def list_validators(view, request, *args, **kwargs):
+    """
+    Validators of a list view: the newest ``updated_at`` and the row count
+    of the filtered queryset, read with one aggregate query.
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    state = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    last_modified = state['last_modified']
+    return last_modified, f"{state['count']}:{last_modified.isoformat() if last_modified else ''}"
+
+
+def detail_validators(view, request, *args, **kwargs):
+    """Validators of a detail view: the row's ``updated_at``."""
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    last_modified = view.get_queryset().filter(
+        **{view.lookup_field: kwargs[lookup_url_kwarg]}
+    ).values_list('updated_at', flat=True).first()
+    if last_modified is None:
+        return None
+    return last_modified, last_modified.isoformat()
+
+
+def conditional_get(validators):
+    """
+    Answer ``If-None-Match``/``If-Modified-Since`` with ``304 Not Modified``
+    before the view method builds its response.
+
+    ``validators(view, request, *args, **kwargs)`` returns
+    ``(last_modified, fingerprint)``, or ``None`` to skip the check. The ETag
+    combines the fingerprint with the full URL, the caller's role and the
+    language, since each of these changes the body.
+
+    Usage:
+    @conditional_get(detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        # method body
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            state = validators(self, request, *args, **kwargs)
+            if state is None:
+                return func(self, request, *args, **kwargs)
+
+            last_modified, fingerprint = state
+            digest = hashlib.md5(
+                f"{fingerprint}:{request.get_full_path()}:{get_request_role(request)}:{get_language()}".encode('utf-8')
+            ).hexdigest()
+            etag = quote_etag(digest)
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = func(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+            response.headers['ETag'] = etag
+            if timestamp is not None:
+                response.headers['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Authorization', 'Accept-Language'))
+            return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+from .response import create_response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination.
+
+    Pages are fetched with a "rows after the last key I saw" predicate
+    instead of an OFFSET, so every page costs the same index range scan
+    no matter how deep the client has paged.
+
+    The keyset is the queryset's ordering (an explicit ``order_by()`` or the
+    model's ``Meta.ordering``) with the primary key appended as a tiebreaker,
+    in the same direction as the last ordering field so that a single
+    composite index can serve both directions. Ordering fields must be
+    non-null.
+
+    Cursors are opaque, URL-safe tokens returned in the ``pagination`` block
+    of the standard response envelope.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if results and has_next:
+            self.next_cursor = self.encode_cursor(self._position(results[-1]), reverse=False)
+        if results and has_previous:
+            self.previous_cursor = self.encode_cursor(self._position(results[0]), reverse=True)
+
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Return the keyset as a list of ``order_by()`` strings, ending with
+        the primary key.
+        """
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise ImproperlyConfigured(
+                'KeysetPagination only supports field name orderings.'
+            )
+
+        pk_names = {'pk', queryset.model._meta.pk.attname}
+        if not any(field.lstrip('-') in pk_names for field in ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f"-{queryset.model._meta.pk.attname}" if descending
+                            else queryset.model._meta.pk.attname)
+        return ordering
+
+    def get_pagination_data(self):
+        """Pagination block embedded in the response envelope."""
+        return {
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'page_size': self.page_size,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(create_response(data=data, pagination=self.get_pagination_data()))
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        """
+        Return ``(position, reverse)`` for the request's cursor, or
+        ``(None, False)`` when the first page is requested.
+        """
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = payload['p']
+            reverse = bool(payload['r'])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        return [self._to_python(field, value) for field, value in zip(self.ordering, position)], reverse
+
+    def _position(self, instance):
+        return [getattr(instance, self._attname(field)) for field in self.ordering]
+
+    def _attname(self, field):
+        name = field.lstrip('-')
+        if name == 'pk':
+            return self.model._meta.pk.attname
+        try:
+            return self.model._meta.get_field(name).attname
+        except FieldDoesNotExist:
+            return name
+
+    def _to_python(self, field, value):
+        try:
+            model_field = self.model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            return value
+        try:
+            return model_field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, ordering, position):
+        """
+        Build ``(a, b, c) > (x, y, z)`` for a mixed-direction ordering as
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``, plus a
+        redundant ``a >= x`` bound so the planner can start an index range
+        scan at the cursor.
+        """
+        names = [field.lstrip('-') for field in ordering]
+        lookups = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+
+        condition = Q()
+        for index, name in enumerate(names):
+            term = Q(**{f"{name}__{lookups[index]}": position[index]})
+            for previous in range(index):
+                term &= Q(**{names[previous]: position[previous]})
+            condition |= term
+
+        bound = Q(**{f"{names[0]}__{lookups[0]}e": position[0]})
+        return bound & condition
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f"-{field}"
@@ -7,6 +7,8 @@ def create_response(
     data: Optional[Any] = None,
     errors: Optional[Dict] = None,
     status_code: int = 200,
+    pagination: Optional[Dict] = None,
+    facets: Optional[Dict] = None,
 ) -> Dict:
     """
     Create a standardized response format.
@@ -17,6 +19,8 @@ def create_response(
         data: The actual response data
         errors: Any errors that occurred
         status_code: HTTP status code
+        pagination: Cursors for the neighbouring pages of a paginated list
+        facets: Aggregate counts describing the full filtered list
         
     Returns:
         Dict containing the formatted response
@@ -33,4 +37,10 @@ def create_response(
     if errors is not None:
         response["errors"] = errors
 
+    if pagination is not None:
+        response["pagination"] = pagination
+
+    if facets is not None:
+        response["facets"] = facets
+
     return response
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PatronsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.patrons'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:19
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the new indexes without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('patrons', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='patron',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['email'], name='patrons_patron_email_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='patron',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['member_id'], name='patrons_patron_member_live_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='patron',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['last_name', 'first_name'], name='patrons_patron_name_live_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_pat_email_bf0bb6_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_pat_member__9885ee_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_pat_last_na_0a0799_idx',
+        ),
+    ]
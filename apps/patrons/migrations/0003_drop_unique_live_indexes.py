@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 05:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The unique indexes on email and member_id already serve lookups of
+    # live patrons.
+    atomic = False
+
+    dependencies = [
+        ('patrons', '0002_patron_live_indexes'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_patron_email_live_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_patron_member_live_idx',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 07:30
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The patron list is keyset-paginated on (last_name, first_name, id).
+    # Build the new index without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('patrons', '0003_drop_unique_live_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='patron',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['last_name', 'first_name', 'id'], name='patrons_name_id_live_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='patron',
+            name='patrons_patron_name_live_idx',
+        ),
+    ]
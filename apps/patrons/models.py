@@ -40,9 +40,13 @@ class Patron(TimeStampMixin, SoftDeleteMixin):
         verbose_name_plural = _("Patrons")
         ordering = ["last_name", "first_name"]
         indexes = [
-            models.Index(fields=["email"]),
-            models.Index(fields=["member_id"]),
-            models.Index(fields=["last_name", "first_name"]),
+            # Lookups always go through SoftDeleteManager, so index live rows
+            # only. Email and member id lookups use their unique indexes.
+            models.Index(
+                fields=["last_name", "first_name", "id"],
+                name="patrons_name_id_live_idx",
+                condition=models.Q(is_deleted=False),
+            ),
         ]
 
     def __str__(self):
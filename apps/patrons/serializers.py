@@ -1,11 +1,16 @@
 from rest_framework import serializers
+from apps.core.mixins.serializer_mixins import SparseFieldsetMixin
 from .models import Patron
 
 
-class PatronSerializer(serializers.ModelSerializer):
+class PatronSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Patron model"""
     full_name = serializers.CharField(read_only=True)
     has_active_loans = serializers.BooleanField(read_only=True)
+    field_sources = {
+        'full_name': ('first_name', 'last_name'),
+        'has_active_loans': (),
+    }
     
     class Meta:
         model = Patron
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.utils.cache import bump_cache_version
+from .models import Patron
+
+
+@receiver(post_save, sender=Patron)
+@receiver(post_delete, sender=Patron)
+def invalidate_patron_cache(sender, **kwargs):
+    """Make cached patron responses stale after any Patron write."""
+    bump_cache_version(Patron)
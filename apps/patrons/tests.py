@@ -7,7 +7,8 @@ import datetime
 
 from apps.patrons.models import Patron
 from apps.borrowings.models import BorrowingRecord
-from apps.books.models import Book
+from apps.borrowings.services import BorrowingService
+from apps.books.services import BookService
 
 User = get_user_model()
 
@@ -80,6 +81,17 @@ class PatronAPITestCase(APITestCase):
         self.assertEqual(response.data['message'], 'Patrons retrieved successfully')
         self.assertEqual(len(response.data['data']), 2)
     
+    def test_list_patrons_cursor_pagination(self):
+        """Test that the patron list is served in cursor pages ordered by name"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(self.list_url, {'page_size': 1})
+        self.assertEqual([patron['id'] for patron in response.data['data']], [self.patron1.pk])
+        self.assertIsNotNone(response.data['pagination']['next_cursor'])
+        
+        response = self.client.get(self.list_url, {'page_size': 1, 'cursor': response.data['pagination']['next_cursor']})
+        self.assertEqual([patron['id'] for patron in response.data['data']], [self.patron2.pk])
+        self.assertIsNone(response.data['pagination']['next_cursor'])
+    
     def test_list_patrons_as_patron(self):
         """Test retrieving all patrons as a regular patron user"""
         self.client.force_authenticate(user=self.patron_user)
@@ -114,6 +126,39 @@ class PatronAPITestCase(APITestCase):
         self.assertTrue(response.data['success'])
         self.assertEqual(response.data['data']['email'], 'john.doe@example.com')
     
+    def test_retrieve_patron_sparse_fields(self):
+        """Test retrieving only selected patron fields"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(self.detail_url, {'fields': 'id,full_name'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], {'id': self.patron1.pk, 'full_name': 'John Doe'})
+    
+    def test_retrieve_patron_conditional_get(self):
+        """Test that an unchanged patron answers 304 to If-None-Match"""
+        self.client.force_authenticate(user=self.librarian)
+        etag = self.client.get(self.detail_url).headers['ETag']
+        
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_export_patrons_csv(self):
+        """Test streaming all patrons as CSV"""
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(
+            reverse('patrons:patron-export'), {'export_format': 'csv', 'fields': 'member_id,full_name'}
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['full_name,member_id', 'John Doe,P12345', 'Jane Smith,P67890'])
+    
+    def test_export_patrons_as_patron(self):
+        """Test exporting patrons as a regular patron (should be restricted)"""
+        self.client.force_authenticate(user=self.patron_user)
+        response = self.client.get(reverse('patrons:patron-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
     def test_retrieve_nonexistent_patron(self):
         """Test retrieving a patron that doesn't exist"""
         self.client.force_authenticate(user=self.librarian)
@@ -211,14 +256,14 @@ class PatronAPITestCase(APITestCase):
     
     def test_delete_patron_with_active_loans(self):
         """Test deleting a patron with active loans (should be prevented)"""
-        book = Book.objects.create(
+        book = BookService.create_book(dict(
             title="Test Book",
             author="Test Author",
             isbn="1234567890123",
             publication_year=2020,
             available_copies=5,
             total_copies=5
-        )
+        ))
         
         BorrowingRecord.objects.create(
             book=book,
@@ -241,6 +286,50 @@ class PatronAPITestCase(APITestCase):
         # # Verify patron was not deleted
         # self.assertTrue(Patron.objects.filter(pk=self.patron1.pk).exists())
     
+    def test_patron_loans(self):
+        """Test the loan history pages newest first under a summary read from the loan stats"""
+        books = [
+            BookService.create_book(dict(title=f"Loan Book {isbn}", author="Test Author", isbn=isbn, total_copies=1))
+            for isbn in ("9780306406157", "9781861972712")
+        ]
+        first = BorrowingService.borrow_book(books[0], self.patron1)
+        second = BorrowingService.borrow_book(books[1], self.patron1)
+        BorrowingService.return_book(first)
+        
+        self.patron1.user = self.patron_user
+        self.patron1.save()
+        
+        url = reverse('patrons:patron-loans', kwargs={'pk': self.patron1.pk})
+        self.client.force_authenticate(user=self.patron_user)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary = response.data['data']['summary']
+        self.assertEqual((summary['active_loans'], summary['overdue_loans'], summary['total_borrowed']), (1, 0, 2))
+        self.assertIsNotNone(summary['last_borrow_date'])
+        self.assertEqual([loan['id'] for loan in response.data['data']['loans']], [second.pk])
+        
+        response = self.client.get(url, {'page_size': 1, 'cursor': response.data['pagination']['next_cursor']})
+        self.assertEqual([loan['id'] for loan in response.data['data']['loans']], [first.pk])
+        self.assertEqual(response.data['data']['loans'][0]['status'], 'returned')
+        
+        url = reverse('patrons:patron-loans', kwargs={'pk': self.patron2.pk})
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(url)
+        self.assertEqual(response.data['data']['summary']['total_borrowed'], 0)
+        self.assertEqual(response.data['data']['loans'], [])
+    
+    def test_patron_loans_of_another_patron(self):
+        """Test a patron cannot read another patron's loan history (should be forbidden)"""
+        self.patron1.user = self.patron_user
+        self.patron1.save()
+        
+        self.client.force_authenticate(user=self.patron_user)
+        response = self.client.get(reverse('patrons:patron-loans', kwargs={'pk': self.patron2.pk}))
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
     def test_delete_patron_as_regular_patron(self):
         """Test deleting a patron as a regular patron user (should be forbidden)"""
         self.client.force_authenticate(user=self.patron_user)
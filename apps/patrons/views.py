@@ -1,50 +1,66 @@
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from apps.core.mixins.response_mixins import ResponseMixin
+from apps.core.mixins.export_mixins import ExportMixin
+from apps.core.utils.cache import cache_response
+from apps.core.utils.conditional import conditional_get, detail_validators, list_validators
 from apps.core.aspects.decorators import log_method_call, measure_performance
-from apps.authentication.permissions import IsLibrarian
+from apps.authentication.permissions import IsLibrarian, IsLibrarianOrProfileOwner
+from apps.borrowings.models import BorrowingRecord, PatronLoanStats
+from apps.borrowings.serializers import BorrowingRecordSerializer, PatronLoanStatsSerializer
+from apps.core.utils.pagination import KeysetPagination
 from .models import Patron
 from .serializers import PatronSerializer
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page 
-from django.views.decorators.vary import vary_on_headers
 
 
-class PatronViewSet(ResponseMixin, viewsets.ModelViewSet):
+class PatronViewSet(ResponseMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for patron management operations.
     """
     queryset = Patron.objects.all()
     serializer_class = PatronSerializer
     permission_classes = [IsAuthenticated, IsLibrarian]
+    pagination_class = KeysetPagination
+    export_filename = 'patrons'
     
     def get_permissions(self):
         """
         Override to allow patrons to view patron details but only librarians 
-        to modify them.
+        to modify them. A loan history is only shown to librarians and the
+        patron it belongs to.
         """
         if self.action in ['list', 'retrieve']:
             return [IsAuthenticated()]
+        if self.action == 'loans':
+            return [IsAuthenticated(), IsLibrarianOrProfileOwner()]
         return [IsAuthenticated(), IsLibrarian()]
     
+    def get_queryset(self):
+        """Only read the columns behind the fields requested with ``fields``/``omit``."""
+        if self.action == 'loans':
+            return super().get_queryset().select_related('loan_stats')
+        return self.get_serializer_class().sparse_queryset(super().get_queryset(), self.request)
+    
     @log_method_call("List Patrons")
     @measure_performance("List Patrons Performance")
-    @method_decorator(vary_on_headers('Authorization'))
-    @method_decorator(cache_page(timeout=60 * 5))
+    @conditional_get(list_validators)
+    @cache_response(Patron)
     def list(self, request, *args, **kwargs):
-        """List all patrons n"""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return self.send_success_response(
+        """Get a cursor-paginated list of patrons ordered by name."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.send_paginated_response(
             data=serializer.data,
             message=_("Patrons retrieved successfully")
         )
     
     @log_method_call("Retrieve Patron")
     @measure_performance("Retrieve Patron Performance")
-    @method_decorator(vary_on_headers('Authorization'))
-    @method_decorator(cache_page(timeout=60 * 5))
+    @conditional_get(detail_validators)
+    @cache_response(Patron)
     def retrieve(self, request, *args, **kwargs):
         """Retrieve a specific patron"""
         instance = self.get_object()
@@ -98,4 +114,26 @@ class PatronViewSet(ResponseMixin, viewsets.ModelViewSet):
             status=status.HTTP_204_NO_CONTENT
         )
     
-  
\ No newline at end of file
+    @log_method_call("Patron Loans")
+    @measure_performance("Patron Loans Performance")
+    @action(detail=True, methods=['get'], serializer_class=BorrowingRecordSerializer)
+    def loans(self, request, pk=None):
+        """
+        Get a patron's loan history, newest first, with a summary read from
+        the patron's loan stats rather than counted from the records
+        """
+        patron = self.get_object()
+        try:
+            stats = patron.loan_stats
+        except PatronLoanStats.DoesNotExist:
+            stats = PatronLoanStats(patron=patron)
+        
+        queryset = BorrowingRecord.objects.select_related('book', 'copy', 'patron').filter(patron=patron)
+        page = self.paginate_queryset(queryset)
+        return self.send_paginated_response(
+            data={
+                'summary': PatronLoanStatsSerializer(stats).data,
+                'loans': self.get_serializer(page, many=True).data,
+            },
+            message=_("Patron loans retrieved successfully")
+        )
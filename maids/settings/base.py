@@ -46,9 +46,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 APPS = [
+    'apps.core.apps.CoreConfig',
     'apps.authentication.apps.AuthenticationConfig',
     'apps.books.apps.BooksConfig',
     'apps.patrons.apps.PatronsConfig',